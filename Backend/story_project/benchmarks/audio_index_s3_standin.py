@@ -0,0 +1,103 @@
+"""
+Lookup latency of the in-process audio existence index against a local S3 stand-in.
+
+Starts a moto S3 server on localhost (``pip install "moto[s3,server]"``),
+points the S3 client at it and seeds the bucket with audio objects. Then it
+compares ``check_s3_for_audio`` with a head_object per call and with the
+index filled by one bucket scan. The index behaviour itself is covered by
+story_app/tests.py (``python manage.py test story_app``).
+
+Usage (from Backend/story_project):
+    python benchmarks/audio_index_s3_standin.py --objects 500 --lookups 200
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "story_project.settings")
+
+PORT = 5123
+BUCKET = 'storyscape-audio-standin'
+
+def configure_environment():
+    os.environ.update({
+        'S3_ENDPOINT_URL': f'http://127.0.0.1:{PORT}',
+        'S3_BUCKET_NAME': BUCKET,
+        'AWS_ACCESS_KEY_ID': 'testing',
+        'AWS_SECRET_ACCESS_KEY': 'testing',
+        'AWS_REGION': 'us-east-1',
+        'AUDIO_INDEX_REFRESH_INTERVAL': '0',
+    })
+
+def count_head_calls(s3_client):
+    calls = {'head_object': 0}
+
+    def on_head(**kwargs):
+        calls['head_object'] += 1
+
+    s3_client.meta.events.register('before-call.s3.HeadObject', on_head)
+    return calls
+
+async def timed_lookups(check, keys):
+    start = time.perf_counter()
+    results = [await check(key) for key in keys]
+    return results, (time.perf_counter() - start) / len(keys)
+
+async def run(objects, lookups):
+    from django.conf import settings
+    from story_app.utils import audio_index, s3_utils
+    from story_app.utils.clients import close_clients, get_aws_client
+
+    s3_client = await get_aws_client('s3')
+    await s3_client.create_bucket(Bucket=BUCKET)
+    keys = [f'story_audio_{i:032x}.mp3' for i in range(objects)]
+    for key in keys:
+        await s3_client.put_object(Bucket=BUCKET, Key=key, Body=b'\xff\xfb', ContentType='audio/mpeg')
+    calls = count_head_calls(s3_client)
+    sample = keys[:lookups]
+
+    # Baseline: no index entries, every lookup is a head_object round trip
+    audio_index._audio_index = audio_index.AudioIndex(settings.AUDIO_INDEX_MAX_ENTRIES, ttl=0)
+    results, head_latency = await timed_lookups(s3_utils.check_s3_for_audio, sample)
+    assert all(results)
+    print(f"head_object per call: {head_latency * 1000:.2f}ms per lookup, {calls['head_object']} head_object calls")
+
+    # Index filled by one bucket scan
+    audio_index._audio_index = audio_index.AudioIndex(settings.AUDIO_INDEX_MAX_ENTRIES, settings.AUDIO_INDEX_TTL)
+    calls['head_object'] = 0
+    start = time.perf_counter()
+    scanned = await s3_utils.refresh_audio_index()
+    scan_time = time.perf_counter() - start
+    results, index_latency = await timed_lookups(s3_utils.check_s3_for_audio, sample)
+    assert all(results) and calls['head_object'] == 0
+    print(f"after scan of {scanned} keys ({scan_time:.2f}s): {index_latency * 1e6:.1f}us per lookup, "
+          f"{calls['head_object']} head_object calls")
+
+    await close_clients()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--objects', type=int, default=500, help="Audio objects seeded in the bucket")
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+
+    from moto.server import ThreadedMotoServer
+
+    configure_environment()
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=PORT)
+    server.start()
+    try:
+        import django
+        django.setup()
+        asyncio.run(run(args.objects, min(args.lookups, args.objects)))
+    finally:
+        server.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Connection pool benchmark for the shared clients in ``story_app.utils.clients``.
+
+Starts a local HTTP server that answers every request after a fixed delay,
+standing in for OpenAI. It then sends a burst of concurrent requests through
+the pooled OpenAI session, and through fresh sessions per request (what
+openai 0.28 does when no session is set). For each pool size it reports the
+wall time, the connections the server accepted and the pool wait time that
+the clients record.
+
+Usage (from Backend/story_project):
+    python benchmarks/bench_client_pool.py --requests 200 --latency 0.05 --pool-sizes 10 50 200
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "story_project.settings")
+
+import aiohttp
+from aiohttp import web
+
+PORT = 5125
+
+async def start_server(latency):
+    connections = [0]
+
+    async def handle(request):
+        await asyncio.sleep(latency)
+        return web.json_response({'ok': True})
+
+    def on_connection(*args, **kwargs):
+        connections[0] += 1
+        return protocol_factory(*args, **kwargs)
+
+    app = web.Application()
+    app.router.add_post('/v1/chat/completions', handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    server = runner.server
+    protocol_factory = server.__call__
+    loop = asyncio.get_running_loop()
+    listener = await loop.create_server(on_connection, '127.0.0.1', PORT)
+    return runner, listener, connections
+
+async def burst(count, session_for_request):
+    url = f'http://127.0.0.1:{PORT}/v1/chat/completions'
+
+    async def one():
+        session, owned = session_for_request()
+        try:
+            async with session.post(url, json={}) as response:
+                await response.read()
+        finally:
+            if owned:
+                await session.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(count)))
+    return time.perf_counter() - start
+
+async def run(requests, latency, pool_sizes):
+    from django.conf import settings
+    from story_app.utils import clients
+
+    runner, listener, connections = await start_server(latency)
+    try:
+        connections[0] = 0
+        elapsed = await burst(requests, lambda: (aiohttp.ClientSession(), True))
+        print(f"session per request: {elapsed:.2f}s, {connections[0]} connections")
+
+        for pool_size in pool_sizes:
+            settings.OPENAI_MAX_CONNECTIONS = pool_size
+            stats = clients._pool_stats['openai'] = clients.PoolStats('openai')
+            await clients.close_openai_session()
+            session = clients.use_openai_session()
+            connections[0] = 0
+            # Two bursts: the second reuses the kept-alive connections
+            first = await burst(requests, lambda: (session, False))
+            second = await burst(requests, lambda: (session, False))
+            print(f"pool of {pool_size:>4}: {first:.2f}s then {second:.2f}s, {connections[0]} connections, "
+                  f"{stats.waits}/{stats.requests} requests queued, "
+                  f"mean wait {stats.total_wait / max(stats.waits, 1) * 1000:.1f}ms, max {stats.max_wait * 1000:.1f}ms")
+        await clients.close_clients()
+    finally:
+        listener.close()
+        await runner.cleanup()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help="Concurrent requests per burst")
+    parser.add_argument('--latency', type=float, default=0.05, help="Server seconds per response")
+    parser.add_argument('--pool-sizes', type=int, nargs='+', default=[10, 50, 200])
+    args = parser.parse_args()
+
+    import django
+    django.setup()
+    # Queued requests are reported below instead of one warning each
+    logging.getLogger('story_app.utils.clients').setLevel(logging.ERROR)
+    asyncio.run(run(args.requests, args.latency, args.pool_sizes))
+
+if __name__ == '__main__':
+    main()
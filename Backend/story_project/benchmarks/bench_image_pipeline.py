@@ -0,0 +1,108 @@
+"""
+Latency benchmark for the ``/api/analyze_image/`` pipeline.
+
+The vision, SageMaker and DALL-E calls are replaced by stubs with fixed
+latencies. The story stub emits its JSON token by token over the story
+latency, so the introduction closes early and the middle about halfway
+through. The benchmark compares the sequential path (ANALYZE_IMAGE_PIPELINE
+off) with the pipelined one, with and without images, and prints the
+Server-Timing header of each response.
+
+Usage (from Backend/story_project):
+    python benchmarks/bench_image_pipeline.py --vision 1.0 --story 3.0 --image 2.0
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "story_project.settings")
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient
+from django.test.utils import setup_test_environment
+from PIL import Image
+from story_app.utils import cache_utils, image_utils, vision_utils
+from story_app.views import image_views
+
+STORY = {
+    'title': 'The Brave Little Kite',
+    'introduction': 'A small red kite lived on a windy hill. ' * 5,
+    'middle': 'One day a storm carried it far over the sea. ' * 5,
+    'conclusion': 'It found its way home by following the stars. ' * 5,
+}
+
+def install_stubs(vision, story, image):
+    story_text = json.dumps(STORY)
+    tokens = [story_text[i:i + 8] for i in range(0, len(story_text), 8)]
+
+    async def analyze_image_content(image_bytes):
+        await asyncio.sleep(vision)
+        return "A red kite over a hill"
+
+    async def call_sagemaker_llm(prompt, schema=None):
+        await asyncio.sleep(story)
+        return story_text
+
+    async def stream_sagemaker_llm(prompt, schema=None):
+        for token in tokens:
+            await asyncio.sleep(story / len(tokens))
+            yield token
+
+    async def generate_illustration(text):
+        await asyncio.sleep(image)
+        return 'https://example.com/illustration.png'
+
+    vision_utils.analyze_image_content = analyze_image_content
+    image_views.call_sagemaker_llm = call_sagemaker_llm
+    image_views.stream_sagemaker_llm = stream_sagemaker_llm
+    image_views.prepare_story_audio_in_background = lambda story: None
+    image_utils.generate_illustration = generate_illustration
+
+def make_upload():
+    output = io.BytesIO()
+    Image.new('RGB', (800, 600), (200, 40, 40)).save(output, format='JPEG')
+    return output.getvalue()
+
+async def request(photo, include_images):
+    # A fresh cache each time so every request pays for the vision call
+    cache_utils._caches.clear()
+    client = AsyncClient()
+    upload = SimpleUploadedFile('kite.jpg', photo, content_type='image/jpeg')
+    start = time.perf_counter()
+    response = await client.post('/api/analyze_image/', {
+        'file': upload, 'prompt': 'A story', 'include_images': str(include_images)
+    })
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.content
+    return elapsed, response['Server-Timing']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--vision', type=float, default=1.0, help="Stubbed vision call seconds")
+    parser.add_argument('--story', type=float, default=3.0, help="Stubbed story generation seconds")
+    parser.add_argument('--image', type=float, default=2.0, help="Stubbed seconds per illustration")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    install_stubs(args.vision, args.story, args.image)
+    photo = make_upload()
+    for pipeline in (False, True):
+        settings.ANALYZE_IMAGE_PIPELINE = pipeline
+        for include_images in (True, False):
+            elapsed, server_timing = asyncio.run(request(photo, include_images))
+            print(f"{'pipelined' if pipeline else 'sequential':>10}, images {'on ' if include_images else 'off'}: "
+                  f"{elapsed:.2f}s  [{server_timing}]")
+
+if __name__ == '__main__':
+    main()
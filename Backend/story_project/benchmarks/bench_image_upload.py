@@ -0,0 +1,128 @@
+"""
+Upload preprocessing benchmark for ``/api/analyze_image/``.
+
+Builds a phone-sized test photo, then posts it to the view with the vision
+and SageMaker calls (blocking and streamed) stubbed. The vision stub records the
+payload it was given. The benchmark compares the payload with the base64 of
+the raw upload that used to be sent. It also times the preprocessing, with
+and without JPEG draft decoding, and checks that oversized and non-image
+uploads are rejected.
+
+Usage (from Backend/story_project):
+    python benchmarks/bench_image_upload.py --width 4032 --height 3024
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "story_project.settings")
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient
+from django.test.utils import setup_test_environment
+from PIL import Image
+from PIL.JpegImagePlugin import JpegImageFile
+from story_app.utils import cache_utils, image_preprocessing, vision_utils
+from story_app.views import image_views
+
+STORY = {'title': 'T', 'introduction': 'I', 'middle': 'M', 'conclusion': 'C'}
+VISION_PAYLOADS = []
+
+def make_photo(width, height):
+    """Noisy gradient JPEG, which compresses about as badly as a real photo"""
+    gradient = Image.linear_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 40)
+    image = Image.merge('RGB', (gradient, noise, gradient.transpose(Image.FLIP_LEFT_RIGHT)))
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=92)
+    return output.getvalue()
+
+def install_stubs():
+    async def analyze_image_content(image_bytes):
+        VISION_PAYLOADS.append(base64.b64encode(image_bytes))
+        return "A drawing of a kite"
+
+    async def call_sagemaker_llm(prompt, schema=None):
+        return json.dumps(STORY)
+
+    async def stream_sagemaker_llm(prompt, schema=None):
+        yield json.dumps(STORY)
+
+    vision_utils.analyze_image_content = analyze_image_content
+    # Either one answers, depending on ANALYZE_IMAGE_PIPELINE
+    image_views.call_sagemaker_llm = call_sagemaker_llm
+    image_views.stream_sagemaker_llm = stream_sagemaker_llm
+    image_views.prepare_story_audio_in_background = lambda story: None
+
+async def post(data, name='photo.jpg'):
+    client = AsyncClient()
+    upload = SimpleUploadedFile(name, data, content_type='image/jpeg')
+    return await client.post('/api/analyze_image/', {'file': upload, 'prompt': 'A story', 'include_images': 'False'})
+
+def time_preprocessing(data, draft):
+    original_draft = JpegImageFile.draft
+    if not draft:
+        JpegImageFile.draft = lambda self, mode, size: None
+    try:
+        start = time.perf_counter()
+        result = image_preprocessing.prepare_image_for_vision(
+            io.BytesIO(data), settings.VISION_IMAGE_MAX_SIDE, settings.VISION_IMAGE_SHORT_SIDE,
+            settings.IMAGE_UPLOAD_MAX_PIXELS, settings.VISION_IMAGE_JPEG_QUALITY
+        )
+        return time.perf_counter() - start, result
+    finally:
+        JpegImageFile.draft = original_draft
+
+async def run(width, height):
+    photo = make_photo(width, height)
+    print(f"upload: {width}x{height} JPEG, {len(photo) / 1e6:.2f} MB, "
+          f"{len(base64.b64encode(photo)) / 1e6:.2f} MB as base64")
+
+    # Run once first so the timings below do not include warm-up
+    _, prepared = time_preprocessing(photo, True)
+    with Image.open(io.BytesIO(prepared)) as image:
+        size = image.size
+    for draft in (False, True):
+        elapsed, _ = time_preprocessing(photo, draft)
+        print(f"preprocessing {'with' if draft else 'without'} draft decoding: {elapsed * 1000:.0f}ms")
+
+    response = await post(photo)
+    assert response.status_code == 200, response.content
+    print(f"vision payload: {size[0]}x{size[1]} JPEG, {len(VISION_PAYLOADS[-1]) / 1e6:.3f} MB as base64")
+
+    # The same upload again is answered from the description cache
+    await post(photo)
+    print(f"repeat upload: {len(VISION_PAYLOADS)} vision calls for 2 requests")
+
+    settings.IMAGE_UPLOAD_MAX_BYTES = len(photo) // 2
+    response = await post(photo)
+    print(f"upload over the size limit: HTTP {response.status_code}")
+    settings.IMAGE_UPLOAD_MAX_BYTES = len(photo) * 2
+    response = await post(b'not an image at all', name='notes.txt')
+    print(f"non-image upload: HTTP {response.status_code}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=4032)
+    parser.add_argument('--height', type=int, default=3024)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    cache_utils._caches.clear()
+    install_stubs()
+    asyncio.run(run(args.width, args.height))
+
+if __name__ == '__main__':
+    main()
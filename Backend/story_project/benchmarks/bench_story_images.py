@@ -0,0 +1,78 @@
+"""
+Latency benchmark for the illustration stage of story generation.
+
+Replaces ``openai.Image.acreate`` with a stub that sleeps for a configurable
+latency and compares the old sequential intro/middle calls with the
+concurrent ``generate_story_images`` path.
+
+Usage (from Backend/story_project):
+    python benchmarks/bench_story_images.py --latency 2.0 --requests 20
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "story_project.settings")
+
+import django
+
+django.setup()
+
+import openai
+from story_app.utils import image_utils
+from story_app.utils.clients import close_clients
+
+STORY = {
+    'title': 'The Brave Little Kite',
+    'introduction': 'A small red kite lived on a windy hill.',
+    'middle': 'One day a storm carried it far over the sea.',
+    'conclusion': 'It found its way home by following the stars.',
+}
+
+def stub_image_acreate(latency, jitter):
+    async def acreate(prompt, n=1, size="1024x1024", **kwargs):
+        await asyncio.sleep(latency + random.uniform(0, jitter))
+        return {'data': [{'url': 'https://example.com/image.png'}]}
+    return acreate
+
+async def sequential(story_json):
+    return {
+        'intro_image_url': await image_utils.generate_illustration(story_json['introduction']),
+        'middle_image_url': await image_utils.generate_illustration(story_json['middle']),
+    }
+
+async def measure(fn, requests):
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await fn(STORY)
+        timings.append(time.perf_counter() - start)
+    await close_clients()
+    timings.sort()
+    return {
+        'p50': statistics.median(timings),
+        'p99': timings[min(len(timings) - 1, int(len(timings) * 0.99))],
+        'mean': statistics.mean(timings),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=1.0, help="Stubbed seconds per image call")
+    parser.add_argument('--jitter', type=float, default=0.2, help="Extra random seconds per image call")
+    parser.add_argument('--requests', type=int, default=10)
+    args = parser.parse_args()
+
+    openai.Image.acreate = stub_image_acreate(args.latency, args.jitter)
+
+    for name, fn in (('sequential', sequential), ('concurrent', image_utils.generate_story_images)):
+        result = asyncio.run(measure(fn, args.requests))
+        print(f"{name:>10}: p50={result['p50']:.3f}s p99={result['p99']:.3f}s mean={result['mean']:.3f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Time-to-first-audio benchmark for ``/api/generate_audio/``.
+
+``openai.Audio.synthesize`` is replaced by a stub whose latency grows with
+the input length (a fixed overhead plus a per-character cost). S3 and the
+text preparation call are stubbed too. The benchmark compares synthesizing
+the whole story in one call with the chunked path, which streams each chunk
+as soon as it is ready, and a request that arrives while background
+pregeneration of the same story is running (it joins that job instead of
+synthesizing again).
+
+Usage (from Backend/story_project):
+    python benchmarks/bench_tts_streaming.py --overhead 0.5 --per-char 0.004 --read-time 1.5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "story_project.settings")
+
+import django
+
+django.setup()
+
+import openai
+from django.test import AsyncClient
+from django.test.utils import setup_test_environment
+from story_app.utils import audio_jobs, tts_utils
+from story_app.views import audio_views
+
+PARAGRAPH = ("The little kite danced over the hill. The wind was strong and cold. "
+             "It looked down at the village far below and smiled. ") * 4
+STORY_TEXT = "\n\n".join([PARAGRAPH] * 4)
+
+STORY_CONTENT = {
+    'title': 'The Brave Little Kite',
+    'introduction': 'A small red kite lived on a windy hill.',
+    'middle': 'One day a storm carried it far over the sea.',
+    'conclusion': 'It found its way home by following the stars.',
+}
+
+SYNTHESIS_CALLS = [0]
+
+def install_stubs(overhead, per_char):
+    def synthesize(model, voice, input, speed, **kwargs):
+        SYNTHESIS_CALLS[0] += 1
+        time.sleep(overhead + per_char * len(input))
+        return {'audio': b'\xff\xfb' + input.encode()[:64]}
+
+    async def get_prepared_tts_text(story):
+        return STORY_TEXT
+
+    async def check_s3_for_audio(filename):
+        return False
+
+    async def upload_to_s3(audio_bytes, filename):
+        pass
+
+    openai.Audio.synthesize = synthesize
+    audio_jobs.get_prepared_tts_text = get_prepared_tts_text
+    audio_jobs.check_s3_for_audio = check_s3_for_audio
+    audio_jobs.upload_to_s3 = upload_to_s3
+    audio_views.check_s3_for_audio = check_s3_for_audio
+
+async def whole_story(read_time):
+    start = time.perf_counter()
+    await tts_utils.synthesize_speech(STORY_TEXT)
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+async def chunked(read_time=0):
+    client = AsyncClient()
+    start = time.perf_counter()
+    response = await client.post('/api/generate_audio/', {'story_content': STORY_CONTENT}, content_type='application/json')
+    first_audio = None
+    async for _ in response.streaming_content:
+        if first_audio is None:
+            first_audio = time.perf_counter() - start
+    return first_audio, time.perf_counter() - start
+
+async def pregenerated(read_time):
+    # The story was just generated; the user reads for a while before tapping play
+    await audio_jobs.pregenerate_story_audio(STORY_CONTENT)
+    await asyncio.sleep(read_time)
+    return await chunked()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--overhead', type=float, default=0.5, help="Stubbed fixed seconds per TTS call")
+    parser.add_argument('--per-char', type=float, default=0.004, help="Stubbed seconds per input character")
+    parser.add_argument('--read-time', type=float, default=1.5, help="Seconds between story creation and the audio request")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    install_stubs(args.overhead, args.per_char)
+
+    chunks = tts_utils.split_tts_text(STORY_TEXT)
+    print(f"story: {len(STORY_TEXT)} chars, {len(chunks)} chunks ({', '.join(str(len(chunk)) for chunk in chunks)} chars)")
+    for name, fn in (('whole story', whole_story), ('chunked', chunked), ('pregenerated', pregenerated)):
+        SYNTHESIS_CALLS[0] = 0
+        first_audio, total = asyncio.run(fn(args.read_time))
+        print(f"{name:>12}: first audio {first_audio:.2f}s, complete {total:.2f}s "
+              f"after the request, {SYNTHESIS_CALLS[0]} TTS calls")
+
+if __name__ == '__main__':
+    main()
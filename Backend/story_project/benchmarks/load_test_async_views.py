@@ -0,0 +1,116 @@
+"""
+Load test for the async story endpoints with stubbed upstreams.
+
+SageMaker and DALL-E are replaced by stubs that await a fixed latency, and
+``/api/generate_story/`` is driven through the ASGI handler of a single worker
+(one process, one event loop) at increasing concurrency. With async views
+the wall time stays close to one request's latency while throughput grows
+with concurrency and the thread count stays flat.
+
+With ``--identical`` every request at a level asks for the same story
+through the response cache, starting cold, which shows the single-flight
+layer folding them into one SageMaker call.
+
+Usage (from Backend/story_project):
+    python benchmarks/load_test_async_views.py --latency 2.0 --concurrency 1 10 100 300
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "story_project.settings")
+
+import django
+
+django.setup()
+
+import openai
+from django.conf import settings
+from django.test import AsyncClient
+from django.test.utils import setup_test_environment
+from story_app.utils import cache_utils, single_flight
+from story_app.utils.clients import close_clients
+from story_app.views import story_views
+
+STORY = {
+    'title': 'The Brave Little Kite',
+    'introduction': 'A small red kite lived on a windy hill.',
+    'middle': 'One day a storm carried it far over the sea.',
+    'conclusion': 'It found its way home by following the stars.',
+}
+
+LLM_CALLS = [0]
+
+def install_stubs(latency):
+    async def call_sagemaker_llm(prompt, schema=None):
+        LLM_CALLS[0] += 1
+        await asyncio.sleep(latency)
+        return json.dumps(STORY)
+
+    async def image_acreate(prompt, n=1, size="1024x1024", **kwargs):
+        await asyncio.sleep(latency)
+        return {'data': [{'url': 'https://example.com/image.png'}]}
+
+    story_views.call_sagemaker_llm = call_sagemaker_llm
+    openai.Image.acreate = image_acreate
+
+async def run_level(concurrency, identical):
+    client = AsyncClient()
+    peak_threads = threading.active_count()
+    # Start every level with a cold response cache
+    cache_utils._caches.clear()
+    single_flight._flights.clear()
+    LLM_CALLS[0] = 0
+
+    async def one_request():
+        nonlocal peak_threads
+        response = await client.post(
+            '/api/generate_story/',
+            {'prompt': 'A kite in a storm', 'response_language': 'English', 'age_group': '3-5', 'bypass_cache': not identical},
+            content_type='application/json'
+        )
+        peak_threads = max(peak_threads, threading.active_count())
+        return response.status_code
+
+    start = time.perf_counter()
+    statuses = await asyncio.gather(*(one_request() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await close_clients()
+    return {
+        'ok': sum(1 for code in statuses if code == 200),
+        'elapsed': elapsed,
+        'throughput': concurrency / elapsed,
+        'peak_threads': peak_threads,
+        'llm_calls': LLM_CALLS[0],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=1.0, help="Stubbed seconds per upstream call")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 100, 300])
+    parser.add_argument('--image-concurrency', type=int, default=1000,
+                        help="Override IMAGE_GENERATION_MAX_CONCURRENCY so the image bound does not cap the run")
+    parser.add_argument('--identical', action='store_true',
+                        help="Send the same cacheable request at every level instead of bypassing the cache")
+    args = parser.parse_args()
+
+    settings.IMAGE_GENERATION_MAX_CONCURRENCY = args.image_concurrency
+    settings.TTS_SPECULATIVE_PREPARATION = False
+
+    setup_test_environment()
+    install_stubs(args.latency)
+
+    print(f"{'concurrency':>11} {'ok':>5} {'wall(s)':>8} {'req/s':>8} {'threads':>8} {'llm calls':>10}")
+    for concurrency in args.concurrency:
+        result = asyncio.run(run_level(concurrency, args.identical))
+        print(f"{concurrency:>11} {result['ok']:>5} {result['elapsed']:>8.2f} "
+              f"{result['throughput']:>8.1f} {result['peak_threads']:>8} {result['llm_calls']:>10}")
+
+if __name__ == '__main__':
+    main()
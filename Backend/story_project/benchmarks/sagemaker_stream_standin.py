@@ -0,0 +1,129 @@
+"""
+Local stand-in for a SageMaker endpoint, used to exercise token streaming.
+
+Serves ``/invocations`` (whole JSON body) and ``/invocations-response-stream``
+(AWS event-stream framed PayloadPart events carrying the model server's
+JSON-lines tokens) on localhost, points the sagemaker-runtime client at it and
+compares time-to-first-token of ``stream_sagemaker_llm`` with the blocking
+``call_sagemaker_llm``.
+
+Usage (from Backend/story_project):
+    python benchmarks/sagemaker_stream_standin.py --tokens 200 --token-latency 0.02
+"""
+
+import argparse
+import asyncio
+import binascii
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "story_project.settings")
+
+STORY = {
+    'title': 'The Brave Little Kite',
+    'introduction': 'A small red kite lived on a windy hill.',
+    'middle': 'One day a storm carried it far over the sea.',
+    'conclusion': 'It found its way home by following the stars.',
+}
+
+def encode_event(payload):
+    """Frame one PayloadPart event in the AWS event-stream binary format"""
+    headers = b''
+    for name, value in ((':event-type', 'PayloadPart'), (':content-type', 'application/octet-stream'), (':message-type', 'event')):
+        name, value = name.encode(), value.encode()
+        headers += struct.pack('!B', len(name)) + name + struct.pack('!BH', 7, len(value)) + value
+    prelude = struct.pack('!II', 12 + len(headers) + len(payload) + 4, len(headers))
+    prelude += struct.pack('!I', binascii.crc32(prelude))
+    message = prelude + headers + payload
+    return message + struct.pack('!I', binascii.crc32(message))
+
+def make_handler(tokens, token_latency):
+    class StandInEndpoint(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.path.endswith('/invocations-response-stream'):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/vnd.amazon.eventstream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for token in tokens:
+                    time.sleep(token_latency)
+                    frame = encode_event((json.dumps({'token': token}) + '\n').encode('utf-8'))
+                    self.wfile.write(f"{len(frame):x}\r\n".encode() + frame + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                time.sleep(token_latency * len(tokens))
+                body = json.dumps({'generated_text': ''.join(tokens)}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+    return StandInEndpoint
+
+def split_tokens(text, count):
+    size = max(1, len(text) // count)
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+async def run(expected):
+    from story_app.utils.clients import close_clients
+    from story_app.utils.sagemaker_utils import call_sagemaker_llm, stream_sagemaker_llm
+
+    start = time.perf_counter()
+    text = await call_sagemaker_llm('prompt')
+    blocking_total = time.perf_counter() - start
+    assert text == expected, "Blocking response does not match the stand-in output"
+
+    start = time.perf_counter()
+    first_token = None
+    pieces = []
+    async for token in stream_sagemaker_llm('prompt'):
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        pieces.append(token)
+    streaming_total = time.perf_counter() - start
+    await close_clients()
+    assert ''.join(pieces) == expected, "Streamed tokens do not reassemble into the stand-in output"
+
+    print(f" blocking: first content {blocking_total:.3f}s, total {blocking_total:.3f}s")
+    print(f"streaming: first token   {first_token:.3f}s, total {streaming_total:.3f}s ({len(pieces)} tokens)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tokens', type=int, default=100)
+    parser.add_argument('--token-latency', type=float, default=0.02, help="Seconds between streamed tokens")
+    args = parser.parse_args()
+
+    expected = json.dumps(STORY)
+    tokens = split_tokens(expected, args.tokens)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(tokens, args.token_latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    os.environ['SAGEMAKER_RUNTIME_ENDPOINT_URL'] = f"http://127.0.0.1:{server.server_port}"
+    os.environ.setdefault('SAGEMAKER_ENDPOINT_NAME', 'stand-in')
+    os.environ.setdefault('AWS_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'stand-in')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'stand-in')
+
+    import django
+    django.setup()
+
+    try:
+        asyncio.run(run(expected))
+    finally:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class StoryAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "story_app"
+
+    def ready(self):
+        from .utils.clients import configure_openai_requests_session
+        configure_openai_requests_session()
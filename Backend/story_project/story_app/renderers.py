@@ -0,0 +1,15 @@
+from rest_framework.renderers import BaseRenderer
+from .utils.helpers import format_sse
+
+class EventStreamRenderer(BaseRenderer):
+    """Allows clients to negotiate text/event-stream for streaming endpoints.
+
+    Streaming views write their own events; this renderer only handles plain
+    Response objects (validation errors) by sending them as a single error event.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return format_sse('error', data)
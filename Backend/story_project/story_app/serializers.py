@@ -5,6 +5,7 @@ class StoryRequestSerializer(serializers.Serializer):
     response_language = serializers.CharField(default="Hindi")
     age_group = serializers.CharField(default="3-5")
     selected_words = serializers.ListField(child=serializers.CharField(), required=False)
+    bypass_cache = serializers.BooleanField(default=False)
 
 class StoryResponseSerializer(serializers.Serializer):
     title = serializers.CharField()
@@ -13,11 +14,14 @@ class StoryResponseSerializer(serializers.Serializer):
     conclusion = serializers.CharField()
     intro_image_url = serializers.URLField(allow_null=True, required=False)
     middle_image_url = serializers.URLField(allow_null=True, required=False)
+    intro_image_error = serializers.CharField(allow_null=True, required=False)
+    middle_image_error = serializers.CharField(allow_null=True, required=False)
 
 class SuggestionsRequestSerializer(serializers.Serializer):
     selected_words = serializers.ListField(child=serializers.CharField())
     response_language = serializers.CharField()
     age_group = serializers.CharField()
+    bypass_cache = serializers.BooleanField(default=False)
 
 class SuggestionsResponseSerializer(serializers.Serializer):
     suggestions = serializers.ListField(child=serializers.CharField())
@@ -1,3 +1,438 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import logging
+from unittest import mock, skipUnless
+from django.test import AsyncClient, TestCase, override_settings
+from story_app.utils import audio_index, audio_jobs, cache_utils, s3_utils, single_flight, tts_utils
+from story_app.utils.audio_jobs import AudioJobs
+from story_app.utils.cache_utils import InProcessCacheBackend, ResponseCache
+from story_app.utils.clients import close_clients, get_aws_client
+from story_app.utils.helpers import StorySectionParser, format_sse
+from story_app.utils.image_preprocessing import MULTIPART_OVERHEAD
+from story_app.utils.single_flight import CacheLock, SingleFlight
+from story_app.utils.tts_utils import split_tts_text, stream_story_audio
+from story_app.views import story_views
 
-# Create your tests here.
+try:
+    import botocore.session
+    from moto.server import ThreadedMotoServer
+except ImportError:
+    ThreadedMotoServer = None
+
+BUCKET = 'storyscape-audio-test'
+
+@skipUnless(ThreadedMotoServer, 'pip install "moto[s3,server]" to run the S3 tests')
+class AudioIndexS3Tests(TestCase):
+    """check_s3_for_audio and the audio index against a local moto S3 server"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        cls.server = ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+        cls.server.start()
+        host, port = cls.server.get_host_and_port()
+        endpoint_url = f'http://{host}:{port}'
+        cls.settings_override = override_settings(
+            AWS_ACCESS_KEY_ID='testing',
+            AWS_SECRET_ACCESS_KEY='testing',
+            AWS_REGION='us-east-1',
+            AWS_ENDPOINT_URLS={'s3': endpoint_url},
+            S3_BUCKET_NAME=BUCKET,
+            AUDIO_INDEX_REFRESH_INTERVAL=0,
+        )
+        cls.settings_override.enable()
+        cls.bucket_override = mock.patch.object(s3_utils, 'S3_BUCKET_NAME', BUCKET)
+        cls.bucket_override.start()
+
+        s3 = botocore.session.get_session().create_client(
+            's3', region_name='us-east-1', endpoint_url=endpoint_url,
+            aws_access_key_id='testing', aws_secret_access_key='testing'
+        )
+        s3.create_bucket(Bucket=BUCKET)
+        cls.keys = [f'story_audio_{i:032x}.mp3' for i in range(20)]
+        for key in cls.keys:
+            s3.put_object(Bucket=BUCKET, Key=key, Body=b'\xff\xfb', ContentType='audio/mpeg')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.bucket_override.stop()
+        cls.settings_override.disable()
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.use_index(negative_ttl=0)
+
+    def use_index(self, ttl=60, negative_ttl=0):
+        audio_index._audio_index = audio_index.AudioIndex(1000, ttl, negative_ttl)
+
+    async def count_head_calls(self):
+        calls = {'head_object': 0}
+
+        def on_head(**kwargs):
+            calls['head_object'] += 1
+
+        (await get_aws_client('s3')).meta.events.register('before-call.s3.HeadObject', on_head)
+        return calls
+
+    async def test_known_keys_are_answered_from_the_bucket_scan(self):
+        try:
+            calls = await self.count_head_calls()
+            self.assertEqual(await s3_utils.refresh_audio_index(), len(self.keys))
+            for key in self.keys:
+                self.assertTrue(await s3_utils.check_s3_for_audio(key))
+            self.assertEqual(calls['head_object'], 0)
+        finally:
+            await close_clients()
+
+    async def test_unknown_keys_fall_through_to_head_object(self):
+        try:
+            calls = await self.count_head_calls()
+            self.assertTrue(await s3_utils.check_s3_for_audio(self.keys[0]))
+            self.assertTrue(await s3_utils.check_s3_for_audio(self.keys[0]))
+            # The hit is remembered, so only the first lookup asks S3
+            self.assertEqual(calls['head_object'], 1)
+        finally:
+            await close_clients()
+
+    async def test_uploads_add_their_key(self):
+        try:
+            calls = await self.count_head_calls()
+            await s3_utils.upload_to_s3(io.BytesIO(b'\xff\xfb'), 'story_audio_uploaded.mp3')
+            self.assertTrue(await s3_utils.check_s3_for_audio('story_audio_uploaded.mp3'))
+            self.assertEqual(calls['head_object'], 0)
+        finally:
+            await close_clients()
+
+    async def test_misses_reach_s3_without_negative_caching(self):
+        try:
+            calls = await self.count_head_calls()
+            for _ in range(2):
+                self.assertFalse(await s3_utils.check_s3_for_audio('story_audio_missing.mp3'))
+            self.assertEqual(calls['head_object'], 2)
+        finally:
+            await close_clients()
+
+    async def test_negative_caching_remembers_misses(self):
+        self.use_index(negative_ttl=60)
+        try:
+            calls = await self.count_head_calls()
+            for _ in range(2):
+                self.assertFalse(await s3_utils.check_s3_for_audio('story_audio_missing.mp3'))
+            self.assertEqual(calls['head_object'], 1)
+        finally:
+            await close_clients()
+
+@override_settings(IMAGE_UPLOAD_MAX_BYTES=1024 * 1024)
+class UploadSizeLimitMiddlewareTests(TestCase):
+    """story_project.asgi refuses oversized image uploads before Django reads the body"""
+
+    limit = 1024 * 1024 + MULTIPART_OVERHEAD
+
+    async def call(self, headers, chunks):
+        from story_project.asgi import application
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+            'scheme': 'http', 'path': '/api/analyze_image/', 'raw_path': b'/api/analyze_image/',
+            'query_string': b'', 'root_path': '', 'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+            'headers': [(b'host', b'testserver'), (b'content-type', b'multipart/form-data; boundary=x')] + headers,
+        }
+        messages = [{'type': 'http.request', 'body': chunk, 'more_body': True} for chunk in chunks]
+        messages.append({'type': 'http.request', 'body': b'', 'more_body': False})
+        received = []
+        sent = []
+
+        async def receive():
+            received.append(messages[len(received)])
+            return received[-1]
+
+        async def send(message):
+            sent.append(message)
+
+        await application(scope, receive, send)
+        return received, sent
+
+    async def test_oversized_content_length_is_refused_unread(self):
+        received, sent = await self.call([(b'content-length', str(self.limit + 1).encode())], [b'x' * 65536])
+        self.assertEqual(received, [])
+        self.assertEqual(sent[0]['status'], 413)
+
+    async def test_body_without_content_length_is_cut_off_at_the_limit(self):
+        chunks = [b'x' * 65536] * (2 * self.limit // 65536)
+        received, sent = await self.call([], chunks)
+        # Django stops reading at the first chunk past the limit and the middleware answers alone
+        self.assertEqual(len(received), self.limit // 65536 + 1)
+        self.assertEqual([message['status'] for message in sent if message['type'] == 'http.response.start'], [413])
+
+class SingleFlightCacheTests(TestCase):
+    """Waiting on another process's generation leaves the response cache's hit rate alone"""
+
+    async def test_polling_for_another_process_does_not_count_misses(self):
+        cache = ResponseCache('story', InProcessCacheBackend(10, 60))
+        flight = SingleFlight('story', CacheLock('default', 5), poll_interval=0.01)
+        lock_key = 'single_flight:story:key'
+        # Another process holds the lock and stores its result after a few polls
+        token = await flight.lock.acquire(lock_key)
+
+        async def other_process():
+            await asyncio.sleep(0.1)
+            await cache.set('key', 'story')
+            await flight.lock.release(lock_key, token)
+
+        async def compute():
+            raise AssertionError("the lock holder's result should be used")
+
+        holder = asyncio.ensure_future(other_process())
+        self.assertEqual(await flight.run('key', compute, lambda: cache.peek('key')), 'story')
+        await holder
+        self.assertEqual(cache.stats(), {'hits': 0, 'misses': 0, 'hit_rate': 0.0})
+
+STORY = {
+    'title': 'The Brave Little Kite',
+    'introduction': 'A small red kite lived on a windy hill.',
+    'middle': 'One day a storm carried it far over the sea.',
+    'conclusion': 'It found its way home by following the stars.',
+}
+
+@override_settings(RESPONSE_CACHE_BACKEND='memory', SINGLE_FLIGHT_BACKEND='memory')
+class StoryCacheKeyTests(TestCase):
+    """Cached stories are only served for the prompt template and model that generated them"""
+
+    def setUp(self):
+        cache_utils._caches.clear()
+        single_flight._flights.clear()
+        self.llm = mock.AsyncMock(return_value=json.dumps(STORY))
+        for name, replacement in (('call_sagemaker_llm', self.llm),
+                                  ('generate_story_images', mock.AsyncMock(return_value={})),
+                                  ('prepare_story_audio_in_background', mock.Mock())):
+            patcher = mock.patch.object(story_views, name, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def request_story(self):
+        response = await AsyncClient().post(
+            '/api/generate_story/',
+            {'prompt': 'A kite in a storm', 'response_language': 'English', 'age_group': '3-5'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.headers['X-Cache']
+
+    async def test_identical_requests_hit(self):
+        self.assertEqual([await self.request_story(), await self.request_story()], ['MISS', 'HIT'])
+        self.assertEqual(self.llm.await_count, 1)
+
+    async def test_a_new_prompt_version_misses(self):
+        await self.request_story()
+        with mock.patch.object(story_views, 'STORY_PROMPT_VERSION', story_views.STORY_PROMPT_VERSION + 1):
+            self.assertEqual(await self.request_story(), 'MISS')
+        self.assertEqual(self.llm.await_count, 2)
+
+    async def test_a_new_model_version_misses(self):
+        await self.request_story()
+        with self.settings(LLM_MODEL_VERSION='retrained'):
+            self.assertEqual(await self.request_story(), 'MISS')
+        self.assertEqual(self.llm.await_count, 2)
+
+class ResponseCacheStatsTests(TestCase):
+    async def test_hits_and_misses_are_logged_per_interval(self):
+        cache = ResponseCache('story', InProcessCacheBackend(10, 3600), stats_interval=60)
+        await cache.set('cached', 'story')
+        with mock.patch('story_app.utils.cache_utils.time.monotonic', return_value=cache._logged_at + 61), \
+                self.assertLogs('story_app.utils.cache_utils', 'INFO') as logs:
+            await cache.get('cached')
+        self.assertIn('story', logs.output[0])
+        self.assertIn('1 hits, 0 misses, hit rate 100.0%', logs.output[0])
+        await cache.get('missing')
+        with self.assertLogs('story_app.utils.cache_utils', 'INFO') as logs:
+            cache.log_stats()
+        self.assertIn('0 hits, 1 misses, hit rate 0.0%', logs.output[0])
+
+class SplitTtsTextTests(TestCase):
+    def test_sentences_end_at_the_danda(self):
+        text = 'राजा बहुत दयालु था। वह सबकी मदद करता था। एक दिन एक साधु आया।'
+        chunks = split_tts_text(text, first_max_chars=25, max_chars=25)
+        self.assertEqual(chunks, ['राजा बहुत दयालु था।', 'वह सबकी मदद करता था।', 'एक दिन एक साधु आया।'])
+
+    def test_the_first_chunk_is_capped_separately(self):
+        text = ' '.join(f'Sentence number {i} is here.' for i in range(20))
+        chunks = split_tts_text(text, first_max_chars=40, max_chars=120)
+        self.assertLessEqual(len(chunks[0]), 40)
+        self.assertTrue(all(len(chunk) <= 120 for chunk in chunks[1:]))
+        self.assertGreater(max(len(chunk) for chunk in chunks[1:]), 40)
+        self.assertTrue(all(chunk.endswith('.') for chunk in chunks))
+        self.assertEqual(' '.join(chunks).split(), text.split())
+
+    def test_paragraphs_are_kept_together_when_they_fit(self):
+        text = 'One. Two.\n\nThree.\n\nFour is here. Five is here too.'
+        chunks = split_tts_text(text, first_max_chars=40, max_chars=40)
+        # "Four is here." would fit after "Three.", but the paragraph is not split across chunks
+        self.assertEqual(chunks, ['One. Two.\n\nThree.', 'Four is here. Five is here too.'])
+
+    def test_a_sentence_over_the_limit_is_split_between_words(self):
+        chunks = split_tts_text('word ' * 30, first_max_chars=40, max_chars=40)
+        self.assertTrue(all(len(chunk) <= 40 for chunk in chunks))
+        self.assertEqual(' '.join(chunks).split(), ['word'] * 30)
+
+    def test_empty_text_has_no_chunks(self):
+        self.assertEqual(split_tts_text('\n\n  \n', first_max_chars=10, max_chars=10), [])
+
+@override_settings(TTS_FIRST_CHUNK_MAX_CHARS=20, TTS_CHUNK_MAX_CHARS=20)
+class StreamStoryAudioTests(TestCase):
+    TEXT = 'Part one here.\n\nPart two here.\n\nPart three here.'
+
+    async def test_parts_are_yielded_in_order_while_synthesized_concurrently(self):
+        started = []
+
+        async def synthesize_speech(text):
+            started.append(text)
+            # Later chunks finish first
+            await asyncio.sleep(0.03 - 0.01 * len(started))
+            return text.encode()
+
+        with mock.patch.object(tts_utils, 'synthesize_speech', synthesize_speech):
+            parts = [part async for part in stream_story_audio(self.TEXT, 'story.mp3')]
+        self.assertEqual(parts, [b'Part one here.', b'Part two here.', b'Part three here.'])
+        self.assertEqual(len(started), 3)
+
+    async def test_closing_the_stream_cancels_pending_synthesis(self):
+        cancelled = []
+
+        async def synthesize_speech(text):
+            if text != 'Part one here.':
+                try:
+                    await asyncio.Event().wait()
+                except asyncio.CancelledError:
+                    cancelled.append(text)
+                    raise
+            return text.encode()
+
+        with mock.patch.object(tts_utils, 'synthesize_speech', synthesize_speech):
+            stream = stream_story_audio(self.TEXT, 'story.mp3')
+            self.assertEqual(await stream.__anext__(), b'Part one here.')
+            # What StreamingHttpResponse does when the client disconnects
+            await stream.aclose()
+            await asyncio.sleep(0)
+        self.assertEqual(sorted(cancelled), ['Part three here.', 'Part two here.'])
+
+@override_settings(SINGLE_FLIGHT_BACKEND='memory')
+class AudioJobsTests(TestCase):
+    """Joining and queueing of audio syntheses, with TTS and S3 stubbed"""
+
+    def setUp(self):
+        single_flight._flights.clear()
+        self.syntheses = []
+        self.gates = {}
+        self.failing = set()
+
+        async def stream_story_audio(story_text, filename):
+            self.syntheses.append(filename)
+            yield b'first'
+            await self.gate(filename).wait()
+            if filename in self.failing:
+                raise RuntimeError("TTS failed")
+            yield b'second'
+
+        self.upload = mock.AsyncMock()
+        for name, replacement in (('stream_story_audio', stream_story_audio),
+                                  ('get_prepared_tts_text', mock.AsyncMock(return_value='text')),
+                                  ('upload_to_s3', self.upload),
+                                  ('check_s3_for_audio', mock.AsyncMock(return_value=False))):
+            patcher = mock.patch.object(audio_jobs, name, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def gate(self, filename):
+        return self.gates.setdefault(filename, asyncio.Event())
+
+    async def collect(self, job):
+        return [part async for part in job.iter_parts()]
+
+    async def settle(self):
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+    async def test_requests_for_the_same_audio_join_one_synthesis(self):
+        jobs = AudioJobs(workers=1, queue_size=10)
+        first = jobs.start(STORY, 'a.mp3')
+        listener = asyncio.ensure_future(self.collect(first))
+        await self.settle()
+        # A request arriving after the first part still hears the story from the start
+        second = jobs.start(STORY, 'a.mp3')
+        self.assertIs(second, first)
+        late_listener = asyncio.ensure_future(self.collect(second))
+        self.gate('a.mp3').set()
+        self.assertEqual(await listener, [b'first', b'second'])
+        self.assertEqual(await late_listener, [b'first', b'second'])
+        await self.settle()
+        self.assertEqual(self.syntheses, ['a.mp3'])
+        self.upload.assert_awaited_once()
+        self.assertEqual(self.upload.await_args.args[0].getvalue(), b'firstsecond')
+        self.assertNotIn('a.mp3', jobs.jobs)
+
+    async def test_a_request_starts_a_queued_job_at_once(self):
+        jobs = AudioJobs(workers=1, queue_size=10)
+        self.assertTrue(jobs.enqueue(STORY, 'busy.mp3'))
+        self.assertTrue(jobs.enqueue(STORY, 'queued.mp3'))
+        await self.settle()
+        # The only worker is busy, so the request does not wait behind it
+        self.assertEqual(self.syntheses, ['busy.mp3'])
+        job = jobs.start(STORY, 'queued.mp3')
+        self.gate('queued.mp3').set()
+        self.assertEqual(await self.collect(job), [b'first', b'second'])
+        self.gate('busy.mp3').set()
+        await jobs.queue.join()
+        self.assertEqual(sorted(self.syntheses), ['busy.mp3', 'queued.mp3'])
+
+    async def test_known_audio_and_a_full_queue_are_not_queued(self):
+        jobs = AudioJobs(workers=1, queue_size=1)
+        self.assertTrue(jobs.enqueue(STORY, 'a.mp3'))
+        self.assertFalse(jobs.enqueue(STORY, 'a.mp3'))
+        with self.assertLogs('story_app.utils.audio_jobs', 'WARNING'):
+            self.assertFalse(jobs.enqueue(STORY, 'b.mp3'))
+        self.assertNotIn('b.mp3', jobs.jobs)
+        self.gate('a.mp3').set()
+        await jobs.queue.join()
+
+    async def test_a_failed_synthesis_reaches_every_listener(self):
+        self.failing.add('a.mp3')
+        jobs = AudioJobs(workers=1, queue_size=10)
+        job = jobs.start(STORY, 'a.mp3')
+        listeners = [asyncio.ensure_future(self.collect(job)) for _ in range(2)]
+        await self.settle()
+        with self.assertLogs('story_app.utils.audio_jobs', 'ERROR'):
+            self.gate('a.mp3').set()
+            for listener in listeners:
+                with self.assertRaisesRegex(RuntimeError, "TTS failed"):
+                    await listener
+        self.upload.assert_not_awaited()
+
+class StorySectionParserTests(TestCase):
+    RESPONSE = '{"title": "पतंग", "introduction": "A \\"red\\" kite.\\nIt flew.", "middle": "Storm", "conclusion": "Home"}'
+
+    def test_sections_are_returned_as_their_closing_quote_arrives(self):
+        parser = StorySectionParser(('title', 'introduction', 'middle', 'conclusion'))
+        completed = []
+        for start in range(0, len(self.RESPONSE), 3):
+            for field, value in parser.feed(self.RESPONSE[start:start + 3]):
+                completed.append((field, value, start))
+        self.assertEqual([(field, value) for field, value, _ in completed], [
+            ('title', 'पतंग'), ('introduction', 'A "red" kite.\nIt flew.'), ('middle', 'Storm'), ('conclusion', 'Home'),
+        ])
+        # Each section is returned once, before the rest of the object has arrived
+        self.assertLess(completed[0][2], self.RESPONSE.index('introduction'))
+        self.assertEqual(parser.finish(), [])
+
+    def test_finish_parses_fields_the_stream_missed(self):
+        parser = StorySectionParser(('title', 'middle'))
+        self.assertEqual(parser.feed('{"\\u0074itle": "Kite", "middle": "Storm"}'), [('middle', 'Storm')])
+        self.assertEqual(parser.finish(), [('title', 'Kite')])
+        self.assertEqual(parser.sections, {'title': 'Kite', 'middle': 'Storm'})
+
+    def test_format_sse(self):
+        self.assertEqual(
+            format_sse('section', {'field': 'title', 'value': 'पतंग'}),
+            'event: section\ndata: {"field": "title", "value": "पतंग"}\n\n'.encode('utf-8')
+        )
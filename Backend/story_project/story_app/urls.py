@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import get_suggestions, generate_story, analyze_image, generate_audio
+from .views import get_suggestions, generate_story, generate_story_stream, analyze_image, generate_audio
 
 urlpatterns = [
     path('get_suggestions/', get_suggestions, name='get_suggestions'),
     path('generate_story/', generate_story, name='generate_story'),
+    path('generate_story_stream/', generate_story_stream, name='generate_story_stream'),
     path('analyze_image/', analyze_image, name='analyze_image'),
     path('generate_audio/', generate_audio, name='generate_audio'),
 ]
@@ -0,0 +1,63 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+class AudioIndex:
+    """Bounded, TTL-limited record of which audio keys exist in S3.
+
+    Entries come from our own uploads, from head_object results and from
+    periodic bucket listings. Lookups return True or False when the answer
+    is known and fresh, and None when S3 has to be asked. Misses are only
+    remembered when ``negative_ttl`` is set, because another worker may
+    upload the key at any time.
+    """
+
+    def __init__(self, max_entries, ttl, negative_ttl=0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, exists = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return exists
+
+    def _set(self, key, exists, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, exists)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def add(self, key):
+        self._set(key, True, self.ttl)
+
+    def mark_missing(self, key):
+        if self.negative_ttl:
+            self._set(key, False, self.negative_ttl)
+
+    def __len__(self):
+        return len(self._entries)
+
+_audio_index = None
+
+def get_audio_index():
+    """Return the process-wide audio index, configured from settings"""
+    global _audio_index
+    if _audio_index is None:
+        _audio_index = AudioIndex(
+            settings.AUDIO_INDEX_MAX_ENTRIES,
+            settings.AUDIO_INDEX_TTL,
+            settings.AUDIO_INDEX_NEGATIVE_TTL
+        )
+    return _audio_index
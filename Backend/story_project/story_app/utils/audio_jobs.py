@@ -0,0 +1,156 @@
+import asyncio
+import io
+import logging
+from django.conf import settings
+from .helpers import generate_audio_filename, loop_local, run_in_background
+from .s3_utils import check_s3_for_audio, iter_audio_from_s3, upload_to_s3
+from .single_flight import get_single_flight
+from .tts_utils import get_prepared_tts_text, prepare_tts_text_in_background, stream_story_audio
+
+logger = logging.getLogger(__name__)
+
+class AudioJob:
+    """Synthesis of one story's audio that any number of requests can listen to while it runs"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.parts = []
+        self.started = False
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Condition()
+
+    async def _set(self, **changes):
+        async with self._changed:
+            for name, value in changes.items():
+                setattr(self, name, value)
+            self._changed.notify_all()
+
+    async def _publish(self, part):
+        async with self._changed:
+            self.parts.append(part)
+            self._changed.notify_all()
+
+    async def _synthesize(self, story):
+        story_text = await get_prepared_tts_text(story)
+        async for part in stream_story_audio(story_text, self.filename):
+            await self._publish(part)
+        await self._set(done=True)
+        # Uploaded before returning so processes waiting on the lock find the file
+        await upload_to_s3(io.BytesIO(b''.join(self.parts)), self.filename)
+        return 'synthesized'
+
+    async def _stored(self):
+        return 'stored' if await check_s3_for_audio(self.filename) else None
+
+    async def run(self, story):
+        try:
+            # Another process may be synthesizing the same story; then its upload is read back instead
+            result = await get_single_flight('audio').run(
+                self.filename, lambda: self._synthesize(story), self._stored
+            )
+            if result == 'stored':
+                async for chunk in iter_audio_from_s3(self.filename):
+                    await self._publish(chunk)
+                await self._set(done=True)
+        except Exception as e:
+            logger.error(f"Audio synthesis for {self.filename} failed: {str(e)}")
+            if not self.done:
+                await self._set(error=e, done=True)
+
+    async def iter_parts(self):
+        """Yield every part from the first one, waiting for parts that are not synthesized yet"""
+        index = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: index < len(self.parts) or self.done)
+                parts, done, error = self.parts[index:], self.done, self.error
+            for part in parts:
+                yield part
+            index += len(parts)
+            if done and index == len(self.parts):
+                if error is not None:
+                    raise error
+                return
+
+class AudioJobs:
+    """Per-worker registry of audio syntheses, deduplicated by audio filename.
+
+    Requests that need audio now start (or join) a job directly. Background
+    pregeneration goes through a bounded queue served by a few local workers,
+    so it never competes with user requests for more than its share of TTS
+    calls. A job stays registered until its upload finishes, after which the
+    audio index answers for it.
+    """
+
+    def __init__(self, workers, queue_size):
+        self.jobs = {}
+        self.workers = workers
+        self.queue = asyncio.Queue(queue_size)
+        self._worker_tasks = []
+
+    def _run(self, job, story):
+        task = run_in_background(job.run(story), f"Audio job {job.filename}")
+        task.add_done_callback(lambda _: self.jobs.pop(job.filename, None))
+        return task
+
+    def start(self, story, filename):
+        """Return the job for this audio, starting it now if it is new or still queued"""
+        job = self.jobs.get(filename)
+        if job is None:
+            job = self.jobs[filename] = AudioJob(filename)
+        if not job.started:
+            job.started = True
+            self._run(job, story)
+        return job
+
+    def enqueue(self, story, filename):
+        """Queue background synthesis unless the audio is already known, returning whether it was queued"""
+        if filename in self.jobs:
+            return False
+        if not self._worker_tasks:
+            self._worker_tasks = [
+                run_in_background(self._work(), "Audio pregeneration worker") for _ in range(self.workers)
+            ]
+        job = AudioJob(filename)
+        try:
+            self.queue.put_nowait((job, story))
+        except asyncio.QueueFull:
+            logger.warning(f"Audio pregeneration queue full, skipping {filename}")
+            return False
+        self.jobs[filename] = job
+        return True
+
+    async def _work(self):
+        while True:
+            job, story = await self.queue.get()
+            # A request may have started the job while it was queued
+            if not job.started:
+                job.started = True
+                await asyncio.wait([self._run(job, story)])
+            self.queue.task_done()
+
+def get_audio_jobs():
+    return loop_local('audio_jobs', lambda: AudioJobs(
+        settings.AUDIO_PREGENERATION_WORKERS,
+        settings.AUDIO_PREGENERATION_QUEUE_SIZE
+    ))
+
+async def pregenerate_story_audio(story):
+    """Queue audio synthesis for a new story unless its audio already exists"""
+    filename = generate_audio_filename(story)
+    if await check_s3_for_audio(filename):
+        return
+    if get_audio_jobs().enqueue(story, filename):
+        logger.info(f"Queued audio pregeneration for {filename}")
+
+def prepare_story_audio_in_background(story):
+    """Get narration ready for a story that was just generated.
+
+    With AUDIO_PREGENERATION the full audio is synthesized ahead of the
+    request; otherwise only the TTS text is prepared.
+    """
+    if settings.AUDIO_PREGENERATION:
+        run_in_background(pregenerate_story_audio(story), "Audio pregeneration")
+    else:
+        prepare_tts_text_in_background(story)
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+def normalize_request(prompt=None, response_language=None, age_group=None, selected_words=None, **extra):
+    """Normalize generation inputs so equivalent requests map to the same cache key"""
+    normalized = {
+        'prompt': re.sub(r'\s+', ' ', prompt or '').strip(),
+        'response_language': (response_language or '').strip().lower(),
+        'age_group': (age_group or '').replace(' ', ''),
+        'selected_words': sorted({word.strip().lower() for word in selected_words or [] if word.strip()}),
+    }
+    normalized.update(extra)
+    return normalized
+
+def make_request_hash(**fields):
+    """Content hash of the normalized request, in the same MD5 scheme as audio filenames"""
+    content_string = json.dumps(normalize_request(**fields), sort_keys=True, ensure_ascii=False)
+    return hashlib.md5(content_string.encode()).hexdigest()
+
+class InProcessCacheBackend:
+    """LRU cache with per-entry TTL, local to the worker process"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class DjangoCacheBackend:
+    """Cache backed by a Django cache alias, e.g. RedisCache shared by all workers.
+
+    Expiry uses the cache timeout; LRU eviction is left to the cache server
+    (configure Redis with ``maxmemory-policy allkeys-lru``).
+    """
+
+    def __init__(self, alias, ttl):
+        self.cache = caches[alias]
+        self.ttl = ttl
+
+    async def get(self, key):
+        return await self.cache.aget(key)
+
+    async def set(self, key, value):
+        await self.cache.aset(key, value, timeout=self.ttl)
+
+class ResponseCache:
+    """Content-addressed cache in front of the LLM calls, with hit/miss counters.
+
+    The counters are per worker process. Every ``stats_interval`` seconds a
+    lookup logs the hits and misses since the previous line, tagged with the
+    pid, so summing the lines of all workers gives the service's hit rate.
+    """
+
+    def __init__(self, namespace, backend, stats_interval=0):
+        self.namespace = namespace
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.stats_interval = stats_interval
+        self._logged_at = time.monotonic()
+        self._logged_counts = (0, 0)
+
+    def make_key(self, **fields):
+        return f"{self.namespace}:{make_request_hash(**fields)}"
+
+    async def peek(self, key):
+        """Look a key up without counting a hit or miss, e.g. when polling for another process's result"""
+        try:
+            return await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Cache lookup failed for {key}: {str(e)}")
+            return None
+
+    async def get(self, key):
+        value = await self.peek(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        logger.debug(f"Cache {'hit' if value is not None else 'miss'} for {key} ({self.stats()})")
+        if self.stats_interval and time.monotonic() - self._logged_at >= self.stats_interval:
+            self.log_stats()
+        return value
+
+    def log_stats(self):
+        """Log the hits and misses since the previous call"""
+        now = time.monotonic()
+        hits = self.hits - self._logged_counts[0]
+        misses = self.misses - self._logged_counts[1]
+        lookups = hits + misses
+        logger.info(
+            f"Response cache {self.namespace} (pid {os.getpid()}): {hits} hits, {misses} misses, "
+            f"hit rate {hits / lookups if lookups else 0.0:.1%} in the last {now - self._logged_at:.0f}s"
+        )
+        self._logged_at = now
+        self._logged_counts = (self.hits, self.misses)
+
+    async def set(self, key, value):
+        try:
+            await self.backend.set(key, value)
+        except Exception as e:
+            logger.warning(f"Cache store failed for {key}: {str(e)}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+_caches = {}
+
+def get_response_cache(namespace, ttl=None, max_entries=None):
+    """Return the shared ResponseCache for a namespace using the configured backend.
+
+    ``ttl`` and ``max_entries`` override the RESPONSE_CACHE_* defaults for the
+    namespace; the size bound only applies to the in-process backend.
+    """
+    if namespace not in _caches:
+        ttl = ttl or settings.RESPONSE_CACHE_TTL
+        if settings.RESPONSE_CACHE_BACKEND == 'django':
+            backend = DjangoCacheBackend(settings.RESPONSE_CACHE_ALIAS, ttl)
+        else:
+            backend = InProcessCacheBackend(max_entries or settings.RESPONSE_CACHE_MAX_ENTRIES, ttl)
+        _caches[namespace] = ResponseCache(namespace, backend, settings.RESPONSE_CACHE_STATS_INTERVAL)
+    return _caches[namespace]
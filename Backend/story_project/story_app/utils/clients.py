@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import aiohttp
+import openai
+import requests
+from urllib3.util.retry import Retry
+from aiobotocore.config import AioConfig
+from aiobotocore.httpsession import AIOHTTPSession
+from aiobotocore.session import get_session
+from django.conf import settings
+from .helpers import loop_local
+
+logger = logging.getLogger(__name__)
+
+_session = get_session()
+
+class PoolStats:
+    """Time requests spent queued for a free pooled connection.
+
+    Only requests that find the pool full are queued, so ``waits`` staying
+    near zero means the pool is large enough for the load.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.requests = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_wait(self, seconds):
+        self.waits += 1
+        self.total_wait += seconds
+        self.max_wait = max(self.max_wait, seconds)
+        if seconds >= settings.HTTP_POOL_WAIT_WARNING:
+            logger.warning(f"{self.name} request waited {seconds:.3f}s for a pooled connection")
+
+    def snapshot(self):
+        return {
+            'requests': self.requests,
+            'waits': self.waits,
+            'total_wait': self.total_wait,
+            'max_wait': self.max_wait,
+        }
+
+_pool_stats = {}
+
+def get_pool_stats(name):
+    """Return the pool wait statistics of one client ('s3', 'sagemaker-runtime', 'openai', ...)"""
+    if name not in _pool_stats:
+        _pool_stats[name] = PoolStats(name)
+    return _pool_stats[name]
+
+def pool_trace_config(stats):
+    """aiohttp trace hooks that record pool wait time into ``stats``"""
+    async def on_request_start(session, context, params):
+        stats.requests += 1
+
+    async def on_queued_start(session, context, params):
+        context.queued_at = asyncio.get_running_loop().time()
+
+    async def on_queued_end(session, context, params):
+        stats.record_wait(asyncio.get_running_loop().time() - context.queued_at)
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_queued_start.append(on_queued_start)
+    trace_config.on_connection_queued_end.append(on_queued_end)
+    return trace_config
+
+def instrumented_http_session(stats):
+    """aiobotocore HTTP session class whose aiohttp sessions report pool waits to ``stats``"""
+    class InstrumentedAIOHTTPSession(AIOHTTPSession):
+        async def _get_session(self, proxy_url):
+            session = await super()._get_session(proxy_url)
+            # aiobotocore builds the aiohttp session itself and takes no trace configs
+            if not getattr(session, '_pool_traced', False):
+                trace_config = pool_trace_config(stats)
+                trace_config.freeze()
+                session._trace_configs.append(trace_config)
+                session._pool_traced = True
+            return session
+
+    return InstrumentedAIOHTTPSession
+
+def aws_client_config(service_name):
+    return AioConfig(
+        max_pool_connections=settings.AWS_MAX_POOL_CONNECTIONS,
+        connect_timeout=settings.AWS_CONNECT_TIMEOUT,
+        read_timeout=settings.AWS_READ_TIMEOUT,
+        retries={'mode': 'adaptive', 'max_attempts': settings.AWS_MAX_ATTEMPTS},
+        tcp_keepalive=True,
+        connector_args={'keepalive_timeout': settings.HTTP_KEEPALIVE_TIMEOUT},
+        http_session_cls=instrumented_http_session(get_pool_stats(service_name)),
+    )
+
+async def get_aws_client(service_name):
+    """Return the shared async AWS client for the given service on the running loop"""
+    # aiobotocore clients are bound to the event loop they were created on, so
+    # keep one long-lived client per service for every running loop.
+    loop_clients = loop_local('aws_clients', dict)
+    client = loop_clients.get(service_name)
+    if client is None:
+        client = await _session.create_client(
+            service_name,
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            region_name=settings.AWS_REGION,
+            endpoint_url=settings.AWS_ENDPOINT_URLS.get(service_name),
+            config=aws_client_config(service_name)
+        ).__aenter__()
+        # Another request may have created the client while we were awaiting
+        existing = loop_clients.setdefault(service_name, client)
+        if existing is not client:
+            await client.close()
+            client = existing
+    return client
+
+async def close_aws_clients():
+    """Close the AWS clients created on the running loop, e.g. before the loop shuts down"""
+    loop_clients = loop_local('aws_clients', dict)
+    while loop_clients:
+        _, client = loop_clients.popitem()
+        await client.close()
+
+def _create_openai_session():
+    connector = aiohttp.TCPConnector(
+        limit=settings.OPENAI_MAX_CONNECTIONS,
+        keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        trace_configs=[pool_trace_config(get_pool_stats('openai'))]
+    )
+
+def use_openai_session():
+    """Make the async OpenAI calls of the current task use the loop's pooled session.
+
+    openai 0.28 otherwise opens a new aiohttp session, and so a new TLS
+    connection, for every ``acreate`` call.
+    """
+    loop_sessions = loop_local('http_sessions', dict)
+    session = loop_sessions.get('openai')
+    if session is None or session.closed:
+        session = loop_sessions['openai'] = _create_openai_session()
+    openai.aiosession.set(session)
+    return session
+
+async def close_openai_session():
+    """Close the pooled OpenAI session of the running loop"""
+    session = loop_local('http_sessions', dict).pop('openai', None)
+    if session is not None:
+        await session.close()
+
+async def close_clients():
+    """Close every pooled client of the running loop"""
+    await close_aws_clients()
+    await close_openai_session()
+
+def _create_openai_requests_session():
+    adapter = requests.adapters.HTTPAdapter(
+        # Only failed connects are retried; a POST that reached OpenAI is not resent
+        max_retries=Retry(connect=settings.OPENAI_MAX_RETRIES, read=0, status=0, backoff_factor=0.5),
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    return session
+
+def configure_openai_requests_session():
+    """Give the synchronous OpenAI calls (TTS) pooled keep-alive sessions with connect retries.
+
+    openai 0.28 calls this factory once per thread and keeps the session for
+    the thread, recycling it every few minutes.
+    """
+    openai.requestssession = _create_openai_requests_session
@@ -1,10 +1,42 @@
+import asyncio
 import logging
 import re
 import hashlib
 import json
+import time
+import weakref
+from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
 
+_loop_locals = weakref.WeakKeyDictionary()
+
+def loop_local(name, factory):
+    """Return a per-event-loop singleton, creating it with factory on first use.
+
+    asyncio primitives and clients are bound to the loop that first uses them,
+    so shared state has to be kept per loop rather than at module level.
+    """
+    values = _loop_locals.setdefault(asyncio.get_running_loop(), {})
+    if name not in values:
+        values[name] = factory()
+    return values[name]
+
+_background_tasks = set()
+
+def run_in_background(coro, description='Background task'):
+    """Schedule a coroutine to outlive the current request, logging any failure"""
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+
+    def done(task):
+        _background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"{description} failed: {str(task.exception())}")
+
+    task.add_done_callback(done)
+    return task
+
 def clean_json_string(text):
     """Clean and prepare text for JSON parsing."""
     logger.debug(f"Original text received: {repr(text)}")
@@ -32,8 +64,89 @@ def clean_json_string(text):
     logger.debug(f"Final cleaned JSON string: {repr(json_str)}")
     return json_str
 
+def parse_llm_json(text):
+    """Parse model output as JSON.
+
+    Schema-constrained endpoints return a valid object as generated, so the
+    cleanup pass only runs for output from an unconstrained endpoint.
+    """
+    try:
+        return json.loads(text)
+    except ValueError:
+        logger.debug("Model output is not plain JSON, cleaning it up")
+        return json.loads(clean_json_string(text))
+
+def story_content_hash(story_content):
+    """MD5 of the story text, shared by everything derived from one story"""
+    content_string = f"{story_content['title']}{story_content['introduction']}{story_content['middle']}{story_content['conclusion']}"
+    return hashlib.md5(content_string.encode()).hexdigest()
+
 def generate_audio_filename(story_content):
     """Generate a unique filename for the audio file based on story content"""
-    content_string = f"{story_content['title']}{story_content['introduction']}{story_content['middle']}{story_content['conclusion']}"
-    filename_hash = hashlib.md5(content_string.encode()).hexdigest()
-    return f"story_audio_{filename_hash}.mp3"
+    return f"story_audio_{story_content_hash(story_content)}.mp3"
+
+class StorySectionParser:
+    """Incrementally extract top-level string fields from streamed JSON text.
+
+    Feed chunks of model output as they arrive; each call returns the
+    ``(field, value)`` pairs whose closing quote has been seen since the last call.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.sections = {}
+        self._buffer = ''
+        self._pattern = re.compile(
+            r'"(' + '|'.join(map(re.escape, fields)) + r')"\s*:\s*"((?:[^"\\]|\\.)*)"',
+            re.DOTALL
+        )
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        completed = []
+        for match in self._pattern.finditer(self._buffer):
+            field = match.group(1)
+            if field in self.sections:
+                continue
+            try:
+                value = json.loads(f'"{match.group(2)}"', strict=False)
+            except ValueError:
+                value = match.group(2)
+            self.sections[field] = value
+            completed.append((field, value))
+        return completed
+
+    def finish(self):
+        """Parse the full text for any fields the stream missed"""
+        missing = [field for field in self.fields if field not in self.sections]
+        if not missing:
+            return []
+        parsed = parse_llm_json(self._buffer)
+        completed = []
+        for field in missing:
+            self.sections[field] = parsed[field]
+            completed.append((field, parsed[field]))
+        return completed
+
+def format_sse(event, data):
+    """Encode one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
+
+class ServerTiming:
+    """Per-stage durations of one request, rendered as a ``Server-Timing`` header"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = time.perf_counter() - start
+
+    def header(self):
+        durations = {**self.durations, 'total': time.perf_counter() - self.started}
+        return ', '.join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items())
@@ -0,0 +1,153 @@
+import hashlib
+import io
+import json
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Formats the vision model accepts
+VISION_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+
+# Room for the multipart boundaries and the form's text fields around the image
+MULTIPART_OVERHEAD = 64 * 1024
+
+class InvalidImageError(ValueError):
+    """The upload is not an image that can be sent to the vision model"""
+
+class ImageTooLargeError(InvalidImageError):
+    """The upload exceeds the configured size or pixel limits"""
+
+class UploadSizeLimitMiddleware:
+    """ASGI middleware that refuses oversized uploads to ``paths`` with a 413.
+
+    Django's ASGI handler receives the whole body, spooling it to a temporary
+    file, before any view runs, so the limit has to be applied in front of it.
+    A Content-Length over the limit is refused without reading the body, and a
+    body sent without one is cut off as soon as it grows past the limit.
+    """
+
+    def __init__(self, app, paths):
+        self.app = app
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.paths:
+            return await self.app(scope, receive, send)
+        # Read per request so the limit follows the settings
+        max_bytes = settings.IMAGE_UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD
+        content_length = dict(scope['headers']).get(b'content-length', b'')
+        if content_length.isdigit() and int(content_length) > max_bytes:
+            return await self.reject(send)
+
+        received = 0
+        exceeded = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            if exceeded:
+                return {'type': 'http.disconnect'}
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > max_bytes:
+                    # Django drops a request whose client disconnects while the body is read
+                    exceeded = True
+                    return {'type': 'http.disconnect'}
+            return message
+
+        await self.app(scope, limited_receive, send)
+        if exceeded:
+            await self.reject(send)
+
+    async def reject(self, send):
+        body = json.dumps({"detail": f"Image exceeds the upload limit of {settings.IMAGE_UPLOAD_MAX_BYTES} bytes"}).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': 413,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+                        (b'connection', b'close')],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+class UploadSizeLimitHandler(FileUploadHandler):
+    """Stops parsing a multipart upload as soon as a file grows past ``max_bytes``.
+
+    Under ASGI the body has already been received by then, and bodies past
+    FILE_UPLOAD_MAX_MEMORY_SIZE spooled to disk; UploadSizeLimitMiddleware
+    refuses those earlier. This handler still keeps an oversized file from
+    being copied into the upload's memory or temporary file.
+    """
+
+    def __init__(self, max_bytes, request=None):
+        super().__init__(request)
+        self.max_bytes = max_bytes
+        self.exceeded = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_bytes:
+            self.exceeded = True
+            raise StopUpload(connection_reset=True)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+def upload_content_hash(file):
+    """SHA-256 of an uploaded file, read chunk by chunk"""
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def vision_size(width, height, max_side, short_side):
+    """Size the vision model scales an image to: fit within max_side, then shortest side at most short_side"""
+    scale = min(1.0, max_side / max(width, height))
+    scaled_short_side = min(width, height) * scale
+    if scaled_short_side > short_side:
+        scale *= short_side / scaled_short_side
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def prepare_image_for_vision(file, max_side, short_side, max_pixels, quality=85):
+    """Decode an uploaded image, shrink it to the resolution the vision model uses and re-encode it as JPEG.
+
+    The file is decoded from its upload handler storage instead of a full
+    in-memory copy, and JPEGs are decoded directly at a reduced scale, so
+    memory per request stays close to the size of the output image.
+    """
+    file.seek(0)
+    try:
+        image = Image.open(file)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e)) from e
+    except (UnidentifiedImageError, OSError) as e:
+        raise InvalidImageError("The uploaded file is not a readable image") from e
+    with image:
+        if image.format not in VISION_FORMATS:
+            raise InvalidImageError(f"Unsupported image format {image.format}; use JPEG, PNG, WEBP or GIF")
+        if image.width * image.height > max_pixels:
+            raise ImageTooLargeError(f"Image of {image.width}x{image.height} pixels exceeds the limit of {max_pixels}")
+
+        # EXIF rotation swaps the sides, so take the target size after transposing
+        rotated = image.getexif().get(0x0112, 1) in (5, 6, 7, 8)
+        width, height = (image.height, image.width) if rotated else image.size
+        target = vision_size(width, height, max_side, short_side)
+        if image.format == 'JPEG':
+            # Lets libjpeg skip most of the work by decoding at 1/2, 1/4 or 1/8 scale
+            image.draft('RGB', (target[1], target[0]) if rotated else target)
+        try:
+            image = ImageOps.exif_transpose(image)
+            if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+                # Transparent areas become white rather than black
+                rgba = image.convert('RGBA')
+                image = Image.new('RGB', rgba.size, (255, 255, 255))
+                image.paste(rgba, mask=rgba.getchannel('A'))
+            else:
+                image = image.convert('RGB')
+            if image.size != target:
+                image = image.resize(target, Image.LANCZOS)
+        except OSError as e:
+            raise InvalidImageError("The uploaded image is truncated or corrupt") from e
+
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
@@ -0,0 +1,54 @@
+import asyncio
+import logging
+import openai  # For image generation
+from django.conf import settings
+from .clients import use_openai_session
+from .helpers import loop_local
+
+logger = logging.getLogger(__name__)
+
+# Story sections that get an illustration, mapped to their image field prefix
+IMAGE_SECTIONS = {'introduction': 'intro', 'middle': 'middle'}
+
+def get_image_semaphore():
+    """Shared bound on in-flight DALL-E calls.
+
+    Both illustrations of a story are generated side by side, while the total
+    number of concurrent image requests per worker stays capped no matter how
+    many stories arrive at once.
+    """
+    return loop_local('image_semaphore', lambda: asyncio.Semaphore(settings.IMAGE_GENERATION_MAX_CONCURRENCY))
+
+async def generate_illustration(text):
+    """Generate a single illustration for a story section and return its URL"""
+    async with get_image_semaphore():
+        use_openai_session()
+        response = await openai.Image.acreate(
+            prompt=f"Generate an illustration for the following but remember NOT TO INCLUDE ANY TEXT IN THE IMAGE: {text}",
+            n=1,
+            size="1024x1024",
+            request_timeout=settings.OPENAI_REQUEST_TIMEOUT
+        )
+    return response['data'][0]['url']
+
+async def generate_section_image(name, text):
+    """Generate the illustration for one section, degrading to a null URL plus reason on failure"""
+    try:
+        url = await asyncio.wait_for(generate_illustration(text), settings.IMAGE_GENERATION_TIMEOUT)
+        return {f'{name}_image_url': url, f'{name}_image_error': None}
+    except Exception as e:
+        logger.error(f"{name.capitalize()} image generation failed: {str(e)}")
+        return {f'{name}_image_url': None, f'{name}_image_error': str(e) or e.__class__.__name__}
+
+async def generate_story_images(story_json):
+    """Generate the introduction and middle illustrations concurrently.
+
+    Each image degrades on its own: a failed generation yields a null URL and
+    the reason in the matching ``*_image_error`` field instead of failing the story.
+    """
+    logger.info("Generating introduction and middle images...")
+    intro_image, middle_image = await asyncio.gather(
+        generate_section_image('intro', story_json['introduction']),
+        generate_section_image('middle', story_json['middle'])
+    )
+    return {**intro_image, **middle_image}
@@ -0,0 +1,58 @@
+STORY_SECTIONS = ('title', 'introduction', 'middle', 'conclusion')
+
+# Part of the response cache keys: bump when a prompt template or schema
+# changes so completions generated for the old prompt are not served
+STORY_PROMPT_VERSION = 1
+SUGGESTIONS_PROMPT_VERSION = 1
+
+# JSON schemas sent with the prompts; the model server decodes under them so
+# the completion is a valid object that ends at its closing brace.
+STORY_SCHEMA = {
+    'type': 'object',
+    'properties': {section: {'type': 'string'} for section in STORY_SECTIONS},
+    'required': list(STORY_SECTIONS),
+}
+
+SUGGESTIONS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'suggestions': {'type': 'array', 'items': {'type': 'string'}, 'minItems': 5, 'maxItems': 5},
+    },
+    'required': ['suggestions'],
+}
+
+# The fixed instructions come first and the request-specific details last, so
+# every prompt shares the same leading tokens and the model server can reuse
+# its prefilled KV cache for them.
+
+def build_story_prompt(prompt, response_language, age_group, selected_words):
+    """Build the SageMaker prompt that asks for a story as a JSON object"""
+    return f"""
+Return ONLY a JSON object with this exact structure:
+{{
+    "title": "Story title here",
+    "introduction": "Introduction paragraph here",
+    "middle": "Middle paragraph here",
+    "conclusion": "Conclusion paragraph here"
+}}
+Use only basic punctuation (periods, commas, apostrophes) and avoid special characters.
+Do not include any text outside the JSON object.
+Create a story suitable for children aged {age_group}, in {response_language}, based on this prompt: "{prompt}".
+Incorporate the following words or genres if possible: {', '.join(selected_words)}.
+"""
+
+def build_suggestions_prompt(selected_words, response_language, age_group):
+    """Build the SageMaker prompt that asks for five story prompt suggestions"""
+    return f"""
+Return ONLY a JSON object with this exact structure:
+{{
+    "suggestions": ["Suggestion 1", "Suggestion 2", "Suggestion 3", "Suggestion 4", "Suggestion 5"]
+}}
+Do not include any additional text or explanations.
+Based on the following preferences, generate 5 creative and engaging prompts for stories:
+- Selected Words/Genres: {', '.join(selected_words)}
+- Response Language: {response_language}
+- Age Group: {age_group}
+
+Provide the suggestions in the specified language.
+"""
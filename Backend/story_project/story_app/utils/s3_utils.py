@@ -1,54 +1,123 @@
-import boto3
 from botocore.exceptions import ClientError
+import asyncio
 import logging
 from django.http import StreamingHttpResponse
 from django.conf import settings
+from .audio_index import get_audio_index
+from .clients import get_aws_client
+from .helpers import loop_local, run_in_background
 
 logger = logging.getLogger(__name__)
 
-# Initialize AWS S3 client
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-    region_name=settings.AWS_REGION
-)
-
 S3_BUCKET_NAME = settings.S3_BUCKET_NAME
+AUDIO_KEY_PREFIX = 'story_audio_'
+
+async def refresh_audio_index():
+    """Add every audio key in the bucket to the index with one paginated listing"""
+    s3_client = await get_aws_client('s3')
+    index = get_audio_index()
+    paginator = s3_client.get_paginator('list_objects_v2')
+    count = 0
+    async for page in paginator.paginate(Bucket=S3_BUCKET_NAME, Prefix=AUDIO_KEY_PREFIX):
+        for item in page.get('Contents', []):
+            index.add(item['Key'])
+            count += 1
+    logger.info(f"Audio index refreshed with {count} keys")
+    return count
+
+async def _refresh_audio_index_periodically(interval):
+    while True:
+        try:
+            await refresh_audio_index()
+        except Exception as e:
+            logger.warning(f"Audio index refresh failed: {str(e)}")
+        await asyncio.sleep(interval)
+
+def start_audio_index_refresh():
+    """Start the periodic bucket scan for this event loop, once"""
+    interval = settings.AUDIO_INDEX_REFRESH_INTERVAL
+    if interval:
+        loop_local('audio_index_refresh', lambda: run_in_background(
+            _refresh_audio_index_periodically(interval), "Audio index refresh"
+        ))
 
-def check_s3_for_audio(filename):
-    """Check if audio file exists in S3"""
+async def check_s3_for_audio(filename):
+    """Check if audio file exists in S3, answering from the local index when it knows"""
+    start_audio_index_refresh()
+    index = get_audio_index()
+    exists = index.get(filename)
+    if exists is not None:
+        return exists
+
+    s3_client = await get_aws_client('s3')
     try:
-        s3_client.head_object(Bucket=S3_BUCKET_NAME, Key=filename)
+        await s3_client.head_object(Bucket=S3_BUCKET_NAME, Key=filename)
+        index.add(filename)
         return True
     except ClientError as e:
         if e.response['Error']['Code'] == '404':
+            index.mark_missing(filename)
             return False
         else:
             raise e
 
-def upload_to_s3(audio_bytes, filename):
+async def upload_to_s3(audio_bytes, filename):
     """Upload audio file to S3"""
     try:
+        s3_client = await get_aws_client('s3')
         audio_bytes.seek(0)
-        s3_client.upload_fileobj(
-            audio_bytes,
-            S3_BUCKET_NAME,
-            filename,
-            ExtraArgs={'ContentType': 'audio/mpeg'}
+        await s3_client.put_object(
+            Bucket=S3_BUCKET_NAME,
+            Key=filename,
+            Body=audio_bytes,
+            ContentType='audio/mpeg'
         )
+        get_audio_index().add(filename)
         logger.info(f"Successfully uploaded {filename} to S3")
     except Exception as e:
         logger.error(f"Failed to upload to S3: {str(e)}")
         raise Exception(f"Failed to upload to S3: {str(e)}")
 
-def get_audio_stream_from_s3(filename):
+async def get_text_from_s3(key):
+    """Return a UTF-8 text object from S3, or None if it does not exist"""
+    s3_client = await get_aws_client('s3')
+    try:
+        response = await s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+            return None
+        raise e
+    async with response['Body'] as body:
+        return (await body.read()).decode('utf-8')
+
+async def upload_text_to_s3(key, text):
+    """Store a UTF-8 text object in S3"""
+    s3_client = await get_aws_client('s3')
+    await s3_client.put_object(
+        Bucket=S3_BUCKET_NAME,
+        Key=key,
+        Body=text.encode('utf-8'),
+        ContentType='text/plain; charset=utf-8'
+    )
+
+async def iter_audio_from_s3(filename, chunk_size=8192):
+    """Yield the bytes of an audio object in chunks"""
+    s3_client = await get_aws_client('s3')
+    response = await s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=filename)
+    async with response['Body'] as body:
+        async for chunk in body.iter_chunks(chunk_size=chunk_size):
+            yield chunk
+
+async def get_audio_stream_from_s3(filename):
     """Get audio file from S3 and return as StreamingHttpResponse"""
     try:
-        response = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=filename)
+        audio = iter_audio_from_s3(filename)
+        # Fetch the first chunk here so a missing object raises before the response starts
+        first_chunk = await audio.__anext__()
 
-        def iterate_response():
-            for chunk in response['Body'].iter_chunks(chunk_size=8192):
+        async def iterate_response():
+            yield first_chunk
+            async for chunk in audio:
                 yield chunk
 
         return StreamingHttpResponse(
@@ -61,3 +130,21 @@ def get_audio_stream_from_s3(filename):
     except Exception as e:
         logger.error(f"Failed to get audio from S3: {str(e)}")
         raise Exception(f"Failed to get audio from S3: {str(e)}")
+
+async def get_presigned_audio_url(filename, expires_in=None):
+    """Return a time-limited GET URL so clients can fetch audio straight from S3"""
+    try:
+        s3_client = await get_aws_client('s3')
+        return await s3_client.generate_presigned_url(
+            'get_object',
+            Params={
+                'Bucket': S3_BUCKET_NAME,
+                'Key': filename,
+                'ResponseContentType': 'audio/mpeg',
+                'ResponseContentDisposition': f'attachment; filename={filename}'
+            },
+            ExpiresIn=expires_in or settings.AUDIO_PRESIGNED_URL_TTL
+        )
+    except Exception as e:
+        logger.error(f"Failed to presign audio URL: {str(e)}")
+        raise Exception(f"Failed to presign audio URL: {str(e)}")
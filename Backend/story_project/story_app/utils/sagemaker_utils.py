@@ -1,26 +1,65 @@
 import json
-import boto3
 from django.conf import settings
-
-# Initialize AWS SageMaker Runtime client
-sagemaker_client = boto3.client(
-    'sagemaker-runtime',
-    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-    region_name=settings.AWS_REGION
-)
+from .clients import get_aws_client
 
 SAGEMAKER_ENDPOINT_NAME = settings.SAGEMAKER_ENDPOINT_NAME
 
-def call_sagemaker_llm(prompt):
+def llm_model_id():
+    """Identifies the model answering SageMaker calls, for response cache keys"""
+    return f"{SAGEMAKER_ENDPOINT_NAME}:{settings.LLM_MODEL_VERSION}"
+
+def build_request_body(prompt, schema=None, **options):
+    """JSON request for the model server; a schema turns on constrained decoding"""
+    body = {'prompt': prompt, **options}
+    if schema is not None:
+        body['schema'] = schema
+    return json.dumps(body)
+
+async def call_sagemaker_llm(prompt, schema=None):
     try:
-        response = sagemaker_client.invoke_endpoint(
+        sagemaker_client = await get_aws_client('sagemaker-runtime')
+        response = await sagemaker_client.invoke_endpoint(
             EndpointName=SAGEMAKER_ENDPOINT_NAME,
             ContentType='application/json',
-            Body=json.dumps({'prompt': prompt})
+            Body=build_request_body(prompt, schema)
         )
-        response_body = response['Body'].read()
+        async with response['Body'] as body:
+            response_body = await body.read()
         response_text = json.loads(response_body.decode('utf-8'))['generated_text']
         return response_text
     except Exception as e:
         raise Exception(f"SageMaker endpoint invocation failed: {str(e)}")
+
+async def iter_token_lines(chunks):
+    """Reassemble JSON-lines token records from arbitrarily split byte chunks"""
+    buffer = b''
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            if line.strip():
+                yield json.loads(line.decode('utf-8'))['token']
+    if buffer.strip():
+        yield json.loads(buffer.decode('utf-8'))['token']
+
+async def stream_sagemaker_llm(prompt, schema=None):
+    """Yield pieces of generated text as the endpoint streams them back"""
+    try:
+        sagemaker_client = await get_aws_client('sagemaker-runtime')
+        response = await sagemaker_client.invoke_endpoint_with_response_stream(
+            EndpointName=SAGEMAKER_ENDPOINT_NAME,
+            ContentType='application/json',
+            Body=build_request_body(prompt, schema, stream=True)
+        )
+
+        async def payload_parts():
+            async for event in response['Body']:
+                if 'PayloadPart' in event:
+                    yield event['PayloadPart']['Bytes']
+                elif 'ModelStreamError' in event:
+                    raise Exception(event['ModelStreamError'].get('Message'))
+
+        async for token in iter_token_lines(payload_parts()):
+            yield token
+    except Exception as e:
+        raise Exception(f"SageMaker endpoint streaming failed: {str(e)}")
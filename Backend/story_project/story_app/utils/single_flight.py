@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from .helpers import loop_local
+
+logger = logging.getLogger(__name__)
+
+class CacheLock:
+    """Expiring cross-process lock on a Django cache alias.
+
+    Acquiring uses the cache's atomic ``add`` (SET NX on Redis). The timeout
+    bounds how long a crashed holder can block other processes.
+    """
+
+    def __init__(self, alias, timeout):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    async def acquire(self, key):
+        token = uuid.uuid4().hex
+        if await self.cache.aadd(key, token, timeout=self.timeout):
+            return token
+        return None
+
+    async def release(self, key, token):
+        # Only delete our own lock; after a timeout another process may hold it
+        if await self.cache.aget(key) == token:
+            await self.cache.adelete(key)
+
+    async def is_locked(self, key):
+        return await self.cache.aget(key) is not None
+
+class SingleFlight:
+    """Coalesces concurrent identical generations into one upstream call.
+
+    Callers in this worker that ask for the same key while a call is running
+    await that call's result. With a cross-process lock, a worker that finds
+    another process holding the key's lock polls ``lookup`` (e.g. the response
+    cache or S3) for the other process's result instead of calling upstream
+    itself, and only computes if the holder finishes or expires without one.
+    """
+
+    def __init__(self, namespace, lock=None, poll_interval=0.5):
+        self.namespace = namespace
+        self.lock = lock
+        self.poll_interval = poll_interval
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(self, key, compute, lookup=None):
+        flights = loop_local(f'single_flight:{self.namespace}', dict)
+        task = flights.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(self._lead(key, compute, lookup))
+            flights[key] = task
+            task.add_done_callback(lambda _: flights.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shielded so one caller going away does not cancel the call the others wait on
+        return await asyncio.shield(task)
+
+    async def _lead(self, key, compute, lookup):
+        if self.lock is None or lookup is None:
+            return await compute()
+
+        lock_key = f"single_flight:{self.namespace}:{key}"
+        while True:
+            try:
+                token = await self.lock.acquire(lock_key)
+            except Exception as e:
+                logger.warning(f"Single-flight lock unavailable for {lock_key}: {str(e)}")
+                return await compute()
+            if token is not None:
+                try:
+                    return await compute()
+                finally:
+                    await self.lock.release(lock_key, token)
+
+            # Another process is computing this key; wait for its result
+            while await self.lock.is_locked(lock_key):
+                value = await lookup()
+                if value is not None:
+                    return value
+                await asyncio.sleep(self.poll_interval)
+            value = await lookup()
+            if value is not None:
+                return value
+
+_flights = {}
+
+def get_single_flight(namespace):
+    """Return the shared SingleFlight for a namespace using the configured lock backend"""
+    if namespace not in _flights:
+        lock = None
+        if settings.SINGLE_FLIGHT_BACKEND == 'django':
+            lock = CacheLock(settings.SINGLE_FLIGHT_ALIAS, settings.SINGLE_FLIGHT_LOCK_TIMEOUT)
+        _flights[namespace] = SingleFlight(namespace, lock, settings.SINGLE_FLIGHT_POLL_INTERVAL)
+    return _flights[namespace]
@@ -1,7 +1,24 @@
+import asyncio
+import re
+import logging
 import openai  # Keep OpenAI for TTS
-from .helpers import clean_json_string
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .cache_utils import get_response_cache
+from .clients import use_openai_session
+from .helpers import clean_json_string, loop_local, run_in_background, story_content_hash
+from .single_flight import get_single_flight
+from .s3_utils import get_text_from_s3, upload_text_to_s3
 
-def prepare_text_for_tts(story):
+logger = logging.getLogger(__name__)
+
+# Bump whenever the preparation prompt or model changes, so stored texts are regenerated
+TTS_PREPARATION_VERSION = 1
+
+# Sentence ends, including the Devanagari danda used in Hindi stories
+SENTENCE_END = re.compile(r'(?<=[.!?\u0964])\s+')
+
+async def prepare_text_for_tts(story):
     """Prepare story text for TTS by adding natural pauses, emphasis, and tone variations."""
     tts_prompt = f"""
 Modify this story for text-to-speech via OpenAI TTS-1-HD model by adding natural pauses, emphasis, and tone variations.
@@ -13,12 +30,139 @@ Focus on pacing, emphasis, and emotional tone.
 """
 
     # Intermediate text generation code kept without modification
-    response = openai.ChatCompletion.create(
+    use_openai_session()
+    response = await openai.ChatCompletion.acreate(
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": "You are an expert in preparing text for natural-sounding text-to-speech conversion."},
             {"role": "user", "content": tts_prompt}
-        ]
+        ],
+        request_timeout=settings.OPENAI_REQUEST_TIMEOUT
     )
     tts_text = response.choices[0].message.content
     return tts_text
+
+def prepared_text_key(story):
+    """Versioned S3 key / cache key of the prepared TTS text for a story"""
+    return f"tts_text/v{TTS_PREPARATION_VERSION}/{story_content_hash(story)}.txt"
+
+async def _stored_text(key, count=True):
+    """Prepared text from the response cache or S3, or None; ``count=False`` leaves the hit rate alone"""
+    cache = get_response_cache('tts_text')
+    tts_text = await (cache.get(key) if count else cache.peek(key))
+    if tts_text is None:
+        try:
+            tts_text = await get_text_from_s3(key)
+        except Exception as e:
+            logger.warning(f"Prepared TTS text lookup failed for {key}: {str(e)}")
+    return tts_text
+
+async def _load_or_prepare_text(story, key):
+    tts_text = await _stored_text(key)
+    if tts_text is None:
+        tts_text = await prepare_text_for_tts(story)
+        # Stored before returning so waiting processes find it once the lock is released
+        try:
+            await upload_text_to_s3(key, tts_text)
+        except Exception as e:
+            logger.warning(f"Prepared TTS text upload failed for {key}: {str(e)}")
+    await get_response_cache('tts_text').set(key, tts_text)
+    return tts_text
+
+async def get_prepared_tts_text(story):
+    """Return the prepared TTS text for a story, preparing it only if no earlier request did.
+
+    Texts are looked up by story content hash in the response cache, then in
+    S3, which keeps them across deploys and for every voice or speed. A
+    preparation already in flight for the same story, e.g. the speculative
+    one started by generate_story, is awaited instead of repeated.
+    """
+    key = prepared_text_key(story)
+    return await get_single_flight('tts_text').run(
+        key,
+        lambda: _load_or_prepare_text(story, key),
+        lambda: _stored_text(key, count=False)
+    )
+
+def prepare_tts_text_in_background(story):
+    """Start preparing TTS text for a new story so a later audio request finds it ready"""
+    if settings.TTS_SPECULATIVE_PREPARATION:
+        run_in_background(get_prepared_tts_text(story), "Speculative TTS preparation")
+
+def split_tts_text(text, first_max_chars=None, max_chars=None):
+    """Split prepared text into TTS chunks at paragraph and sentence boundaries.
+
+    Sentences are packed into chunks of at most ``max_chars``; a chunk only
+    grows past a paragraph break when the whole next paragraph still fits.
+    The first chunk is capped at ``first_max_chars`` so that its audio is
+    ready quickly.
+    """
+    first_max_chars = first_max_chars or settings.TTS_FIRST_CHUNK_MAX_CHARS
+    max_chars = max_chars or settings.TTS_CHUNK_MAX_CHARS
+    chunks, current = [], ''
+
+    def limit():
+        return first_max_chars if not chunks else max_chars
+
+    def flush():
+        nonlocal current
+        if current.strip():
+            chunks.append(current.strip())
+        current = ''
+
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 2 > limit():
+            flush()
+        separator = '\n\n' if current else ''
+        for sentence in SENTENCE_END.split(paragraph):
+            if current and len(current) + len(separator) + len(sentence) > limit():
+                flush()
+                separator = ''
+            # A single sentence longer than the limit is split between words
+            while len(sentence) > limit():
+                cut = sentence.rfind(' ', 0, limit())
+                cut = cut if cut > 0 else limit()
+                current = sentence[:cut]
+                flush()
+                sentence = sentence[cut:].strip()
+            current += separator + sentence
+            separator = ' '
+    flush()
+    return chunks
+
+def get_tts_semaphore():
+    """Shared bound on in-flight TTS calls across all stories in this worker"""
+    return loop_local('tts_semaphore', lambda: asyncio.Semaphore(settings.TTS_MAX_CONCURRENCY))
+
+async def synthesize_speech(text):
+    """Synthesize one chunk of text and return the MP3 bytes"""
+    async with get_tts_semaphore():
+        # The OpenAI client has no async variant for this call
+        response = await sync_to_async(openai.Audio.synthesize, thread_sensitive=False)(
+            model="tts-1-hd",
+            voice="onyx",
+            input=text,
+            speed=0.95,
+            request_timeout=settings.OPENAI_REQUEST_TIMEOUT,
+        )
+    return response['audio']
+
+async def stream_story_audio(story_text, filename):
+    """Yield the story's MP3 audio chunk by chunk, in order, as soon as each chunk is synthesized.
+
+    All chunks are synthesized concurrently. MP3 frames can be concatenated,
+    so the parts play back as one file. Closing the generator early cancels
+    the pending synthesis.
+    """
+    chunks = split_tts_text(story_text)
+    logger.info(f"Synthesizing {filename} in {len(chunks)} chunks")
+    tasks = [asyncio.ensure_future(synthesize_speech(chunk)) for chunk in chunks]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
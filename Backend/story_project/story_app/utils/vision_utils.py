@@ -0,0 +1,76 @@
+import base64
+import logging
+import openai  # For image analysis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .cache_utils import get_response_cache
+from .clients import use_openai_session
+from .image_preprocessing import prepare_image_for_vision, upload_content_hash
+from .single_flight import get_single_flight
+
+logger = logging.getLogger(__name__)
+
+VISION_MODEL = "gpt-4"
+# Bump when the vision prompt or image preprocessing changes so cached descriptions are not reused
+IMAGE_DESCRIPTION_VERSION = 2
+
+def get_image_description_cache():
+    return get_response_cache(
+        'image_description',
+        ttl=settings.IMAGE_DESCRIPTION_CACHE_TTL,
+        max_entries=settings.IMAGE_DESCRIPTION_CACHE_MAX_ENTRIES
+    )
+
+async def analyze_image_content(image_bytes):
+    """Ask the vision model to describe an image for use as a story prompt"""
+    base64_image = base64.b64encode(image_bytes).decode('utf-8')
+
+    use_openai_session()
+    image_analysis_response = await openai.ChatCompletion.acreate(
+        model=VISION_MODEL,
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "Describe this image in detail to use as a story prompt. Focus on the main elements, mood, and any interesting details that could inspire a story."},
+                    {
+                        "type": "image",
+                        "image": {
+                            "base64": base64_image
+                        }
+                    }
+                ]
+            }
+        ],
+        max_tokens=300,
+        request_timeout=settings.OPENAI_REQUEST_TIMEOUT
+    )
+    return image_analysis_response.choices[0].message.content
+
+async def describe_image(file):
+    """Return the vision description of an uploaded image, reusing earlier results for the same bytes.
+
+    Repeated uploads of the same drawing or photo hit the cache before the
+    image is even decoded, and identical uploads arriving together share one
+    call. New images are shrunk to the vision model's resolution first.
+    """
+    image_hash = await sync_to_async(upload_content_hash, thread_sensitive=False)(file)
+    cache = get_image_description_cache()
+    key = cache.make_key(image_hash=image_hash, model=VISION_MODEL, version=IMAGE_DESCRIPTION_VERSION)
+    description = await cache.get(key)
+    if description is not None:
+        return description
+
+    async def analyze():
+        image_bytes = await sync_to_async(prepare_image_for_vision, thread_sensitive=False)(
+            file,
+            settings.VISION_IMAGE_MAX_SIDE,
+            settings.VISION_IMAGE_SHORT_SIDE,
+            settings.IMAGE_UPLOAD_MAX_PIXELS,
+            settings.VISION_IMAGE_JPEG_QUALITY
+        )
+        description = await analyze_image_content(image_bytes)
+        await cache.set(key, description)
+        return description
+
+    return await get_single_flight('image_description').run(key, analyze, lambda: cache.peek(key))
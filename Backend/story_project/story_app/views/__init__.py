@@ -1,4 +1,4 @@
-from .story_views import generate_story
+from .story_views import generate_story, generate_story_stream
 from .suggestion_views import get_suggestions
 from .audio_views import generate_audio
 from .image_views import analyze_image
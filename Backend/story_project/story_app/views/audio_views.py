@@ -1,49 +1,65 @@
-from rest_framework.decorators import api_view
+from adrf.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
+from django.http import HttpResponseRedirect, StreamingHttpResponse
 import logging
-import io
 from ..utils.helpers import generate_audio_filename
-from ..utils.tts_utils import prepare_text_for_tts
-from ..utils.s3_utils import check_s3_for_audio, upload_to_s3, get_audio_stream_from_s3
-import openai  # For TTS
+from ..utils.audio_jobs import get_audio_jobs
+from ..utils.s3_utils import check_s3_for_audio, get_audio_stream_from_s3, get_presigned_audio_url
 
 logger = logging.getLogger(__name__)
 
+AUDIO_CACHE_HIT_MODES = ('redirect', 'url', 'stream')
+
+async def cached_audio_response(filename, mode):
+    """Serve existing audio without proxying the bytes through the worker unless asked to"""
+    if mode == 'stream':
+        return await get_audio_stream_from_s3(filename)
+    audio_url = await get_presigned_audio_url(filename)
+    if mode == 'url':
+        return Response({'audio_url': audio_url, 'expires_in': settings.AUDIO_PRESIGNED_URL_TTL})
+    # 303 makes clients follow with a GET even though this endpoint is a POST
+    response = HttpResponseRedirect(audio_url)
+    response.status_code = 303
+    return response
+
 @api_view(['POST'])
-def generate_audio(request):
+async def generate_audio(request):
     try:
         story_content = request.data.get('story_content')
         if not story_content:
             return Response({"detail": "No story content provided."}, status=status.HTTP_400_BAD_REQUEST)
+        delivery = request.data.get('delivery', settings.AUDIO_CACHE_HIT_MODE)
+        if delivery not in AUDIO_CACHE_HIT_MODES:
+            return Response({"detail": f"Unknown delivery mode: {delivery}"}, status=status.HTTP_400_BAD_REQUEST)
 
         # Generate filename based on story content
         filename = generate_audio_filename(story_content)
 
         # Check if audio already exists in S3
-        if check_s3_for_audio(filename):
+        if await check_s3_for_audio(filename):
             logger.info(f"Found existing audio file: {filename}")
-            return get_audio_stream_from_s3(filename)
-
-        # Prepare text for TTS
-        story_text = prepare_text_for_tts(story_content)
+            return await cached_audio_response(filename, delivery)
 
-        # Generate speech using OpenAI TTS
-        response = openai.Audio.synthesize(
-            model="tts-1-hd",
-            voice="onyx",
-            input=story_text,
-            speed=0.95,
-        )
-
-        # Create an in-memory bytes buffer
-        audio_bytes = io.BytesIO(response['audio'])
+        # Start synthesis, or join the job a pregeneration or concurrent request
+        # already started; the first part is awaited here so a TTS failure
+        # still returns an error status
+        audio = get_audio_jobs().start(story_content, filename).iter_parts()
+        first_part = await audio.__anext__()
 
-        # Upload to S3
-        upload_to_s3(audio_bytes, filename)
+        async def iterate_audio():
+            yield first_part
+            async for part in audio:
+                yield part
 
-        # Return the audio stream from S3
-        return get_audio_stream_from_s3(filename)
+        return StreamingHttpResponse(
+            iterate_audio(),
+            content_type="audio/mpeg",
+            headers={
+                "Content-Disposition": f"attachment; filename={filename}"
+            }
+        )
     except Exception as e:
         logging.error(f"Audio generation failed: {str(e)}")
         return Response({"detail": f"Audio generation failed: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
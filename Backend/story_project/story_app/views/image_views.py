@@ -1,100 +1,108 @@
-from rest_framework.decorators import api_view, parser_classes
+from rest_framework.decorators import parser_classes
+from adrf.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
+import asyncio
 import logging
-import base64
-import json
-import openai  # For image analysis and generation
+from django.conf import settings
 from ..serializers import StoryResponseSerializer
-from ..utils.sagemaker_utils import call_sagemaker_llm
-from ..utils.helpers import clean_json_string
+from ..utils.sagemaker_utils import call_sagemaker_llm, stream_sagemaker_llm
+from ..utils.helpers import parse_llm_json, ServerTiming, StorySectionParser
+from ..utils.image_utils import generate_story_images, generate_section_image, IMAGE_SECTIONS
+from ..utils.image_preprocessing import ImageTooLargeError, InvalidImageError, UploadSizeLimitHandler
+from ..utils.vision_utils import describe_image
+from ..utils.prompts import build_story_prompt, STORY_SCHEMA, STORY_SECTIONS
+from ..utils.audio_jobs import prepare_story_audio_in_background
 
 logger = logging.getLogger(__name__)
 
+async def generate_story_with_images(story_prompt, include_images, timing):
+    """Stream the story and start each illustration as soon as its section is parsed"""
+    parser = StorySectionParser(STORY_SECTIONS)
+    image_tasks = []
+
+    async def illustrate(name, text):
+        with timing.stage(f'{name}_image'):
+            return await generate_section_image(name, text)
+
+    def start_images(sections):
+        if include_images:
+            for field, value in sections:
+                if field in IMAGE_SECTIONS:
+                    image_tasks.append(asyncio.create_task(illustrate(IMAGE_SECTIONS[field], value)))
+
+    try:
+        with timing.stage('story'):
+            async for token in stream_sagemaker_llm(story_prompt, schema=STORY_SCHEMA):
+                start_images(parser.feed(token))
+            start_images(parser.finish())
+        images = {}
+        for image in await asyncio.gather(*image_tasks):
+            images.update(image)
+        return parser.sections, images
+    finally:
+        for image_task in image_tasks:
+            image_task.cancel()
+
 @api_view(['POST'])
 @parser_classes([MultiPartParser, FormParser])
-def analyze_image(request):
+async def analyze_image(request):
+    timing = ServerTiming()
     try:
-        file = request.FILES.get('file')
+        # Must be installed before the multipart body is parsed
+        size_limit = UploadSizeLimitHandler(settings.IMAGE_UPLOAD_MAX_BYTES, request)
+        request.upload_handlers.insert(0, size_limit)
+        with timing.stage('upload'):
+            file = request.FILES.get('file')
+        if size_limit.exceeded:
+            return Response(
+                {"detail": f"Image exceeds the upload limit of {settings.IMAGE_UPLOAD_MAX_BYTES} bytes"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        if file is None:
+            return Response({"detail": "No image file was uploaded"}, status=status.HTTP_400_BAD_REQUEST)
         prompt = request.data.get('prompt')
         response_language = request.data.get('response_language', 'Hindi')
         age_group = request.data.get('age_group', '3-5')
         selected_words = request.data.getlist('selected_words', [])
         include_images = request.data.get('include_images', 'True') == 'True'
 
-        # Read and encode the image
-        contents = file.read()
-        base64_image = base64.b64encode(contents).decode('utf-8')
-
-        # Image analysis code kept without modification
-        image_analysis_response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": "Describe this image in detail to use as a story prompt. Focus on the main elements, mood, and any interesting details that could inspire a story."},
-                        {
-                            "type": "image",
-                            "image": {
-                                "base64": base64_image
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=300
-        )
-        image_description = image_analysis_response.choices[0].message.content
+        # Repeated uploads of the same image reuse the cached description
+        try:
+            with timing.stage('vision'):
+                image_description = await describe_image(file)
+        except ImageTooLargeError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        except InvalidImageError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         # Combine image description with user prompt
         combined_prompt = f"{prompt}\nIncorporating these visual elements: {image_description}"
 
         # Build the prompt for story generation
-        story_prompt = f"""
-Create a story suitable for children aged {age_group}, in {response_language}, based on this prompt: "{combined_prompt}".
-Incorporate the following words or genres if possible: {', '.join(selected_words)}.
-Return ONLY a JSON object with this exact structure:
-{{
-    "title": "Story title here",
-    "introduction": "Introduction paragraph here",
-    "middle": "Middle paragraph here",
-    "conclusion": "Conclusion paragraph here"
-}}
-Use only basic punctuation (periods, commas, apostrophes) and avoid special characters.
-"""
-
-        # Call SageMaker LLM for story generation
-        response_text = call_sagemaker_llm(story_prompt)
-        cleaned_json = clean_json_string(response_text)
-        story_json = json.loads(cleaned_json)
+        story_prompt = build_story_prompt(combined_prompt, response_language, age_group, selected_words)
 
-        intro_image_url = None
-        middle_image_url = None
-
-        if include_images:
-            # Image generation code kept without modification
-            try:
-                logger.info("Generating introduction image...")
-                intro_image_response = openai.Image.create(
-                    prompt=f"Generate an illustration for the following but remember NOT TO INCLUDE ANY TEXT IN THE IMAGE: {story_json['introduction']}",
-                    n=1,
-                    size="1024x1024"
-                )
-                intro_image_url = intro_image_response['data'][0]['url']
+        images = {
+            'intro_image_url': None,
+            'middle_image_url': None,
+        }
 
-                logger.info("Generating middle image...")
-                middle_image_response = openai.Image.create(
-                    prompt=f"Generate an illustration for the following but remember NOT TO INCLUDE ANY TEXT IN THE IMAGE: {story_json['middle']}",
-                    n=1,
-                    size="1024x1024"
-                )
-                middle_image_url = middle_image_response['data'][0]['url']
-            except Exception as e:
-                logger.error(f"Image generation failed: {str(e)}")
-                return Response({"detail": f"Image generation failed: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if settings.ANALYZE_IMAGE_PIPELINE:
+            # Illustrations start while the rest of the story is still being generated
+            story_json, generated_images = await generate_story_with_images(story_prompt, include_images, timing)
+            images.update(generated_images)
         else:
+            # Call SageMaker LLM for story generation
+            with timing.stage('story'):
+                response_text = await call_sagemaker_llm(story_prompt, schema=STORY_SCHEMA)
+                story_json = parse_llm_json(response_text)
+            if include_images:
+                # Generate both illustrations concurrently; failures degrade per image
+                with timing.stage('images'):
+                    images = await generate_story_images(story_json)
+        prepare_story_audio_in_background(story_json)
+        if not include_images:
             logger.info("Skipping image generation as per user request.")
 
         # Return the response
@@ -103,10 +111,9 @@ Use only basic punctuation (periods, commas, apostrophes) and avoid special char
             'introduction': story_json['introduction'],
             'middle': story_json['middle'],
             'conclusion': story_json['conclusion'],
-            'intro_image_url': intro_image_url,
-            'middle_image_url': middle_image_url
+            **images
         })
-        return Response(response_serializer.data)
+        return Response(response_serializer.data, headers={'Server-Timing': timing.header()})
     except Exception as e:
         logger.error(f"Image analysis and story generation failed: {str(e)}")
         return Response({"detail": f"Image analysis and story generation failed: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1,63 +1,69 @@
-from rest_framework.decorators import api_view
+from adrf.decorators import api_view
+from rest_framework.decorators import renderer_classes
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework import status
+from django.http import StreamingHttpResponse
+import asyncio
 import logging
-import json
 from ..serializers import StoryRequestSerializer, StoryResponseSerializer
-from ..utils.sagemaker_utils import call_sagemaker_llm
-from ..utils.helpers import clean_json_string
-import openai  # For image generation
+from ..renderers import EventStreamRenderer
+from ..utils.sagemaker_utils import call_sagemaker_llm, llm_model_id, stream_sagemaker_llm
+from ..utils.helpers import parse_llm_json, StorySectionParser, format_sse
+from ..utils.image_utils import generate_story_images, generate_section_image, IMAGE_SECTIONS
+from ..utils.prompts import build_story_prompt, STORY_PROMPT_VERSION, STORY_SCHEMA, STORY_SECTIONS
+from ..utils.cache_utils import get_response_cache
+from ..utils.single_flight import get_single_flight
+from ..utils.audio_jobs import prepare_story_audio_in_background
 
 logger = logging.getLogger(__name__)
 
 @api_view(['POST'])
-def generate_story(request):
+async def generate_story(request):
     serializer = StoryRequestSerializer(data=request.data)
     if serializer.is_valid():
         prompt = serializer.validated_data.get('prompt')
         response_language = serializer.validated_data.get('response_language')
         age_group = serializer.validated_data.get('age_group')
         selected_words = serializer.validated_data.get('selected_words', [])
+        bypass_cache = serializer.validated_data.get('bypass_cache')
         try:
             logger.info(f"Received story request with prompt: {prompt}")
-            story_prompt = f"""
-Create a story suitable for children aged {age_group}, in {response_language}, based on this prompt: "{prompt}".
-Incorporate the following words or genres if possible: {', '.join(selected_words)}.
-Return ONLY a JSON object with this exact structure:
-{{
-    "title": "Story title here",
-    "introduction": "Introduction paragraph here",
-    "middle": "Middle paragraph here",
-    "conclusion": "Conclusion paragraph here"
-}}
-Use only basic punctuation (periods, commas, apostrophes) and avoid special characters.
-"""
-
-            # Call SageMaker LLM for story generation
-            response_text = call_sagemaker_llm(story_prompt)
-            cleaned_json = clean_json_string(response_text)
-            story_json = json.loads(cleaned_json)
-
-            # Image generation code kept without modification
-            try:
-                logger.info("Generating introduction image...")
-                intro_image_response = openai.Image.create(
-                    prompt=f"Generate an illustration for the following but remember NOT TO INCLUDE ANY TEXT IN THE IMAGE: {story_json['introduction']}",
-                    n=1,
-                    size="1024x1024"
-                )
-                intro_image_url = intro_image_response['data'][0]['url']
+            story_prompt = build_story_prompt(prompt, response_language, age_group, selected_words)
+
+            # Identical requests are common (suggestion chips), so look up the story first
+            story_cache = get_response_cache('story')
+            cache_key = story_cache.make_key(
+                prompt=prompt,
+                response_language=response_language,
+                age_group=age_group,
+                selected_words=selected_words,
+                prompt_version=STORY_PROMPT_VERSION,
+                model=llm_model_id()
+            )
+            story_json = None if bypass_cache else await story_cache.get(cache_key)
+            cache_status = 'HIT' if story_json is not None else 'MISS'
+
+            async def generate():
+                # Call SageMaker LLM for story generation
+                response_text = await call_sagemaker_llm(story_prompt, schema=STORY_SCHEMA)
+                generated = parse_llm_json(response_text)
+                await story_cache.set(cache_key, generated)
+                return generated
 
-                logger.info("Generating middle image...")
-                middle_image_response = openai.Image.create(
-                    prompt=f"Generate an illustration for the following but remember NOT TO INCLUDE ANY TEXT IN THE IMAGE: {story_json['middle']}",
-                    n=1,
-                    size="1024x1024"
+            if story_json is None and bypass_cache:
+                story_json = await generate()
+            elif story_json is None:
+                # Identical requests arriving together share one SageMaker call
+                story_json = await get_single_flight('story').run(
+                    cache_key, generate, lambda: story_cache.peek(cache_key)
                 )
-                middle_image_url = middle_image_response['data'][0]['url']
-            except Exception as e:
-                logger.error(f"Image generation failed: {str(e)}")
-                return Response({"detail": f"Image generation failed: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+            # Narration is prepared while the illustrations are generated
+            prepare_story_audio_in_background(story_json)
+
+            # Generate both illustrations concurrently; failures degrade per image
+            images = await generate_story_images(story_json)
 
             logger.info("Successfully generated story and images")
             response_serializer = StoryResponseSerializer({
@@ -65,12 +71,83 @@ Use only basic punctuation (periods, commas, apostrophes) and avoid special char
                 'introduction': story_json['introduction'],
                 'middle': story_json['middle'],
                 'conclusion': story_json['conclusion'],
-                'intro_image_url': intro_image_url,
-                'middle_image_url': middle_image_url
+                **images
             })
-            return Response(response_serializer.data)
+            return Response(response_serializer.data, headers={'X-Cache': cache_status})
         except Exception as e:
             logger.error(f"Story generation failed: {str(e)}", exc_info=True)
             return Response({"detail": f"Story generation failed: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     else:
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+async def generate_story_stream(request):
+    """Stream the story as server-sent events: each section as soon as it is parsed, then image URLs"""
+    serializer = StoryRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    prompt = serializer.validated_data.get('prompt')
+    response_language = serializer.validated_data.get('response_language')
+    age_group = serializer.validated_data.get('age_group')
+    selected_words = serializer.validated_data.get('selected_words', [])
+    bypass_cache = serializer.validated_data.get('bypass_cache')
+
+    async def stream_events():
+        image_tasks = {}
+        try:
+            logger.info(f"Received streaming story request with prompt: {prompt}")
+            story_cache = get_response_cache('story')
+            cache_key = story_cache.make_key(
+                prompt=prompt,
+                response_language=response_language,
+                age_group=age_group,
+                selected_words=selected_words,
+                prompt_version=STORY_PROMPT_VERSION,
+                model=llm_model_id()
+            )
+            parser = StorySectionParser(STORY_SECTIONS)
+
+            def start_images(sections):
+                # Illustrate each section as soon as its text is available
+                for field, value in sections:
+                    if field in IMAGE_SECTIONS:
+                        name = IMAGE_SECTIONS[field]
+                        image_tasks[asyncio.create_task(generate_section_image(name, value))] = name
+                return sections
+
+            story_json = None if bypass_cache else await story_cache.get(cache_key)
+            if story_json is not None:
+                sections = start_images([(field, story_json[field]) for field in STORY_SECTIONS])
+            else:
+                # Feed tokens to the parser so each section is sent the moment it closes
+                story_prompt = build_story_prompt(prompt, response_language, age_group, selected_words)
+                async for token in stream_sagemaker_llm(story_prompt, schema=STORY_SCHEMA):
+                    for field, value in start_images(parser.feed(token)):
+                        yield format_sse(field, {field: value})
+                sections = start_images(parser.finish())
+                await story_cache.set(cache_key, parser.sections)
+            prepare_story_audio_in_background(story_json or parser.sections)
+            for field, value in sections:
+                yield format_sse(field, {field: value})
+
+            pending = set(image_tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for image_task in done:
+                    yield format_sse(f'{image_tasks[image_task]}_image', image_task.result())
+
+            yield format_sse('done', {})
+        except Exception as e:
+            logger.error(f"Story streaming failed: {str(e)}", exc_info=True)
+            yield format_sse('error', {"detail": f"Story generation failed: {str(e)}"})
+        finally:
+            for image_task in image_tasks:
+                image_task.cancel()
+
+    return StreamingHttpResponse(
+        stream_events(),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -1,41 +1,43 @@
-from rest_framework.decorators import api_view
+from adrf.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 import logging
-import json
 from ..serializers import SuggestionsRequestSerializer, SuggestionsResponseSerializer
-from ..utils.sagemaker_utils import call_sagemaker_llm
-from ..utils.helpers import clean_json_string
+from ..utils.sagemaker_utils import call_sagemaker_llm, llm_model_id
+from ..utils.helpers import parse_llm_json
+from ..utils.cache_utils import get_response_cache
+from ..utils.prompts import build_suggestions_prompt, SUGGESTIONS_PROMPT_VERSION, SUGGESTIONS_SCHEMA
 
 logger = logging.getLogger(__name__)
 
 @api_view(['POST'])
-def get_suggestions(request):
+async def get_suggestions(request):
     serializer = SuggestionsRequestSerializer(data=request.data)
     if serializer.is_valid():
         selected_words = serializer.validated_data.get('selected_words')
         response_language = serializer.validated_data.get('response_language')
         age_group = serializer.validated_data.get('age_group')
-        prompt = f"""
-Based on the following preferences, generate 5 creative and engaging prompts for stories:
-- Selected Words/Genres: {', '.join(selected_words)}
-- Response Language: {response_language}
-- Age Group: {age_group}
-
-Provide the suggestions in the specified language.
-Return ONLY a JSON object with this exact structure:
-{{
-    "suggestions": ["Suggestion 1", "Suggestion 2", "Suggestion 3", "Suggestion 4", "Suggestion 5"]
-}}
-Do not include any additional text or explanations.
-"""
+        bypass_cache = serializer.validated_data.get('bypass_cache')
+        prompt = build_suggestions_prompt(selected_words, response_language, age_group)
         try:
-            response_text = call_sagemaker_llm(prompt)
-            cleaned_json = clean_json_string(response_text)
-            suggestions_json = json.loads(cleaned_json)
+            suggestions_cache = get_response_cache('suggestions')
+            cache_key = suggestions_cache.make_key(
+                response_language=response_language,
+                age_group=age_group,
+                selected_words=selected_words,
+                prompt_version=SUGGESTIONS_PROMPT_VERSION,
+                model=llm_model_id()
+            )
+            cached_suggestions = None if bypass_cache else await suggestions_cache.get(cache_key)
+            if cached_suggestions is not None:
+                return Response(cached_suggestions, headers={'X-Cache': 'HIT'})
+
+            response_text = await call_sagemaker_llm(prompt, schema=SUGGESTIONS_SCHEMA)
+            suggestions_json = parse_llm_json(response_text)
             response_serializer = SuggestionsResponseSerializer(data=suggestions_json)
             if response_serializer.is_valid():
-                return Response(response_serializer.data)
+                await suggestions_cache.set(cache_key, dict(response_serializer.data))
+                return Response(response_serializer.data, headers={'X-Cache': 'MISS'})
             else:
                 logger.error(f"Invalid response data: {response_serializer.errors}")
                 return Response({"detail": "Invalid response data"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -13,4 +13,11 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "story_project.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up
+from django.urls import reverse
+from story_app.utils.image_preprocessing import UploadSizeLimitMiddleware
+
+# Oversized image uploads are refused before Django receives the body
+application = UploadSizeLimitMiddleware(django_application, paths=[reverse('analyze_image')])
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     'rest_framework',
+    'adrf',
     'corsheaders',
     'story_app',
 ]
@@ -75,6 +76,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "story_project.wsgi.application"
+ASGI_APPLICATION = "story_project.asgi.application"
 
 
 # Database
@@ -88,6 +90,20 @@ DATABASES = {
 }
 
 
+# Caches
+# Set REDIS_URL to share caches across workers (requires the redis package)
+
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -135,10 +151,93 @@ AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 AWS_REGION = os.getenv('AWS_REGION')
 S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME')
 SAGEMAKER_ENDPOINT_NAME = os.getenv('SAGEMAKER_ENDPOINT_NAME')
+# Change when a new model is deployed behind the same endpoint, so cached completions of the old one are not served
+LLM_MODEL_VERSION = os.getenv('LLM_MODEL_VERSION', '')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
+# Optional endpoint overrides, e.g. to point at local stand-ins during development
+AWS_ENDPOINT_URLS = {
+    's3': os.getenv('S3_ENDPOINT_URL'),
+    'sagemaker-runtime': os.getenv('SAGEMAKER_RUNTIME_ENDPOINT_URL'),
+}
+
 # Configure OpenAI API key
 openai.api_key = OPENAI_API_KEY
 
+# Shared HTTP clients (see story_app/utils/clients.py)
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv('AWS_MAX_POOL_CONNECTIONS', 100))
+AWS_CONNECT_TIMEOUT = float(os.getenv('AWS_CONNECT_TIMEOUT', 5))
+AWS_READ_TIMEOUT = float(os.getenv('AWS_READ_TIMEOUT', 120))
+# Attempts per AWS call, including the first; retries use the adaptive mode's client-side rate limiting
+AWS_MAX_ATTEMPTS = int(os.getenv('AWS_MAX_ATTEMPTS', 5))
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', 100))
+OPENAI_REQUEST_TIMEOUT = float(os.getenv('OPENAI_REQUEST_TIMEOUT', 120))
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', 2))
+# Seconds an idle pooled connection is kept open for reuse
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', 60))
+# Log a warning when a request waits this many seconds for a pooled connection
+HTTP_POOL_WAIT_WARNING = float(os.getenv('HTTP_POOL_WAIT_WARNING', 0.5))
+
+# Image generation
+IMAGE_GENERATION_MAX_CONCURRENCY = int(os.getenv('IMAGE_GENERATION_MAX_CONCURRENCY', 16))
+IMAGE_GENERATION_TIMEOUT = int(os.getenv('IMAGE_GENERATION_TIMEOUT', 60))
+
+# Uploaded images for analysis: larger uploads are refused before the body is
+# received (story_project/asgi.py), accepted ones are shrunk to the size the vision model uses before sending
+IMAGE_UPLOAD_MAX_BYTES = int(os.getenv('IMAGE_UPLOAD_MAX_BYTES', 20 * 1024 * 1024))
+IMAGE_UPLOAD_MAX_PIXELS = int(os.getenv('IMAGE_UPLOAD_MAX_PIXELS', 50_000_000))
+VISION_IMAGE_MAX_SIDE = int(os.getenv('VISION_IMAGE_MAX_SIDE', 2048))
+VISION_IMAGE_SHORT_SIDE = int(os.getenv('VISION_IMAGE_SHORT_SIDE', 768))
+VISION_IMAGE_JPEG_QUALITY = int(os.getenv('VISION_IMAGE_JPEG_QUALITY', 85))
+# Stream the image-prompted story and illustrate each section as soon as it is parsed,
+# instead of waiting for the whole story before starting the illustrations. That cuts
+# one request's latency (6.0s -> 5.1s with illustrations in bench_image_pipeline), but
+# streamed invocations skip the model server's micro-batching and are capped by its
+# MAX_CONCURRENT_STREAMS, so under load the blocking, batched path serves more requests
+ANALYZE_IMAGE_PIPELINE = os.getenv('ANALYZE_IMAGE_PIPELINE', 'False') == 'True'
+
+# How cached story audio is delivered: 'redirect' (303 to a presigned S3 URL),
+# 'url' (JSON with the presigned URL) or 'stream' (proxied through Django)
+AUDIO_CACHE_HIT_MODE = os.getenv('AUDIO_CACHE_HIT_MODE', 'redirect')
+AUDIO_PRESIGNED_URL_TTL = int(os.getenv('AUDIO_PRESIGNED_URL_TTL', 60 * 60))
+
+# In-process index of existing audio keys, so the existence check skips head_object
+AUDIO_INDEX_TTL = int(os.getenv('AUDIO_INDEX_TTL', 60 * 60 * 6))
+AUDIO_INDEX_MAX_ENTRIES = int(os.getenv('AUDIO_INDEX_MAX_ENTRIES', 100000))
+# Seconds to remember that a key is missing (0 disables negative caching)
+AUDIO_INDEX_NEGATIVE_TTL = int(os.getenv('AUDIO_INDEX_NEGATIVE_TTL', 0))
+# Seconds between list_objects_v2 scans of the bucket (0 disables the scan)
+AUDIO_INDEX_REFRESH_INTERVAL = int(os.getenv('AUDIO_INDEX_REFRESH_INTERVAL', 300))
+
+# Text-to-speech: chunks are synthesized concurrently and streamed in order
+TTS_MAX_CONCURRENCY = int(os.getenv('TTS_MAX_CONCURRENCY', 16))
+TTS_CHUNK_MAX_CHARS = int(os.getenv('TTS_CHUNK_MAX_CHARS', 600))
+# The first chunk is kept short so the client starts hearing audio sooner
+TTS_FIRST_CHUNK_MAX_CHARS = int(os.getenv('TTS_FIRST_CHUNK_MAX_CHARS', 300))
+# Prepare TTS text as soon as a story is generated, before audio is requested
+TTS_SPECULATIVE_PREPARATION = os.getenv('TTS_SPECULATIVE_PREPARATION', 'True') == 'True'
+# Synthesize the full audio in the background as soon as a story is generated
+AUDIO_PREGENERATION = os.getenv('AUDIO_PREGENERATION', 'False') == 'True'
+AUDIO_PREGENERATION_WORKERS = int(os.getenv('AUDIO_PREGENERATION_WORKERS', 2))
+AUDIO_PREGENERATION_QUEUE_SIZE = int(os.getenv('AUDIO_PREGENERATION_QUEUE_SIZE', 100))
+
+# LLM response cache ('memory' for an in-process LRU, 'django' for the Django cache above)
+RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'django' if REDIS_URL else 'memory')
+RESPONSE_CACHE_ALIAS = os.getenv('RESPONSE_CACHE_ALIAS', 'default')
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 60 * 60 * 24))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 2048))
+# Seconds between the per-worker hit/miss log lines of each response cache; 0 turns them off
+RESPONSE_CACHE_STATS_INTERVAL = int(os.getenv('RESPONSE_CACHE_STATS_INTERVAL', 300))
+# Vision descriptions of uploaded images, keyed by a hash of the image bytes
+IMAGE_DESCRIPTION_CACHE_TTL = int(os.getenv('IMAGE_DESCRIPTION_CACHE_TTL', 60 * 60 * 24 * 30))
+IMAGE_DESCRIPTION_CACHE_MAX_ENTRIES = int(os.getenv('IMAGE_DESCRIPTION_CACHE_MAX_ENTRIES', 4096))
+
+# Coalescing of identical concurrent generations ('memory' within a worker,
+# 'django' to also lock across processes through the Django cache above)
+SINGLE_FLIGHT_BACKEND = os.getenv('SINGLE_FLIGHT_BACKEND', 'django' if REDIS_URL else 'memory')
+SINGLE_FLIGHT_ALIAS = os.getenv('SINGLE_FLIGHT_ALIAS', 'default')
+SINGLE_FLIGHT_LOCK_TIMEOUT = int(os.getenv('SINGLE_FLIGHT_LOCK_TIMEOUT', 180))
+SINGLE_FLIGHT_POLL_INTERVAL = float(os.getenv('SINGLE_FLIGHT_POLL_INTERVAL', 0.5))
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
@@ -0,0 +1,122 @@
+"""
+Resume and incremental re-crawl check against the local fixture site.
+
+Runs ``main.py``'s crawl in a subprocess against two fixture hosts (see
+fixture_site.py) in a temporary directory, and:
+
+1. kills the first run part way through
+2. runs again, which resumes from the crawl state and appends the rest
+3. runs again right away: only listing pages are revalidated (all 304)
+4. changes three articles and runs with revalidation forced: every article
+   gets a conditional GET, and only the changed ones are downloaded and
+   appended; reading the corpus with dedupe_key='url' keeps only their new
+   versions
+
+Usage (from LLM/Data_Preparation/Scraping_Data):
+    python benchmarks/bench_incremental.py --latency 0.05 --delay 0.05 --kill-after 1.5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRAPER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRAPER_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(SCRAPER_DIR))
+
+def run_child(base_a, base_b, delay, revalidate_after):
+    """Crawl entry point of the subprocess; paths in config are relative to its working directory"""
+    import main
+    from config.settings import WEBSITES
+    from scrapers import generic_scraper
+    for name, base_url in (('websiteA', base_a), ('websiteB', base_b)):
+        WEBSITES[name] = {**WEBSITES[name], 'base_url': base_url, 'delay': delay}
+    if revalidate_after is not None:
+        generic_scraper.ARTICLE_REVALIDATE_AFTER = revalidate_after
+    main.main()
+
+def crawl(workdir, site_urls, delay, kill_after=None, revalidate_after=None):
+    command = [sys.executable, os.path.abspath(__file__), '--child', *site_urls, '--delay', str(delay)]
+    if revalidate_after is not None:
+        command += ['--revalidate-after', str(revalidate_after)]
+    process = subprocess.Popen(command, cwd=workdir, stderr=subprocess.DEVNULL,
+                               env={**os.environ, 'PYTHONPATH': SCRAPER_DIR})
+    start = time.perf_counter()
+    try:
+        process.wait(timeout=kill_after)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    return time.perf_counter() - start
+
+def stored_stories(workdir):
+    path = os.path.join(workdir, 'stories.jsonl')
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--delay', type=float, default=0.05)
+    parser.add_argument('--kill-after', type=float, default=1.5, help="Seconds before the first run is killed")
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument('--revalidate-after', type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child, args.delay, args.revalidate_after)
+        return
+
+    from fixture_site import FixtureSite
+
+    site = FixtureSite(args.latency, pages=5, per_page=10)
+    site_urls = [f'{site.start()}/stories', f'{site.start()}/articles']
+    expected = 2 * site.pages * site.per_page
+
+    def report(name, elapsed, stories):
+        articles = sum(count for path, count in site.requests.items() if '/article/' in path)
+        listings = sum(site.requests.values()) - articles
+        not_modified = sum(site.not_modified.values())
+        urls = {story['url'] for story in stories}
+        print(f"{name:>18}: {elapsed:5.2f}s, {listings:>2} listing + {articles:>3} article requests "
+              f"({not_modified:>3} x 304), {len(stories):>3} stories stored, {len(urls):>3} distinct")
+        site.requests.clear()
+        site.not_modified.clear()
+
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            elapsed = crawl(workdir, site_urls, args.delay, kill_after=args.kill_after)
+            report('killed run', elapsed, stored_stories(workdir))
+
+            elapsed = crawl(workdir, site_urls, args.delay)
+            stories = stored_stories(workdir)
+            report('resumed run', elapsed, stories)
+            assert len({story['url'] for story in stories}) == expected
+
+            elapsed = crawl(workdir, site_urls, args.delay)
+            report('unchanged re-run', elapsed, stored_stories(workdir))
+
+            for index in (3, 17, 42):
+                site.touch(f'/stories/article/{index}')
+            elapsed = crawl(workdir, site_urls, args.delay, revalidate_after=0)
+            stories = stored_stories(workdir)
+            report('revalidating run', elapsed, stories)
+            assert len(stories) == expected + 3
+
+            from story_corpus import iter_records
+            latest = list(iter_records(os.path.join(workdir, 'stories.jsonl'), dedupe_key='url'))
+            revised = [story for story in latest if 'Revised 1' in story['content']]
+            print(f"{'read deduplicated':>18}: {len(latest)} stories, {len(revised)} of them the revised versions")
+            assert len(latest) == expected and len(revised) == 3
+    finally:
+        site.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Parser backend micro-benchmark over saved fixture pages.
+
+Saves listing and article pages from fixture_site.py into a directory (or
+uses a directory of pages saved from a real crawl, named listing_*.html and
+article_*.html). It then parses them with every backend in
+scrapers/parsers.py, using the selectors of one site config. Each backend
+runs in a fresh process, which reports pages per second and the peak RSS
+growth while parsing. The benchmark also checks that all backends extract
+the same links and text.
+
+Usage (from LLM/Data_Preparation/Scraping_Data):
+    python benchmarks/bench_parsers.py --rounds 20
+    python benchmarks/bench_parsers.py --pages-dir saved_pages --site websiteB
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRAPER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRAPER_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scrapers.parsers import PARSER_BACKENDS
+
+def save_fixture_pages(directory, articles=20):
+    from fixture_site import article_page, listing_page
+    for section, site in (('stories', 'A'), ('articles', 'B')):
+        with open(os.path.join(directory, f'listing_{site}_1.html'), 'w', encoding='utf-8') as f:
+            f.write(listing_page(section, 1, pages=2, per_page=50))
+        for index in range(articles):
+            with open(os.path.join(directory, f'article_{site}_{index}.html'), 'w', encoding='utf-8') as f:
+                f.write(article_page(section, index))
+
+def load_pages(directory, pattern):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, pattern))):
+        with open(path, 'rb') as f:
+            pages.append(f.read())
+    return pages
+
+def digest(results):
+    """Fingerprint of the extracted data, with whitespace normalised between backends"""
+    normalised = json.dumps(results, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(re.sub(r'\s+', ' ', normalised).encode('utf-8')).hexdigest()[:12]
+
+def run_backend(backend, site, directory, rounds):
+    """Child process: parse every page `rounds` times and print one JSON result line"""
+    from config.settings import WEBSITES
+    from scrapers.parsers import create_parser
+    site_key = site[-1]
+    listings = load_pages(directory, f'listing_{site_key}_*.html') or load_pages(directory, 'listing_*.html')
+    articles = load_pages(directory, f'article_{site_key}_*.html') or load_pages(directory, 'article_*.html')
+    parser = create_parser(WEBSITES[site], backend)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results = [parser.parse_listing(page) for page in listings] + [parser.parse_article(page) for page in articles]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for page in listings:
+            parser.parse_listing(page)
+        for page in articles:
+            parser.parse_article(page)
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    pages = rounds * (len(listings) + len(articles))
+    from fixture_site import PARAGRAPH
+    print(json.dumps({
+        'pages': pages,
+        'decoded': all(PARAGRAPH.split()[0] in result['content'] for result in results[len(listings):] if result),
+        'bytes': rounds * sum(map(len, listings + articles)),
+        'seconds': elapsed,
+        'peak_rss_growth_kb': rss_after - rss_before,
+        'digest': digest(results),
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages-dir', help="Directory with listing_*.html and article_*.html pages")
+    parser.add_argument('--site', default='websiteA', help="Site config whose selectors are used")
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_backend(args.child, args.site, args.pages_dir, args.rounds)
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = args.pages_dir
+        if directory is None:
+            directory = temp_dir
+            save_fixture_pages(directory)
+        print(f"{len(glob.glob(os.path.join(directory, '*.html')))} pages in {directory}, selectors of {args.site}")
+        for backend in PARSER_BACKENDS:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', backend, '--site', args.site,
+                 '--pages-dir', directory, '--rounds', str(args.rounds)],
+                capture_output=True, text=True, cwd=SCRAPER_DIR
+            )
+            if output.returncode != 0:
+                print(f"{backend:>12}: failed: {output.stderr.strip().splitlines()[-1]}")
+                continue
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            print(f"{backend:>12}: {result['pages'] / result['seconds']:7.1f} pages/s, "
+                  f"{result['bytes'] / result['seconds'] / 1e6:6.2f} MB/s, "
+                  f"peak RSS +{result['peak_rss_growth_kb'] / 1024:5.1f} MB, output {result['digest']}"
+                  f"{'' if result['decoded'] or args.pages_dir else ', text mis-decoded'}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Local HTTP fixture server for crawler benchmarks.
+
+Serves paginated story listings and article pages in the layouts of the
+'websiteA' and 'websiteB' entries in config/settings.py. Every response is
+delayed by a fixed latency to stand in for a remote site, and requests are
+counted per path. Pages carry an ETag and answer conditional GETs with 304;
+``touch`` changes an article so its ETag changes too. The 'articles' pages
+have no <meta charset>, so their UTF-8 is only declared in the HTTP header.
+"""
+
+import hashlib
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PARAGRAPH = ("एक छोटे से गाँव में एक बुद्धिमान बूढ़ी दादी रहती थीं। बच्चे हर शाम उनकी कहानियाँ सुनने आते थे। " * 6)
+
+LAYOUTS = {
+    'stories': {
+        'list': '<div class="article-list">{links}</div>',
+        'link': '<a class="article-link" href="{href}">Story {index}</a>',
+        'next': '<a class="next-page" href="{href}">Next</a>',
+        'article': ('<h1 class="article-title">Story {index}</h1>'
+                    '<div class="ad-section">Buy now!</div><aside class="sidebar">Popular stories</aside>'
+                    '<div class="article-content">{content}</div>'),
+    },
+    'articles': {
+        'list': '<ul class="articles">{links}</ul>',
+        'link': '<li><h2 class="title"><a href="{href}">Story {index}</a></h2></li>',
+        'next': '<a class="next" href="{href}">Next</a>',
+        'article': ('<h1 class="title">Story {index}</h1><div class="ads">Buy now!</div>'
+                    '<section class="content">{content}</section><nav class="pagination">1 2 3</nav>'),
+        'meta_charset': False,
+    },
+}
+
+# Site chrome around every page, roughly what a real story site sends: scripts,
+# a navigation menu and a footer full of links
+META_CHARSET = '<meta charset="utf-8">'
+HEAD = ('<title>Stories</title><style>body { font-family: sans-serif; }</style>'
+        '<script>window.dataLayer = window.dataLayer || []; function gtag() { dataLayer.push(arguments); }</script>')
+NAV = '<nav class="menu"><ul>' + ''.join(f'<li><a href="/category/{i}">श्रेणी {i}</a></li>' for i in range(120)) + '</ul></nav>'
+FOOTER = '<footer>' + ''.join(f'<a href="/tag/{i}">टैग {i}</a> ' for i in range(200)) + '</footer>'
+
+def page(section, body):
+    meta = META_CHARSET if LAYOUTS[section].get('meta_charset', True) else ''
+    return f'<!DOCTYPE html><html><head>{meta}{HEAD}</head><body>{NAV}<main>{body}</main>{FOOTER}</body></html>'
+
+def listing_page(section, page_number, pages, per_page):
+    layout = LAYOUTS[section]
+    first = (page_number - 1) * per_page
+    links = ''.join(
+        layout['link'].format(href=f'/{section}/article/{index}', index=index)
+        for index in range(first, first + per_page)
+    )
+    body = layout['list'].format(links=links)
+    if page_number < pages:
+        body += layout['next'].format(href=f'/{section}?page={page_number + 1}')
+    return page(section, body)
+
+def article_page(section, index, paragraphs=8, revision=0):
+    content = ''.join(f'<p>{PARAGRAPH}</p>' for _ in range(paragraphs)) + (f'<p>Revised {revision}</p>' if revision else '')
+    return page(section, LAYOUTS[section]['article'].format(index=index, content=content))
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients killed mid-response are expected in the resume benchmark
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class FixtureSite:
+    """Serves `pages` listing pages of `per_page` articles per section on localhost"""
+
+    def __init__(self, latency=0.05, pages=5, per_page=10):
+        self.latency = latency
+        self.pages = pages
+        self.per_page = per_page
+        self.requests = Counter()
+        self.not_modified = Counter()
+        self.revisions = Counter()
+        self._lock = threading.Lock()
+        self._servers = []
+
+    def render(self, path, query):
+        parts = path.strip('/').split('/')
+        if parts[0] not in LAYOUTS:
+            return None
+        if len(parts) == 1:
+            page_number = int(parse_qs(query).get('page', ['1'])[0])
+            return listing_page(parts[0], page_number, self.pages, self.per_page)
+        if len(parts) == 3 and parts[1] == 'article':
+            return article_page(parts[0], int(parts[2]), revision=self.revisions[path])
+        return None
+
+    def touch(self, path):
+        """Changes the content of the article at `path`"""
+        self.revisions[path] += 1
+
+    def handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                with site._lock:
+                    site.requests[url.path] += 1
+                time.sleep(site.latency)
+                html = site.render(url.path, url.query)
+                if html is None:
+                    self.send_error(404)
+                    return
+                body = html.encode('utf-8')
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    with site._lock:
+                        site.not_modified[url.path] += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self, port=0):
+        """Starts a server thread and returns its base URL; each call is a separate host"""
+        server = FixtureServer(('127.0.0.1', port), self.handler())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self._servers.append(server)
+        return f'http://127.0.0.1:{server.server_address[1]}'
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
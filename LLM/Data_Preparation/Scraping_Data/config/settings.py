@@ -21,4 +21,24 @@ WEBSITES = {
         'exclude_selectors': ['div.ads', 'nav.pagination'],
         'pagination_selector': 'a.next',
     },
-}
\ No newline at end of file
+}
+
+# Crawl engine: each site's articles are fetched by a thread pool, several
+# sites crawl at once, and every host gets at most one request per 'delay' seconds
+MAX_WORKERS_PER_SITE = 8
+MAX_CONCURRENT_SITES = 4
+REQUEST_TIMEOUT = 30
+
+# Crawl state (frontier, seen URLs and HTTP validators) and the story output,
+# which is appended to as articles are scraped so an interrupted run keeps its work
+CRAWL_STATE_PATH = 'crawl_state.sqlite3'
+# A '.jsonl.gz' path is gzip-compressed; with a shard size, stories go to
+# numbered files ('stories-00000.jsonl', ...) of at most that many stories
+STORIES_PATH = 'stories.jsonl'
+STORIES_SHARD_SIZE = None
+# Seconds before an already scraped article is checked again with a conditional GET
+ARTICLE_REVALIDATE_AFTER = 7 * 24 * 60 * 60
+
+# HTML parsing library: 'lxml' (default), 'selectolax' (pip install selectolax)
+# or 'html.parser' (BeautifulSoup); a site entry can override it with a 'parser' key
+PARSER_BACKEND = 'lxml'
\ No newline at end of file
@@ -1,18 +1,39 @@
-from config.settings import WEBSITES
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import (CRAWL_STATE_PATH, MAX_CONCURRENT_SITES, MAX_WORKERS_PER_SITE, STORIES_PATH,
+                             STORIES_SHARD_SIZE, WEBSITES)
 from scrapers.generic_scraper import GenericScraper
+from utils.crawl_state import CrawlState
+from utils.http_client import HostRateLimiter, create_session
 from utils.logger import logger
-import json
+import os
+import sys
 
-def main():
-    all_stories = []
-    for website_name in WEBSITES.keys():
-        scraper = GenericScraper(website_name)
+# story_corpus is shared with Synthetic_Data and lives one level up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from story_corpus import JsonlWriter
+
+def scrape_websites(website_names, on_story, state, max_concurrent_sites=MAX_CONCURRENT_SITES,
+                    max_workers_per_site=MAX_WORKERS_PER_SITE):
+    # One connection pool and one per-host rate limit for all sites; each site
+    # also fetches its listing pages next to the article threads
+    session = create_session((max_workers_per_site + 1) * max_concurrent_sites)
+    rate_limiter = HostRateLimiter()
+
+    def scrape(website_name):
+        scraper = GenericScraper(website_name, session=session, rate_limiter=rate_limiter,
+                                 max_workers=max_workers_per_site, state=state, on_story=on_story)
         scraper.scrape()
-        all_stories.extend(scraper.stories)
-    # Save all stories to a file
-    with open('stories.json', 'w', encoding='utf-8') as f:
-        json.dump(all_stories, f, ensure_ascii=False, indent=4)
-    logger.info(f"Successfully collected {len(all_stories)} stories.")
+
+    with ThreadPoolExecutor(max_workers=max_concurrent_sites) as executor:
+        list(executor.map(scrape, website_names))
+
+def main():
+    state = CrawlState(CRAWL_STATE_PATH)
+    # Each story is appended as one JSON line the moment it is scraped
+    with JsonlWriter(STORIES_PATH, shard_size=STORIES_SHARD_SIZE) as writer:
+        scrape_websites(list(WEBSITES.keys()), writer.write, state)
+    state.close()
+    logger.info(f"Successfully collected {writer.count} new or changed stories.")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,17 +1,23 @@
+import hashlib
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-import time
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import ARTICLE_REVALIDATE_AFTER, MAX_WORKERS_PER_SITE, PARSER_BACKEND, REQUEST_TIMEOUT
+from scrapers.parsers import create_parser
+from utils.crawl_state import CrawlState
+from utils.http_client import HostRateLimiter, create_session, declared_charset
 from utils.logger import logger
 
 class GenericScraper:
-    def __init__(self, website_name):
+    def __init__(self, website_name, session=None, rate_limiter=None, max_workers=MAX_WORKERS_PER_SITE,
+                 state=None, on_story=None):
         from config.settings import WEBSITES
+        self.website_name = website_name
         self.config = WEBSITES.get(website_name, {})
         if not self.config:
             raise ValueError(f"No configuration found for {website_name}")
         self.base_url = self.config['base_url']
         self.headers = self.config['headers']
+        # Minimum seconds between two requests to the site's host
         self.delay = self.config['delay']
         self.article_list_selector = self.config['article_list_selector']
         self.article_link_selector = self.config['article_link_selector']
@@ -19,62 +25,113 @@ class GenericScraper:
         self.article_content_selector = self.config['article_content_selector']
         self.exclude_selectors = self.config['exclude_selectors']
         self.pagination_selector = self.config.get('pagination_selector', '')
+        # Selectors are compiled once for the site by the configured parsing library
+        self.parser = create_parser(self.config, self.config.get('parser', PARSER_BACKEND))
+        self.max_workers = max_workers
+        # Shared between scrapers so sites on the same host respect one rate limit
+        self.session = session or create_session(max_workers + 1)
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        # Without a persistent state every run starts from an empty frontier
+        self.state = state or CrawlState(':memory:')
         self.stories = []
+        # Stories are handed to on_story as soon as they are scraped, or collected in self.stories
+        self.on_story = on_story or self.stories.append
 
-    def fetch_page(self, url):
+    def get(self, url, record=None):
+        """
+        GETs a URL within the host's rate limit. With the stored `record` of an earlier
+        fetch, the request is conditional and an unchanged page comes back as a 304.
+        """
+        self.rate_limiter.wait(url, self.delay)
+        headers = dict(self.headers)
+        if record and record.get('etag'):
+            headers['If-None-Match'] = record['etag']
+        if record and record.get('last_modified'):
+            headers['If-Modified-Since'] = record['last_modified']
         try:
-            response = requests.get(url, headers=self.headers)
+            response = self.session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
-            return BeautifulSoup(response.content, 'html.parser')
+            return response
         except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching {url}: {e}")
             return None
 
-    def get_article_links(self, soup):
-        article_list = soup.select_one(self.article_list_selector)
-        if not article_list:
+    def record_fetch(self, url, kind, response, status='done', **fields):
+        self.state.record_fetch(
+            url, self.website_name, kind, status,
+            etag=response.headers.get('ETag') if response is not None else None,
+            last_modified=response.headers.get('Last-Modified') if response is not None else None,
+            **fields
+        )
+
+    def scrape_listing_page(self, url):
+        """
+        Fetches one listing page, adds its articles to the frontier and returns
+        (article URLs, next page URL). An unchanged page (304) lists no new
+        articles and reuses the stored next page link.
+        """
+        record = self.state.get(url)
+        response = self.get(url, record)
+        if response is None:
+            return None, None
+        if response.status_code == 304:
+            self.record_fetch(url, 'listing', response)
+            return [], record['next_url'] or None
+        article_links, next_url = self.parser.parse_listing(response.content, declared_charset(response))
+        if article_links is None:
             logger.warning(f"No article list found for selector {self.article_list_selector}")
-            return []
-        links = article_list.select(self.article_link_selector)
-        return [link['href'] for link in links if 'href' in link.attrs]
+            article_links = []
+        self.state.add_articles(self.website_name, article_links)
+        # '' rather than None so a page that lost its next link overwrites the stored one
+        self.record_fetch(url, 'listing', response, next_url=next_url or '')
+        return article_links, next_url
 
-    def fetch_article_content(self, article_url):
-        soup = self.fetch_page(article_url)
-        if not soup:
+    def scrape_article(self, absolute_link):
+        """Fetches one article and passes it to on_story unless it is unchanged since the last run"""
+        record = self.state.get(absolute_link)
+        response = self.get(absolute_link, record)
+        if response is None:
+            self.record_fetch(absolute_link, 'article', None, status='failed')
             return None
-        for selector in self.exclude_selectors:
-            elements = soup.select(selector)
-            for elem in elements:
-                elem.decompose()
-        content_elem = soup.select_one(self.article_content_selector)
-        title_elem = soup.select_one(self.article_title_selector)
-        if content_elem and title_elem:
-            content = content_elem.get_text()
-            title = title_elem.get_text()
-            return {'title': title, 'content': content}
-        else:
-            logger.warning(f"No content or title found for {article_url}")
+        if response.status_code == 304:
+            self.record_fetch(absolute_link, 'article', response)
             return None
-
-    def get_next_page_url(self, soup):
-        next_link = soup.select_one(self.pagination_selector)
-        if next_link and 'href' in next_link.attrs:
-            return urljoin(self.base_url, next_link['href'])
-        else:
+        content_data = self.parser.parse_article(response.content, declared_charset(response))
+        if not content_data:
+            logger.warning(f"No content or title found for {absolute_link}")
+            self.record_fetch(absolute_link, 'article', response, status='failed')
             return None
+        content_data['url'] = absolute_link
+        content_hash = hashlib.sha256(f"{content_data['title']}\n{content_data['content']}".encode('utf-8')).hexdigest()
+        # Servers without validators answer 200 every time; skip stories whose text did not change
+        if not record or record.get('content_hash') != content_hash:
+            self.on_story(content_data)
+        self.record_fetch(absolute_link, 'article', response, content_hash=content_hash)
+        return content_data
 
     def scrape(self):
-        current_url = self.base_url
-        while current_url:
-            soup = self.fetch_page(current_url)
-            if not soup:
-                break
-            article_links = self.get_article_links(soup)
-            for link in article_links:
-                absolute_link = urljoin(self.base_url, link)
-                content_data = self.fetch_article_content(absolute_link)
-                if content_data:
-                    content_data['url'] = absolute_link
-                    self.stories.append(content_data)
-                time.sleep(self.delay)
-            current_url = self.get_next_page_url(soup)
\ No newline at end of file
+        """
+        Follows the listing pages one after another while a thread pool fetches
+        the articles of each page that are new, failed before or due for
+        revalidation. Articles left in the frontier by an interrupted run are
+        fetched at the end.
+        """
+        submitted = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            current_url = self.base_url
+            pending = []
+            while current_url:
+                article_links, current_url = self.scrape_listing_page(current_url)
+                if article_links is None:
+                    break
+                due = self.state.articles_to_fetch(self.website_name, ARTICLE_REVALIDATE_AFTER, article_links)
+                submitted.update(due)
+                pending.append(executor.map(self.scrape_article, due))
+            leftover = [
+                url for url in self.state.articles_to_fetch(self.website_name, ARTICLE_REVALIDATE_AFTER)
+                if url not in submitted
+            ]
+            pending.append(executor.map(self.scrape_article, leftover))
+            for page_results in pending:
+                list(page_results)
+        return self.stories
@@ -0,0 +1,179 @@
+import re
+from urllib.parse import urljoin
+
+# Never part of an article's visible text
+NON_TEXT_SELECTOR = 'script, style, template'
+
+# <meta charset="..."> or <meta http-equiv="Content-Type" content="...; charset=...">
+META_CHARSET = re.compile(rb'<meta[^>]+charset', re.IGNORECASE)
+
+class PageParser:
+    """
+    Extracts listings and articles from raw HTML with the CSS selectors of one
+    site's configuration. Subclasses wrap one parsing library; selectors are
+    compiled once per site in `compile` instead of on every page. Pages given
+    as bytes are decoded with `encoding`, the charset of the HTTP response,
+    which takes precedence over the page's own <meta charset>.
+    """
+
+    def __init__(self, config):
+        self.base_url = config['base_url']
+        self.article_list = self.compile(config['article_list_selector'])
+        self.article_link = self.compile(config['article_link_selector'])
+        self.article_title = self.compile(config.get('article_title_selector', ''))
+        self.article_content = self.compile(config['article_content_selector'])
+        self.excluded = [self.compile(selector) for selector in config['exclude_selectors']]
+        self.pagination = self.compile(config.get('pagination_selector', ''))
+
+    def compile(self, selector):
+        return selector
+
+    def parse_listing(self, html, encoding=None):
+        """Returns the absolute article URLs of a listing page, or None without an article list, and the next page URL"""
+        root = self.parse(html, encoding)
+        article_list = self.select_one(root, self.article_list)
+        links = None
+        if article_list is not None:
+            links = [urljoin(self.base_url, href) for href in
+                     (self.attribute(link, 'href') for link in self.select(article_list, self.article_link))
+                     if href is not None]
+        next_link = self.select_one(root, self.pagination)
+        next_href = self.attribute(next_link, 'href') if next_link is not None else None
+        return links, urljoin(self.base_url, next_href) if next_href is not None else None
+
+    def parse_article(self, html, encoding=None):
+        """Returns {'title', 'content'} of an article page, or None when either is missing"""
+        root = self.parse(html, encoding)
+        for selector in self.excluded:
+            self.remove(root, selector)
+        content_elem = self.select_one(root, self.article_content)
+        title_elem = self.select_one(root, self.article_title)
+        if content_elem is None or title_elem is None:
+            return None
+        return {'title': self.text(title_elem), 'content': self.text(content_elem)}
+
+class BeautifulSoupParser(PageParser):
+    """BeautifulSoup with Python's html.parser, the scraper's original parsing path"""
+
+    def __init__(self, config):
+        import soupsieve
+        from bs4 import BeautifulSoup
+        self._soupsieve = soupsieve
+        self._soup = BeautifulSoup
+        super().__init__(config)
+
+    def compile(self, selector):
+        return self._soupsieve.compile(selector) if selector else None
+
+    def parse(self, html, encoding=None):
+        if isinstance(html, bytes) and encoding:
+            return self._soup(html, 'html.parser', from_encoding=encoding)
+        return self._soup(html, 'html.parser')
+
+    def select(self, node, selector):
+        return selector.select(node) if selector else []
+
+    def select_one(self, node, selector):
+        return selector.select_one(node) if selector else None
+
+    def remove(self, root, selector):
+        for elem in self.select(root, selector):
+            elem.decompose()
+
+    def attribute(self, node, name):
+        return node.get(name)
+
+    def text(self, node):
+        return node.get_text()
+
+class LxmlParser(PageParser):
+    """lxml's libxml2 HTML parser with selectors compiled to XPath by cssselect"""
+
+    def __init__(self, config):
+        import lxml.html
+        from lxml.cssselect import CSSSelector
+        self._html = lxml.html
+        self._css = CSSSelector
+        self._non_text = CSSSelector(NON_TEXT_SELECTOR)
+        super().__init__(config)
+
+    def compile(self, selector):
+        return self._css(selector) if selector else None
+
+    def parse(self, html, encoding=None):
+        # libxml2 rejects empty documents, which the other backends parse as empty pages
+        if not html.strip():
+            return self._html.document_fromstring('<html></html>')
+        if isinstance(html, bytes) and encoding is None and not META_CHARSET.search(html[:1024]):
+            # libxml2 reads undeclared bytes as Latin-1; treat them as UTF-8 like the other backends
+            encoding = 'utf-8'
+        if isinstance(html, bytes) and encoding:
+            # A parser per page: lxml parsers must not be shared between the crawl threads
+            return self._html.document_fromstring(html, parser=self._html.HTMLParser(encoding=encoding))
+        return self._html.document_fromstring(html)
+
+    def select(self, node, selector):
+        return selector(node) if selector is not None else []
+
+    def select_one(self, node, selector):
+        matches = self.select(node, selector)
+        return matches[0] if matches else None
+
+    def remove(self, root, selector):
+        for elem in self.select(root, selector):
+            # drop_tree keeps the text that follows the element, like decompose
+            elem.drop_tree()
+
+    def attribute(self, node, name):
+        return node.get(name)
+
+    def text(self, node):
+        for elem in self._non_text(node):
+            elem.drop_tree()
+        return node.text_content()
+
+class SelectolaxParser(PageParser):
+    """selectolax's Lexbor engine; Lexbor has no reusable compiled selectors, so they stay strings"""
+
+    def __init__(self, config):
+        from selectolax.lexbor import LexborHTMLParser
+        self._parser = LexborHTMLParser
+        super().__init__(config)
+
+    def parse(self, html, encoding=None):
+        if isinstance(html, bytes) and encoding:
+            html = html.decode(encoding, errors='replace')
+        return self._parser(html, encoding=True) if isinstance(html, bytes) else self._parser(html)
+
+    def select(self, node, selector):
+        return node.css(selector) if selector else []
+
+    def select_one(self, node, selector):
+        return node.css_first(selector) if selector else None
+
+    def remove(self, root, selector):
+        for elem in self.select(root, selector):
+            elem.decompose()
+
+    def attribute(self, node, name):
+        return node.attributes.get(name)
+
+    def text(self, node):
+        for elem in node.css(NON_TEXT_SELECTOR):
+            elem.decompose()
+        return node.text(deep=True)
+
+PARSER_BACKENDS = {
+    'html.parser': BeautifulSoupParser,
+    'lxml': LxmlParser,
+    'selectolax': SelectolaxParser,
+}
+
+def create_parser(config, backend):
+    """Builds the page parser for one site config with the named backend"""
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend {backend}; choose one of {', '.join(PARSER_BACKENDS)}")
+    try:
+        return PARSER_BACKENDS[backend](config)
+    except ImportError as e:
+        raise ImportError(f"Parser backend {backend} is not installed: {e}") from e
@@ -0,0 +1,107 @@
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    site TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT,
+    next_url TEXT,
+    fetched_at REAL
+)
+"""
+
+# Serves the frontier query of a full crawl, which scans one site's articles
+INDEX = "CREATE INDEX IF NOT EXISTS pages_site_kind_status ON pages (site, kind, status)"
+
+# Stays under SQLITE_MAX_VARIABLE_NUMBER (999 before SQLite 3.32)
+MAX_QUERY_URLS = 500
+
+class CrawlState:
+    """
+    SQLite record of every URL a crawl has seen. Articles that were discovered
+    but not fetched yet form the frontier that an interrupted run resumes from,
+    and fetched pages keep their ETag/Last-Modified for conditional GETs.
+    One instance can be shared by all crawl threads.
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            if path != ':memory:':
+                self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(SCHEMA)
+            self._conn.execute(INDEX)
+
+    def get(self, url):
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM pages WHERE url = ?', (url,)).fetchone()
+        return dict(row) if row else None
+
+    def add_articles(self, site, urls):
+        """Adds newly discovered article URLs to the frontier; known URLs are left as they are"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO pages (url, site, kind) VALUES (?, ?, 'article')",
+                [(url, site) for url in urls]
+            )
+
+    def articles_to_fetch(self, site, revalidate_after, urls=None):
+        """
+        Articles of `site` that were never fetched successfully, or whose last fetch is
+        older than `revalidate_after` seconds, in discovery order. With `urls`, only
+        those articles are considered.
+        """
+        cutoff = time.time() - revalidate_after
+        due = "kind = 'article' AND (status != 'done' OR fetched_at < ?)"
+        if urls is None:
+            with self._lock:
+                rows = self._conn.execute(f"SELECT url FROM pages WHERE site = ? AND {due} ORDER BY rowid",
+                                          (site, cutoff))
+                return [row['url'] for row in rows]
+
+        # A listing page's links are looked up by primary key instead of scanning the site;
+        # the unary + keeps SQLite from preferring the (site, kind, status) index for longer lists
+        urls = list(dict.fromkeys(urls))
+        rows = []
+        with self._lock:
+            for start in range(0, len(urls), MAX_QUERY_URLS):
+                chunk = urls[start:start + MAX_QUERY_URLS]
+                rows += self._conn.execute(
+                    f"SELECT rowid, url FROM pages WHERE url IN ({', '.join('?' * len(chunk))}) "
+                    f"AND +site = ? AND {due}",
+                    (*chunk, site, cutoff)
+                ).fetchall()
+        return [row['url'] for row in sorted(rows, key=lambda row: row['rowid'])]
+
+    def record_fetch(self, url, site, kind, status, etag=None, last_modified=None, content_hash=None, next_url=None):
+        """
+        Stores the outcome of a fetch. Validators, hash and next page link are kept
+        from the previous fetch when the new one does not provide them (e.g. a 304).
+        """
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO pages (url, site, kind, status, etag, last_modified, content_hash, next_url, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    status = excluded.status,
+                    etag = COALESCE(excluded.etag, etag),
+                    last_modified = COALESCE(excluded.last_modified, last_modified),
+                    content_hash = COALESCE(excluded.content_hash, content_hash),
+                    next_url = COALESCE(excluded.next_url, next_url),
+                    fetched_at = excluded.fetched_at
+                """,
+                (url, site, kind, status, etag, last_modified, content_hash, next_url, time.time())
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
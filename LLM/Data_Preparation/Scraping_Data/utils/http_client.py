@@ -0,0 +1,50 @@
+import threading
+import time
+from email.message import Message
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+def create_session(pool_size, retries=3):
+    """
+    Creates a requests session with a connection pool large enough for all crawl threads.
+    Connections are kept alive between requests, and failed GETs are retried with backoff.
+    """
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(total=retries, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+    )
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def declared_charset(response):
+    """
+    The charset of a response's Content-Type header, or None without one.
+    Unlike response.encoding, it does not default to ISO-8859-1 for text/html.
+    """
+    message = Message()
+    message['Content-Type'] = response.headers.get('Content-Type', '')
+    return message.get_content_charset()
+
+class HostRateLimiter:
+    """
+    Spaces out requests to the same host by at least `interval` seconds.
+    Threads fetching from different hosts never wait for each other.
+    """
+
+    def __init__(self):
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url, interval):
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + interval
+        if slot > now:
+            time.sleep(slot - now)
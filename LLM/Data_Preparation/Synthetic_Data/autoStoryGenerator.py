@@ -1,42 +1,67 @@
 import google.generativeai as genai
 from dotenv import load_dotenv
-from storyExtractor import process_stories
+from google.api_core import exceptions as google_exceptions
+from generation import GenerationCheckpoint, TokenBucket, generate_stories
+from storyExtractor import JsonlWriter
 import os
-import time
-
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel("gemini-1.5-flash")
 
 age = ""
 length = " 500 words"
 
 genres = [""]
 
-append_flag = False
+stories_per_genre = 100
 
-for genre in genres:
-    for i in range(100):
-        try:
-            prompt = (
-                f"Generate a story in Hindi for children aged {age}. "
-                f"The genre should be {genre}. The story should be approximately {length}. "
-                "Use diverse and unique characters in each story. Incorporate multiple characters where necessary. "
-                "Use unique and intriguing character names and storylines. "
-                "Ensure the story is engaging and worth reading. "
-                "Your response should follow this exact format: "
-                "Story [story number]: Title: [Title of story] Story: [Story content] Moral: [Moral of the story] "
-                "DO NOT use markdown language in the response. "
-                "Ensure the story length is strictly close to {length}."
-            )
-            response = model.generate_content(prompt)
-            story_content = response.text
+# Requests run concurrently, within the provider's requests-per-minute quota
+WORKERS = 8
+REQUESTS_PER_MINUTE = 55
+MAX_RETRIES = 5
+
+# Stories are appended one JSON line at a time; the checkpoint lists the
+# (genre, index) pairs already saved, so a rerun generates only the missing ones
+OUTPUT_PATH = "temp.jsonl"
+CHECKPOINT_PATH = "temp.checkpoint.jsonl"
+
+# Quota and transient server errors are retried with backoff
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
 
-            process_stories(story_content, "temp.json", append=append_flag, theme="", genre=genre)
-            append_flag = True
+def build_prompt(genre):
+    return (
+        f"Generate a story in Hindi for children aged {age}. "
+        f"The genre should be {genre}. The story should be approximately {length}. "
+        "Use diverse and unique characters in each story. Incorporate multiple characters where necessary. "
+        "Use unique and intriguing character names and storylines. "
+        "Ensure the story is engaging and worth reading. "
+        "Your response should follow this exact format: "
+        "Story [story number]: Title: [Title of story] Story: [Story content] Moral: [Moral of the story] "
+        "DO NOT use markdown language in the response. "
+        "Ensure the story length is strictly close to {length}."
+    )
 
-        except Exception as e:
-            print(f"Error generating story for genre {genre}, iteration {i}: {e}")
+def main():
+    load_dotenv()
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    model = genai.GenerativeModel("gemini-1.5-flash")
+
+    def generate(prompt):
+        return model.generate_content(prompt).text
+
+    checkpoint = GenerationCheckpoint(CHECKPOINT_PATH)
+    with JsonlWriter(OUTPUT_PATH) as writer:
+        try:
+            completed, failed = generate_stories(
+                generate, build_prompt, genres, stories_per_genre, writer, checkpoint,
+                TokenBucket.per_minute(REQUESTS_PER_MINUTE), WORKERS,
+                retryable=RETRYABLE_ERRORS, max_retries=MAX_RETRIES
+            )
+        finally:
+            checkpoint.close()
+    print(f"Generated {completed} responses, {failed} failed; {len(checkpoint.completed)} done in total.")
 
-        # Pause to avoid hitting rate limits
-        time.sleep(1.08)
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Story corpus write and read benchmark.
+
+Saves the same synthetic Hindi stories through process_stories into a JSON
+Lines corpus (plain, gzip-compressed and sharded), and through the old
+save_to_json path that reloads and rewrites a JSON array for every story.
+It reports stories per second, file size, and how long and how much peak
+memory it takes to read the corpus back with story_corpus.iter_records
+compared to json.load.
+
+Usage (from LLM/Data_Preparation/Synthetic_Data):
+    python benchmarks/bench_corpus_output.py --stories 1000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storyExtractor import JsonlWriter, process_stories
+from story_corpus import iter_records
+
+def story_text(index, words):
+    body = ' '.join(f'कहानी{index}शब्द{i}' for i in range(words))
+    return f"Title: कहानी {index}\nStory: {body}\nMoral: सच्चाई की जीत होती है।\n"
+
+def save_to_json(details, filename, append=False):
+    """The extractor's previous output path: the whole file is loaded and rewritten for every story"""
+    data = []
+    if append and os.path.exists(filename):
+        with open(filename, 'r', encoding='utf-8') as jsonfile:
+            data = json.load(jsonfile)
+    data.append(details)
+    with open(filename, 'w', encoding='utf-8') as jsonfile:
+        json.dump(data, jsonfile, ensure_ascii=False, indent=4)
+
+def size_of(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+def measure_read(read):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = read()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stories', type=int, default=1000)
+    parser.add_argument('--words', type=int, default=500)
+    parser.add_argument('--shard-size', type=int, default=500)
+    args = parser.parse_args()
+
+    texts = [story_text(index, args.words) for index in range(args.stories)]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        json_path = os.path.join(workdir, 'stories.json')
+        start = time.perf_counter()
+        for index, text in enumerate(texts):
+            save_to_json({'Title': f'कहानी {index}', 'Story': text}, json_path, append=index > 0)
+        elapsed = time.perf_counter() - start
+        print(f"{'JSON array rewrite':>22}: {args.stories / elapsed:8.0f} stories/s, {size_of(json_path) / 1e6:6.1f} MB")
+
+        corpora = [
+            ('JSONL', os.path.join(workdir, 'stories.jsonl'), None),
+            ('JSONL gzip', os.path.join(workdir, 'stories.jsonl.gz'), None),
+            ('JSONL sharded', os.path.join(workdir, 'shards', 'stories.jsonl'), args.shard_size),
+        ]
+        for name, path, shard_size in corpora:
+            start = time.perf_counter()
+            with JsonlWriter(path, shard_size=shard_size, append=False) as writer:
+                for text in texts:
+                    process_stories(text, writer, genre='benchmark')
+            elapsed = time.perf_counter() - start
+            location = os.path.dirname(path) if shard_size else path
+            print(f"{name:>22}: {args.stories / elapsed:8.0f} stories/s, {size_of(location) / 1e6:6.1f} MB")
+            assert writer.count == args.stories
+
+        def load_json():
+            with open(json_path, encoding='utf-8') as f:
+                return len(json.load(f))
+
+        def stream(path):
+            return lambda: sum(1 for _ in iter_records(path))
+
+        print()
+        for name, read in (('json.load', load_json),
+                           ('iter_records JSONL', stream(corpora[0][1])),
+                           ('iter_records gzip', stream(corpora[1][1])),
+                           ('iter_records shards', stream(corpora[2][1]))):
+            count, elapsed, peak = measure_read(read)
+            assert count == args.stories
+            print(f"{name:>22}: {count / elapsed:8.0f} stories/s read, peak {peak / 1e6:6.1f} MB")
+
+if __name__ == '__main__':
+    main()
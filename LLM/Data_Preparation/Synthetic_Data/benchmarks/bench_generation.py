@@ -0,0 +1,164 @@
+"""
+Synthetic generation throughput against a local stub model.
+
+The stub answers in the story format autoStoryGenerator.py asks for, after a
+fixed latency. Like the provider, it rejects requests beyond its
+requests-per-minute quota, and it fails a fraction of calls with a
+transient server error. To keep runs short, every duration is divided by
+--time-scale: latency, quota window, the old loop's 1.08s pause, limiter
+rate and retry backoff. Stories per minute are reported in unscaled,
+real-world time.
+
+The benchmark compares:
+- the previous sequential loop (generate, save, sleep 1.08s, no retries)
+- generation.generate_stories with several worker counts and a token bucket
+  at the quota
+- one run whose limiter exceeds the quota, which leans on retries
+
+It then checks checkpointing. One run fails some (genre, index) pairs with
+a non-retryable error. A second run generates only those pairs.
+
+Usage (from LLM/Data_Preparation/Synthetic_Data):
+    python benchmarks/bench_generation.py --latency 6 --quota 55 --stories 20
+"""
+
+import argparse
+import collections
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generation import GenerationCheckpoint, TokenBucket, generate_stories
+from storyExtractor import JsonlWriter, process_stories
+from story_corpus import iter_records
+
+GENRES = ['Adventure', 'Fable', 'Mystery']
+
+class StubQuotaError(Exception):
+    """Stands in for a 429 / ResourceExhausted answer"""
+
+class StubServerError(Exception):
+    """Stands in for a 503 / ServiceUnavailable answer"""
+
+class StubModel:
+    def __init__(self, latency, requests_per_minute, error_rate, time_scale, seed=0):
+        self.latency = latency / time_scale
+        self.window = 60 / time_scale
+        self.quota = requests_per_minute
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = collections.deque()
+        self.lock = threading.Lock()
+        self.stats = collections.Counter()
+
+    def generate(self, prompt):
+        with self.lock:
+            now = time.monotonic()
+            while self.calls and self.calls[0] <= now - self.window:
+                self.calls.popleft()
+            if len(self.calls) >= self.quota:
+                self.stats['quota_rejected'] += 1
+                raise StubQuotaError("429 Resource has been exhausted")
+            self.calls.append(now)
+            self.stats['requests'] += 1
+            failed = self.random.random() < self.error_rate
+        time.sleep(self.latency)
+        if failed:
+            self.stats['server_errors'] += 1
+            raise StubServerError("503 The service is currently unavailable")
+        number = self.stats['requests']
+        return f"Story {number}: Title: कहानी {number}\nStory: {'एक बार की बात है। ' * 60}\nMoral: मेहनत का फल मीठा होता है।"
+
+def build_prompt(genre):
+    return f"Generate a story in Hindi. The genre should be {genre}."
+
+def sequential_loop(model, stories_per_genre, writer, time_scale):
+    """The generator's previous loop: one call at a time, failures skipped, fixed pause"""
+    completed = 0
+    for genre in GENRES:
+        for i in range(stories_per_genre):
+            try:
+                process_stories(model.generate(build_prompt(genre)), writer, theme="", genre=genre)
+                completed += 1
+            except Exception:
+                pass
+            time.sleep(1.08 / time_scale)
+    return completed, len(GENRES) * stories_per_genre - completed
+
+def report(name, completed, failed, elapsed, model, time_scale):
+    per_minute = completed / (elapsed * time_scale) * 60
+    print(f"{name:>26}: {per_minute:6.1f} stories/min, {completed:>3} done, {failed:>2} failed, "
+          f"{model.stats['quota_rejected']:>3} x 429, {model.stats['server_errors']:>2} x 503")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=6, help="Seconds per stub response")
+    parser.add_argument('--quota', type=int, default=55, help="Stub requests-per-minute quota")
+    parser.add_argument('--error-rate', type=float, default=0.05, help="Share of calls failing with a 503")
+    parser.add_argument('--stories', type=int, default=20, help="Stories per genre")
+    parser.add_argument('--time-scale', type=float, default=20)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    args = parser.parse_args()
+    scale = args.time_scale
+    retry = dict(retryable=(StubQuotaError, StubServerError), max_retries=8,
+                 base_delay=2 / scale, max_delay=60 / scale, logger=lambda message: None)
+
+    def run(workdir, name, workers, limiter_rate):
+        model = StubModel(args.latency, args.quota, args.error_rate, scale)
+        checkpoint = GenerationCheckpoint(os.path.join(workdir, f'{name}.checkpoint.jsonl'))
+        limiter = TokenBucket(limiter_rate * scale / 60)
+        start = time.perf_counter()
+        with JsonlWriter(os.path.join(workdir, f'{name}.jsonl')) as writer:
+            completed, failed = generate_stories(model.generate, build_prompt, GENRES, args.stories, writer,
+                                                 checkpoint, limiter, workers, **retry)
+        checkpoint.close()
+        report(name, completed, failed, time.perf_counter() - start, model, scale)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        model = StubModel(args.latency, args.quota, args.error_rate, scale)
+        start = time.perf_counter()
+        with JsonlWriter(os.path.join(workdir, 'sequential.jsonl')) as writer:
+            completed, failed = sequential_loop(model, args.stories, writer, scale)
+        report('sequential + 1.08s sleep', completed, failed, time.perf_counter() - start, model, scale)
+
+        for workers in args.workers:
+            run(workdir, f'{workers} workers', workers, args.quota)
+        run(workdir, f'{max(args.workers)} workers, 2x quota', max(args.workers), 2 * args.quota)
+
+        # Checkpointing: the first run loses every fifth response to a non-retryable error
+        model = StubModel(args.latency, args.quota, 0, scale)
+        calls = collections.Counter()
+        lock = threading.Lock()
+
+        def flaky(prompt):
+            with lock:
+                calls['first'] += 1
+                number = calls['first']
+            if number % 5 == 0:
+                raise ValueError("Response blocked")
+            return model.generate(prompt)
+
+        checkpoint_path = os.path.join(workdir, 'resume.checkpoint.jsonl')
+        output_path = os.path.join(workdir, 'resume.jsonl')
+        for name, generate in (('checkpoint first run', flaky), ('checkpoint rerun', model.generate)):
+            checkpoint = GenerationCheckpoint(checkpoint_path)
+            before = model.stats['requests']
+            start = time.perf_counter()
+            with JsonlWriter(output_path) as writer:
+                completed, failed = generate_stories(generate, build_prompt, GENRES, args.stories, writer,
+                                                     checkpoint, TokenBucket(args.quota * scale / 60), 8, **retry)
+            checkpoint.close()
+            print(f"{name:>26}: {model.stats['requests'] - before:>3} requests, {completed:>3} done, "
+                  f"{failed:>2} failed, {time.perf_counter() - start:5.2f}s")
+        stored = sum(1 for _ in iter_records(output_path))
+        assert stored == len(GENRES) * args.stories, stored
+        assert len(GenerationCheckpoint(checkpoint_path).completed) == stored
+        print(f"{'':>26}  {stored} stories stored, one per (genre, index)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from storyExtractor import process_stories
+
+# story_corpus is shared with Scraping_Data and lives one level up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from story_corpus import JsonlWriter, iter_records
+
+class TokenBucket:
+    """
+    Allows `rate` calls per second on average and bursts of up to `capacity`
+    calls. Callers block in `acquire` until a token is free; the bucket can be
+    shared by any number of threads.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute, burst=1):
+        return cls(requests_per_minute / 60, burst)
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Taking the token up front reserves it; a negative balance queues the callers behind each other
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+def call_with_retry(call, limiter, retryable, max_retries=5, base_delay=2, max_delay=60):
+    """
+    Calls `call()` once a limiter token is free. Errors of the `retryable` types
+    are retried up to `max_retries` times, with exponential backoff and full
+    jitter so that workers throttled together do not retry together.
+    """
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            return call()
+        except retryable:
+            if attempt == max_retries:
+                raise
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+class GenerationCheckpoint:
+    """
+    JSON Lines record of the (genre, index) pairs whose stories were saved, so
+    an interrupted or partly failed run generates only the missing ones.
+    """
+
+    def __init__(self, path):
+        self.completed = set()
+        if os.path.exists(path):
+            self.completed = {(entry['genre'], entry['index']) for entry in iter_records(path)}
+        self._writer = JsonlWriter(path)
+
+    def __contains__(self, key):
+        return key in self.completed
+
+    def add(self, genre, index):
+        self._writer.write({'genre': genre, 'index': index})
+        self.completed.add((genre, index))
+
+    def close(self):
+        self._writer.close()
+
+def generate_stories(generate, build_prompt, genres, stories_per_genre, writer, checkpoint, limiter,
+                     workers, retryable=(), max_retries=5, base_delay=2, max_delay=60, logger=print):
+    """
+    Generates `stories_per_genre` responses for every genre with a pool of
+    `workers` threads, skipping pairs already in the checkpoint. Every request,
+    retries included, takes a token from `limiter`. A pair is checkpointed
+    once the stories of its response have been flushed to `writer`.
+    Returns (completed, failed) counts for this run.
+    """
+    pending = [(genre, index) for genre in genres for index in range(stories_per_genre)
+               if (genre, index) not in checkpoint]
+    counts = {'completed': 0, 'failed': 0}
+    lock = threading.Lock()
+
+    def run(genre, index):
+        try:
+            text = call_with_retry(lambda: generate(build_prompt(genre)), limiter, retryable,
+                                   max_retries, base_delay, max_delay)
+            process_stories(text, writer, theme="", genre=genre)
+            # A gzip corpus is flushed in groups; the pair is checkpointed once its stories are on disk
+            writer.when_flushed(lambda: checkpoint.add(genre, index))
+            outcome = 'completed'
+        except Exception as e:
+            logger(f"Error generating story for genre {genre}, iteration {index}: {e}")
+            outcome = 'failed'
+        with lock:
+            counts[outcome] += 1
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for future in [executor.submit(run, genre, index) for genre, index in pending]:
+            future.result()
+    finally:
+        # On Ctrl-C, finish the requests in flight and drop the queued ones; the checkpoint has the rest
+        executor.shutdown(cancel_futures=True)
+    return counts['completed'], counts['failed']
@@ -1,6 +1,10 @@
 import re
-import json
 import os
+import sys
+
+# story_corpus is shared with Scraping_Data and lives one level up
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from story_corpus import JsonlWriter
 
 def clean_text(text):
     # Remove timestamps and sender information
@@ -39,25 +43,18 @@ def extract_story_details(text, theme_provided=True, theme="", genre_provided=Tr
     
     return details
 
-def save_to_json(details, filename, append=False):
-    # If append, load existing data
-    if append and os.path.exists(filename):
-        with open(filename, 'r', encoding='utf-8') as jsonfile:
-            data = json.load(jsonfile)
-    else:
-        data = []
-
-    # Append new story details
-    data.append(details)
-
-    # Save to JSON
-    with open(filename, 'w', encoding='utf-8') as jsonfile:
-        json.dump(data, jsonfile, ensure_ascii=False, indent=4)
-
-def process_stories(text, filename, append=False, theme="", genre=""):
+def process_stories(text, output, append=False, theme="", genre=""):
+    """
+    Extracts the stories in `text` and appends each one as a JSON line to `output`,
+    a corpus path or an open JsonlWriter. With a path and append=False, the file
+    is started over.
+    """
+    writer = output if isinstance(output, JsonlWriter) else JsonlWriter(output, append=append)
     cleaned_text = clean_text(text)  # Clean the text first
     stories = cleaned_text.split('Title:')[1:]  # Split text into individual stories based on the "Title:" keyword
-    for story in stories:
-        details = extract_story_details("Title:" + story, theme=theme, genre=genre)
-        save_to_json(details, filename, append=append)
-        append = True  # Ensure subsequent stories are appended to the JSON file
+    try:
+        for story in stories:
+            writer.write(extract_story_details("Title:" + story, theme=theme, genre=genre))
+    finally:
+        if writer is not output:
+            writer.close()
@@ -0,0 +1,189 @@
+"""
+Append-only JSON Lines storage for story corpora.
+
+The scraper, the synthetic story extractor, the data analysis notebook and
+fine-tuning preprocessing all read and write stories through this module. A
+corpus is one JSONL file, optionally gzip-compressed, or a set of numbered
+shards of one. Writers append one line per story, so the cost of saving a
+story does not grow with the corpus. Readers stream records one at a time.
+"""
+
+import glob
+import gzip
+import json
+import os
+import re
+import threading
+
+# Every flush of a gzip file ends its deflate block (Z_SYNC_FLUSH), which is
+# slow and costs compression, so gzip corpora are flushed in groups of records
+GZIP_FLUSH_EVERY = 100
+# gzip.open defaults to level 9, which compresses repetitive story text
+# about 20x slower than zlib's default level for a few percent of size
+GZIP_COMPRESSLEVEL = 6
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', compresslevel=GZIP_COMPRESSLEVEL)
+    return open(path, mode, encoding='utf-8')
+
+def _split_extension(path):
+    """'stories.jsonl.gz' -> ('stories', '.jsonl.gz')"""
+    match = re.match(r'(.*?)(\.jsonl(?:\.gz)?)$', path)
+    return (match.group(1), match.group(2)) if match else (path, '')
+
+def shard_paths(path):
+    """Existing shards of a sharded corpus, in order"""
+    stem, extension = _split_extension(path)
+    return sorted(glob.glob(f'{glob.escape(stem)}-[0-9][0-9][0-9][0-9][0-9]{extension}'))
+
+class JsonlWriter:
+    """
+    Appends records to a JSONL corpus, one line each.
+
+    With `shard_size`, records go to numbered shards ('stories-00000.jsonl', ...)
+    of at most that many records, and a new writer continues the last shard. A
+    path ending in '.gz' is gzip-compressed; appending adds gzip members, which
+    readers see as one stream. With `append=False` an existing corpus is
+    replaced. Writers can be shared between threads.
+
+    Plain files are flushed after every record, so a crash loses at most the
+    line being written. Gzip files are flushed every `flush_every` records
+    (GZIP_FLUSH_EVERY by default) and on close; a crash loses the records
+    since the last flush, and readers stop at that point. Work that must not
+    run before its records are on disk, such as a checkpoint, goes through
+    `when_flushed`.
+    """
+
+    def __init__(self, path, shard_size=None, append=True, flush_every=None):
+        self.path = path
+        self.shard_size = shard_size
+        self.flush_every = flush_every or (GZIP_FLUSH_EVERY if path.endswith('.gz') else 1)
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._unflushed = 0
+        self._after_flush = []
+        if not append:
+            for existing in shard_paths(path) if shard_size else [path]:
+                if os.path.exists(existing):
+                    os.remove(existing)
+        self._shard = 0
+        self._shard_count = 0
+        if shard_size:
+            existing = shard_paths(path)
+            if existing:
+                self._shard = len(existing) - 1
+                self._shard_count = sum(1 for _ in iter_records(existing[-1]))
+
+    def _current_path(self):
+        if not self.shard_size:
+            return self.path
+        stem, extension = _split_extension(self.path)
+        return f'{stem}-{self._shard:05d}{extension}'
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self.shard_size and self._shard_count >= self.shard_size:
+                self._close_file()
+                self._shard += 1
+                self._shard_count = 0
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = _open(self._current_path(), 'a')
+            self._file.write(line)
+            self._unflushed += 1
+            self._shard_count += 1
+            self.count += 1
+            if self._unflushed >= self.flush_every:
+                self._flush()
+
+    def when_flushed(self, callback):
+        """Calls `callback` once every record written so far is on disk: now, or after the next flush"""
+        with self._lock:
+            if self._unflushed:
+                self._after_flush.append(callback)
+                return
+        callback()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._file is not None:
+            self._file.flush()
+        self._unflushed = 0
+        callbacks, self._after_flush = self._after_flush, []
+        for callback in callbacks:
+            callback()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._flush()
+
+    def close(self):
+        with self._lock:
+            self._close_file()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def iter_records(path, dedupe_key=None):
+    """
+    Yields the records of a corpus one at a time. `path` can be a JSONL file
+    (optionally .gz), the base path of a sharded corpus, a directory or glob of
+    JSONL files, or a legacy JSON array file, which is loaded whole.
+
+    With `dedupe_key`, only the last record for each value of that field is
+    yielded; records without the field are all kept. A re-crawled article
+    that changed is appended again, so readers of scraped stories pass
+    dedupe_key='url' to keep its latest version. The corpus is then read
+    twice, and one position per key is held in memory.
+    """
+    if dedupe_key is None:
+        yield from _iter_corpus(path)
+        return
+    latest = {}
+    for position, record in enumerate(_iter_corpus(path)):
+        if record.get(dedupe_key) is not None:
+            latest[record[dedupe_key]] = position
+    for position, record in enumerate(_iter_corpus(path)):
+        key = record.get(dedupe_key)
+        # Records appended since the first pass have no entry and are kept
+        if key is None or latest.get(key, position) == position:
+            yield record
+
+def _iter_corpus(path):
+    if os.path.isdir(path):
+        paths = sorted(glob.glob(os.path.join(path, '*.jsonl')) + glob.glob(os.path.join(path, '*.jsonl.gz')))
+    elif os.path.exists(path):
+        paths = [path]
+    elif glob.has_magic(path):
+        paths = sorted(glob.glob(path))
+    else:
+        paths = shard_paths(path)
+        if not paths:
+            raise FileNotFoundError(f"No corpus found at {path}")
+    for file_path in paths:
+        if file_path.endswith('.json'):
+            with _open(file_path, 'r') as f:
+                yield from json.load(f)
+            continue
+        with _open(file_path, 'r') as f:
+            try:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            except EOFError:
+                # A gzip writer that never closed, e.g. after a crash, leaves its last member
+                # unterminated; the records up to its last flush have been read
+                pass
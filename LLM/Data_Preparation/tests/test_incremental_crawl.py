@@ -0,0 +1,67 @@
+"""
+Re-crawling a changed article against the local fixture site.
+
+Run from LLM/Data_Preparation:
+    python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+DATA_PREPARATION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRAPER_DIR = os.path.join(DATA_PREPARATION_DIR, 'Scraping_Data')
+sys.path.insert(0, DATA_PREPARATION_DIR)
+sys.path.insert(0, SCRAPER_DIR)
+sys.path.insert(0, os.path.join(SCRAPER_DIR, 'benchmarks'))
+
+from config.settings import WEBSITES
+from fixture_site import FixtureSite
+from scrapers import generic_scraper
+from story_corpus import JsonlWriter, iter_records
+from utils.crawl_state import CrawlState
+
+class ChangedArticleTests(unittest.TestCase):
+    def setUp(self):
+        self.site = FixtureSite(latency=0, pages=2, per_page=3)
+        self.addCleanup(self.site.stop)
+        websites = {**WEBSITES, 'websiteA': {**WEBSITES['websiteA'], 'base_url': f'{self.site.start()}/stories', 'delay': 0}}
+        patcher = mock.patch.dict('config.settings.WEBSITES', websites)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.corpus = os.path.join(workdir.name, 'stories.jsonl')
+        self.state = CrawlState(os.path.join(workdir.name, 'crawl_state.sqlite3'))
+        self.addCleanup(self.state.close)
+
+    def crawl(self):
+        with JsonlWriter(self.corpus) as writer:
+            generic_scraper.GenericScraper('websiteA', state=self.state, on_story=writer.write).scrape()
+
+    def test_readers_keep_only_the_latest_version_of_a_changed_article(self):
+        self.crawl()
+        self.site.touch('/stories/article/4')
+        with mock.patch.object(generic_scraper, 'ARTICLE_REVALIDATE_AFTER', 0):
+            self.crawl()
+
+        stored = list(iter_records(self.corpus))
+        self.assertEqual(len(stored), 7)
+        latest = list(iter_records(self.corpus, dedupe_key='url'))
+        self.assertEqual(len(latest), 6)
+        self.assertEqual(len({story['url'] for story in latest}), 6)
+        changed = [story for story in latest if story['url'].endswith('/stories/article/4')]
+        self.assertEqual(len(changed), 1)
+        self.assertIn('Revised 1', changed[0]['content'])
+        self.assertFalse(any('Revised' in story['content'] for story in latest if story is not changed[0]))
+
+    def test_an_unchanged_article_is_not_stored_again(self):
+        self.crawl()
+        with mock.patch.object(generic_scraper, 'ARTICLE_REVALIDATE_AFTER', 0):
+            self.crawl()
+        self.assertEqual(len(list(iter_records(self.corpus))), 6)
+
+if __name__ == '__main__':
+    unittest.main()
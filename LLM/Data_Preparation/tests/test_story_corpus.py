@@ -0,0 +1,70 @@
+"""
+JsonlWriter flushing and iter_records reading.
+
+Run from LLM/Data_Preparation:
+    python -m unittest discover -s tests
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from story_corpus import JsonlWriter, iter_records
+
+class JsonlWriterTests(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.workdir.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.workdir.name, name)
+
+    def test_plain_records_are_on_disk_as_they_are_written(self):
+        with JsonlWriter(self.path('stories.jsonl')) as writer:
+            writer.write({'title': 'one'})
+            self.assertEqual(list(iter_records(self.path('stories.jsonl'))), [{'title': 'one'}])
+            flushed = []
+            writer.when_flushed(lambda: flushed.append(True))
+            self.assertEqual(flushed, [True])
+
+    def test_gzip_records_are_flushed_in_groups(self):
+        flushed = []
+        with JsonlWriter(self.path('stories.jsonl.gz'), flush_every=3) as writer:
+            for index in range(2):
+                writer.write({'index': index})
+                writer.when_flushed(lambda index=index: flushed.append(index))
+            self.assertEqual(flushed, [])
+            writer.write({'index': 2})
+            self.assertEqual(flushed, [0, 1])
+            writer.write({'index': 3})
+            writer.when_flushed(lambda: flushed.append(3))
+        self.assertEqual(flushed, [0, 1, 3])
+        self.assertEqual([record['index'] for record in iter_records(self.path('stories.jsonl.gz'))], [0, 1, 2, 3])
+
+    def test_unclosed_gzip_is_read_up_to_its_last_flush(self):
+        writer = JsonlWriter(self.path('stories.jsonl.gz'), flush_every=2)
+        for index in range(3):
+            writer.write({'index': index})
+        # A copy taken now looks like the file a crashed writer leaves behind
+        shutil.copy(self.path('stories.jsonl.gz'), self.path('crashed.jsonl.gz'))
+        writer.close()
+        self.assertEqual([record['index'] for record in iter_records(self.path('crashed.jsonl.gz'))], [0, 1])
+
+class DedupeTests(unittest.TestCase):
+    def test_only_the_last_record_per_key_is_read(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'stories.jsonl')
+            with JsonlWriter(path) as writer:
+                for record in ({'url': 'a', 'version': 1}, {'url': 'b', 'version': 1},
+                               {'Title': 'synthetic'}, {'url': 'a', 'version': 2}):
+                    writer.write(record)
+            self.assertEqual(list(iter_records(path, dedupe_key='url')),
+                             [{'url': 'b', 'version': 1}, {'Title': 'synthetic'}, {'url': 'a', 'version': 2}])
+            self.assertEqual(len(list(iter_records(path))), 4)
+
+if __name__ == '__main__':
+    unittest.main()
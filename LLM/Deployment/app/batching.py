@@ -0,0 +1,65 @@
+import logging
+import queue
+import time
+from concurrent.futures import Future
+from threading import Thread
+
+logger = logging.getLogger(__name__)
+
+class BatchScheduler:
+    """Collects concurrent predict calls into batched model.generate calls.
+
+    Requests queue up for at most ``max_wait_ms`` after the first one arrives,
+    or until ``max_batch_size`` prompts are waiting. Each batch is generated
+    in a single call on a dedicated thread and the outputs are handed back to
+    the waiting callers.
+    """
+
+    def __init__(self, predictor, max_batch_size, max_wait_ms):
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._requests = queue.Queue()
+        self._worker = Thread(target=self._run, name='batch-scheduler', daemon=True)
+        self._worker.start()
+
+    def submit(self, prompt, schema=None, **generate_kwargs):
+        """Queue a prompt and block until its completion is ready"""
+        future = Future()
+        self._requests.put((prompt, schema, generate_kwargs, future))
+        return future.result()
+
+    def _collect_batch(self):
+        batch = [self._requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            # Only prompts with identical generation settings can share a generate call;
+            # response schemas are applied per row so they do not split a batch
+            groups = {}
+            for prompt, schema, generate_kwargs, future in batch:
+                key = tuple(sorted(generate_kwargs.items()))
+                groups.setdefault(key, []).append((prompt, schema, future))
+            for key, requests in groups.items():
+                prompts = [prompt for prompt, _, _ in requests]
+                schemas = [schema for _, schema, _ in requests]
+                try:
+                    outputs = self.predictor.predict_batch(prompts, schemas=schemas, **dict(key))
+                except Exception as e:
+                    logger.exception("Batched generation failed")
+                    for _, _, future in requests:
+                        future.set_exception(e)
+                    continue
+                for (_, _, future), output in zip(requests, outputs):
+                    future.set_result(output)
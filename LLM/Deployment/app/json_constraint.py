@@ -0,0 +1,208 @@
+import json
+import torch
+from threading import RLock
+from transformers import LogitsProcessor
+
+# Marks a free-text JSON string value inside a template
+SLOT = None
+
+_templates = {}
+
+class UnsupportedSchemaError(ValueError):
+    pass
+
+def template_from_schema(schema):
+    """Flatten a JSON schema into alternating literal text and string slots.
+
+    Supports objects whose required properties are strings or fixed-length
+    arrays of strings, which covers the story and suggestions responses.
+    Every slot is preceded by a literal ending in a quote and followed by a
+    literal starting with one.
+    """
+    key = json.dumps(schema, sort_keys=True)
+    if key in _templates:
+        return _templates[key]
+    if schema.get('type') != 'object' or 'required' not in schema:
+        raise UnsupportedSchemaError("Schema must be an object with required properties")
+
+    segments = ['{']
+    for index, name in enumerate(schema['required']):
+        prop = schema['properties'][name]
+        segments.append(('' if index == 0 else ', ') + json.dumps(name) + ': ')
+        if prop.get('type') == 'string':
+            segments += ['"', SLOT, '"']
+        elif prop.get('type') == 'array' and prop.get('items', {}).get('type') == 'string':
+            count = prop.get('minItems')
+            if count is None or count != prop.get('maxItems') or count < 1:
+                raise UnsupportedSchemaError(f"Array property {name} needs equal minItems and maxItems")
+            segments.append('["')
+            for item in range(count):
+                segments += [SLOT, '"' if item == count - 1 else '", "']
+            segments.append(']')
+        else:
+            raise UnsupportedSchemaError(f"Unsupported schema type for property {name}")
+    segments.append('}')
+
+    # Merge adjacent literals
+    template = []
+    for segment in segments:
+        if segment is not SLOT and template and template[-1] is not SLOT:
+            template[-1] += segment
+        else:
+            template.append(segment)
+    _templates[key] = template
+    return template
+
+def special_token_ids(tokenizer):
+    """Ids of special tokens, including added ones such as Llama 3's reserved tokens"""
+    ids = set(tokenizer.all_special_ids)
+    ids.update(token_id for token_id, token in tokenizer.added_tokens_decoder.items() if token.special)
+    return ids
+
+class TokenVocabulary:
+    """Decoded text of every token, with cached allowed-token masks per constraint state
+
+    Special tokens decode to text such as ``</s>`` that would pass as string
+    content, so they are left out of every mask; EOS is only allowed once the
+    template is complete.
+    """
+
+    def __init__(self, tokenizer, size):
+        self.size = size
+        self.eos_token_id = tokenizer.eos_token_id
+        self.texts = [tokenizer.decode([token_id]) for token_id in range(len(tokenizer))]
+        self.ids_by_text = {}
+        self.quote_tokens = []
+        self.content_mask = torch.zeros(size, dtype=torch.bool)
+        special_ids = special_token_ids(tokenizer)
+        for token_id, text in enumerate(self.texts):
+            if token_id in special_ids:
+                continue
+            self.ids_by_text.setdefault(text, []).append(token_id)
+            if '"' in text:
+                self.quote_tokens.append((token_id, text))
+            elif text and self.is_content(text):
+                self.content_mask[token_id] = True
+        self._masks = {}
+        self._lock = RLock()
+
+    @staticmethod
+    def is_content(text):
+        """Text that can appear inside a JSON string without escaping"""
+        return '"' not in text and '\\' not in text and all(ord(char) >= 0x20 for char in text)
+
+    def _cached(self, key, build):
+        with self._lock:
+            if key not in self._masks:
+                self._masks[key] = build()
+            return self._masks[key]
+
+    def literal_mask(self, remaining):
+        """Tokens that spell a non-empty prefix of the remaining literal text"""
+        def build():
+            mask = torch.zeros(self.size, dtype=torch.bool)
+            for end in range(1, len(remaining) + 1):
+                for token_id in self.ids_by_text.get(remaining[:end], ()):
+                    mask[token_id] = True
+            return mask
+        return self._cached(('literal', remaining), build)
+
+    def closing_mask(self, closing_literal):
+        """Tokens that end a string and continue into the following literal"""
+        def build():
+            mask = torch.zeros(self.size, dtype=torch.bool)
+            for token_id, text in self.quote_tokens:
+                quote = text.index('"')
+                if self.is_content(text[:quote]) and closing_literal.startswith(text[quote:]):
+                    mask[token_id] = True
+            return mask
+        return self._cached(('closing', closing_literal), build)
+
+    def slot_mask(self, closing_literal):
+        """String content tokens plus the tokens that close the string"""
+        return self._cached(('slot', closing_literal), lambda: self.content_mask | self.closing_mask(closing_literal))
+
+    def eos_mask(self):
+        def build():
+            mask = torch.zeros(self.size, dtype=torch.bool)
+            mask[self.eos_token_id] = True
+            return mask
+        return self._cached(('eos',), build)
+
+class JsonTemplateState:
+    """Position of one generated sequence within its template"""
+
+    def __init__(self, template):
+        self.template = template
+        self.segment = 0
+        self.offset = 0
+
+    @property
+    def done(self):
+        return self.segment >= len(self.template)
+
+    def remaining_literal_length(self):
+        """Upper bound on the tokens needed to finish the template if every string closes now"""
+        literals = [segment for segment in self.template[self.segment:] if segment is not SLOT]
+        if not self.done and self.template[self.segment] is not SLOT:
+            return sum(len(literal) for literal in literals) - self.offset
+        return sum(len(literal) for literal in literals)
+
+    def advance(self, text):
+        for char in text:
+            if self.done:
+                return
+            if self.template[self.segment] is SLOT:
+                if char == '"':
+                    # The closing quote is the first character of the following literal
+                    self.segment += 1
+                    self.offset = 1
+            else:
+                self.offset += 1
+            if not self.done and self.template[self.segment] is not SLOT and self.offset == len(self.template[self.segment]):
+                self.segment += 1
+                self.offset = 0
+
+    def allowed_mask(self, vocabulary, tokens_left=None):
+        if self.done:
+            return vocabulary.eos_mask()
+        segment = self.template[self.segment]
+        if segment is SLOT:
+            closing_literal = self.template[self.segment + 1]
+            if tokens_left is not None and tokens_left <= self.remaining_literal_length():
+                # Close the string while the token budget still covers the rest of the object
+                return vocabulary.closing_mask(closing_literal)
+            return vocabulary.slot_mask(closing_literal)
+        return vocabulary.literal_mask(segment[self.offset:])
+
+class JsonSchemaLogitsProcessor(LogitsProcessor):
+    """Masks logits so each constrained row can only produce JSON matching its template.
+
+    Generation of a row ends with EOS right after the closing brace, so no
+    tokens are spent after the object and no post-processing is needed. With
+    ``max_new_tokens`` given, open strings are closed early enough for the
+    object to be complete within the budget.
+    """
+
+    def __init__(self, vocabulary, templates, max_new_tokens=None):
+        self.vocabulary = vocabulary
+        self.states = [JsonTemplateState(template) if template else None for template in templates]
+        self.max_new_tokens = max_new_tokens
+        self._steps = None
+
+    def __call__(self, input_ids, scores):
+        if self._steps is None:
+            self._steps = 0
+        else:
+            self._steps += 1
+            for row, state in enumerate(self.states):
+                if state is not None and not state.done:
+                    state.advance(self.vocabulary.texts[input_ids[row, -1].item()])
+
+        # Leave one token for EOS after the closing brace
+        tokens_left = self.max_new_tokens - self._steps - 1 if self.max_new_tokens else None
+        for row, state in enumerate(self.states):
+            if state is not None:
+                mask = state.allowed_mask(self.vocabulary, tokens_left).to(scores.device)
+                scores[row] = scores[row].masked_fill(~mask, float('-inf'))
+        return scores
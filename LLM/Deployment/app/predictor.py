@@ -1,42 +1,286 @@
 import os
+import copy
 import json
+import logging
+import queue
+import time
 import torch
-from transformers import LlamaForCausalLM, LlamaTokenizer
-from sagemaker_inference import content_types, default_inference_handler
+from threading import BoundedSemaphore, Event, Lock, Thread
+from transformers import (AutoTokenizer, LlamaForCausalLM, LogitsProcessorList, StoppingCriteria,
+                          StoppingCriteriaList, TextIteratorStreamer)
+from batching import BatchScheduler
+from json_constraint import JsonSchemaLogitsProcessor, TokenVocabulary, template_from_schema
+from prefix_cache import PrefixCache
+
+MAX_NEW_TOKENS = int(os.getenv('MAX_NEW_TOKENS', 1024))
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 8))
+MAX_BATCH_WAIT_MS = float(os.getenv('MAX_BATCH_WAIT_MS', 10))
+# Prefill KV caches of shared prompt prefixes (the story and suggestion templates). Only
+# single-prompt generate calls can use them: streamed requests and batches of one. Prompts
+# batched together skip the cache and are logged as bypasses every PREFIX_CACHE_STATS_INTERVAL
+# seconds, next to the hits and misses
+PREFIX_CACHE_MAX_TOKENS = int(os.getenv('PREFIX_CACHE_MAX_TOKENS', 16384))
+PREFIX_CACHE_MIN_TOKENS = int(os.getenv('PREFIX_CACHE_MIN_TOKENS', 32))
+PREFIX_CACHE_STATS_INTERVAL = float(os.getenv('PREFIX_CACHE_STATS_INTERVAL', 300))
+WARMUP_MAX_NEW_TOKENS = int(os.getenv('WARMUP_MAX_NEW_TOKENS', 8))
+# Streamed generations bypass the batch scheduler, so at most this many run next to it
+MAX_CONCURRENT_STREAMS = int(os.getenv('MAX_CONCURRENT_STREAMS', 4))
+# Seconds a stream waits for a free slot, and for each next piece of text, before it fails
+STREAM_TIMEOUT = float(os.getenv('STREAM_TIMEOUT', 120))
+# 'int8' serves on CPU with dynamically quantized linear layers
+QUANTIZATION = os.getenv('QUANTIZATION', 'none').lower()
+
+# Smallest schema that still runs the constrained decoding path during warm-up
+WARMUP_SCHEMA = {'type': 'object', 'properties': {'text': {'type': 'string'}}, 'required': ['text']}
+
+logger = logging.getLogger(__name__)
+
+def has_safetensors(model_dir):
+    return any(name.endswith('.safetensors') for name in os.listdir(model_dir))
+
+class StreamTimeoutError(RuntimeError):
+    pass
+
+class UnsupportedContentTypeError(ValueError):
+    pass
+
+class InvalidRequestError(ValueError):
+    pass
+
+class CancelledByClient(StoppingCriteria):
+    """Stops a streamed generate once its consumer has gone away"""
+
+    def __init__(self, cancelled):
+        self.cancelled = cancelled
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.cancelled.is_set(), dtype=torch.bool, device=input_ids.device)
+
+def quantize_int8(model):
+    """Quantize the linear layers' weights to int8 in place; activations are quantized per batch at run time"""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
 
 class LlamaPredictor:
-    def __init__(self):
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        model_dir = '/opt/ml/model'
-        self.tokenizer = LlamaTokenizer.from_pretrained(model_dir)
-        self.model = LlamaForCausalLM.from_pretrained(model_dir).to(self.device)
+    def __init__(self, quantization=QUANTIZATION):
+        if quantization not in ('none', 'int8'):
+            raise ValueError(f"Unsupported QUANTIZATION: {quantization}")
+        # Dynamic int8 kernels only exist for CPU, so the int8 mode always serves on CPU
+        self.device = torch.device('cuda' if torch.cuda.is_available() and quantization == 'none' else 'cpu')
+        self.quantization = quantization
+        self.load_times = {}
+        model_dir = os.getenv('MODEL_DIR', '/opt/ml/model')
+
+        start = time.perf_counter()
+        # Llama 3.x ships a fast tokenizer (tokenizer.json) rather than a sentencepiece model
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        # Left padding keeps every prompt adjacent to its generated tokens in a batch
+        self.tokenizer.padding_side = 'left'
+        self.load_times['tokenizer'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        # safetensors weights are memory-mapped instead of unpickled, and
+        # low_cpu_mem_usage skips the random init of a second full copy
+        self.model = LlamaForCausalLM.from_pretrained(
+            model_dir,
+            low_cpu_mem_usage=True,
+            use_safetensors=has_safetensors(model_dir) or None
+        ).to(self.device)
         self.model.eval()
+        self.load_times['model'] = time.perf_counter() - start
+
+        if quantization == 'int8':
+            start = time.perf_counter()
+            quantize_int8(self.model)
+            self.load_times['quantize'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.prefix_cache = PrefixCache(
+            PREFIX_CACHE_MAX_TOKENS, PREFIX_CACHE_MIN_TOKENS, stats_interval=PREFIX_CACHE_STATS_INTERVAL
+        ) if PREFIX_CACHE_MAX_TOKENS else None
+        self.vocabulary = TokenVocabulary(self.tokenizer, self.model.config.vocab_size)
+        self.load_times['vocabulary'] = time.perf_counter() - start
+        self.stream_slots = BoundedSemaphore(MAX_CONCURRENT_STREAMS)
+
+    def warm_up(self):
+        """Run a short plain and a short constrained generate so the first request pays no setup cost"""
+        start = time.perf_counter()
+        self.predict('Once upon a time', max_new_tokens=WARMUP_MAX_NEW_TOKENS)
+        self.predict('Once upon a time', max_new_tokens=WARMUP_MAX_NEW_TOKENS, schema=WARMUP_SCHEMA)
+        self.load_times['warm_up'] = time.perf_counter() - start
+
+    def _logits_processor(self, schemas, batch_size, max_new_tokens):
+        """Constrain each row to its response schema; rows without a schema decode freely"""
+        schemas = schemas or [None] * batch_size
+        if not any(schemas):
+            return None
+        templates = [template_from_schema(schema) if schema else None for schema in schemas]
+        return LogitsProcessorList([JsonSchemaLogitsProcessor(self.vocabulary, templates, max_new_tokens)])
+
+    def _cached_prefill(self, inputs):
+        """Return a KV cache covering a shared template prefix of a single prompt, if one is known"""
+        if self.prefix_cache is None:
+            return None
+        if inputs['input_ids'].shape[0] != 1:
+            # Left-padded rows would need a per-row offset into the cached prefix
+            self.prefix_cache.bypass(inputs['input_ids'].shape[0])
+            return None
+        token_ids = inputs['input_ids'][0].tolist()
+        _, past_key_values = self.prefix_cache.lookup(token_ids)
+        if past_key_values is not None:
+            return past_key_values
 
-    def predict(self, input_text, max_length=100, temperature=0.7):
-        inputs = self.tokenizer.encode(input_text, return_tensors='pt').to(self.device)
+        prefix = self.prefix_cache.shared_prefix(token_ids)
+        if prefix is None:
+            return None
         with torch.no_grad():
-            outputs = self.model.generate(
-                inputs,
-                max_length=max_length,
+            prefix_ids = torch.tensor([prefix], device=self.device)
+            past_key_values = self.model(input_ids=prefix_ids, use_cache=True).past_key_values
+        self.prefix_cache.store(prefix, past_key_values)
+        return copy.deepcopy(past_key_values)
+
+    def _generate(self, inputs, max_new_tokens, temperature, streamer=None, schemas=None, stopping_criteria=None):
+        with torch.no_grad():
+            return self.model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
                 temperature=temperature,
-                num_return_sequences=1
+                num_return_sequences=1,
+                pad_token_id=self.tokenizer.pad_token_id,
+                past_key_values=self._cached_prefill(inputs),
+                logits_processor=self._logits_processor(schemas, inputs['input_ids'].shape[0], max_new_tokens),
+                streamer=streamer,
+                stopping_criteria=stopping_criteria
             )
-        generated_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        return generated_text
+
+    def predict_batch(self, input_texts, max_new_tokens=MAX_NEW_TOKENS, temperature=0.7, schemas=None):
+        """Generate completions for several prompts in one left-padded generate call.
+
+        ``schemas`` optionally gives a JSON schema per prompt; those rows are
+        decoded under the schema and stop right after the closing brace.
+        """
+        inputs = self.tokenizer(input_texts, return_tensors='pt', padding=True).to(self.device)
+        outputs = self._generate(inputs, max_new_tokens, temperature, schemas=schemas)
+        # Decode only the completions; every output row starts with the padded prompt
+        prompt_length = inputs['input_ids'].shape[-1]
+        return [
+            self.tokenizer.decode(output[prompt_length:], skip_special_tokens=True)
+            for output in outputs
+        ]
+
+    def predict(self, input_text, max_new_tokens=MAX_NEW_TOKENS, temperature=0.7, schema=None):
+        return self.predict_batch([input_text], max_new_tokens, temperature, schemas=[schema])[0]
+
+    def predict_stream(self, input_text, max_new_tokens=MAX_NEW_TOKENS, temperature=0.7, schema=None):
+        """Yield pieces of the completion as soon as model.generate produces them.
+
+        At most MAX_CONCURRENT_STREAMS generations stream at once. An error in
+        model.generate is raised here, and StreamTimeoutError when no slot
+        frees up or no text arrives within STREAM_TIMEOUT seconds.
+        """
+        if not self.stream_slots.acquire(timeout=STREAM_TIMEOUT):
+            raise StreamTimeoutError(f"No stream slot free within {STREAM_TIMEOUT}s")
+        try:
+            inputs = self.tokenizer(input_text, return_tensors='pt').to(self.device)
+            streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True,
+                                            timeout=STREAM_TIMEOUT)
+            cancelled = Event()
+            errors = []
+
+            def generate():
+                try:
+                    self._generate(inputs, max_new_tokens, temperature, streamer, [schema],
+                                   StoppingCriteriaList([CancelledByClient(cancelled)]))
+                except Exception as e:
+                    errors.append(e)
+                    # generate only ends the stream when it returns normally
+                    streamer.end()
+
+            generation = Thread(target=generate, name='stream-generate', daemon=True)
+            generation.start()
+            try:
+                for text in streamer:
+                    if text:
+                        yield text
+            except queue.Empty:
+                raise StreamTimeoutError(f"No text generated within {STREAM_TIMEOUT}s")
+            finally:
+                # A closed or failed stream stops generate at the next token instead of running to max_new_tokens
+                cancelled.set()
+                generation.join()
+            if errors:
+                raise errors[0]
+        finally:
+            self.stream_slots.release()
 
 _predictor = None
+_scheduler = None
+_init_lock = Lock()
+_ready = Event()
 
-def handle(data, context):
+def get_predictor():
     global _predictor
-    if _predictor is None:
-        _predictor = LlamaPredictor()
-
-    if context.request_content_type == 'application/json':
-        input_data = json.loads(data.read().decode('utf-8'))
-        prompt = input_data['prompt']
-        generated_text = _predictor.predict(prompt)
-        response = {'generated_text': generated_text}
-        return [json.dumps(response).encode('utf-8')]
-
-    else:
-        raise ValueError(f"Unsupported content type: {context.request_content_type}")
+    with _init_lock:
+        if _predictor is None:
+            _predictor = LlamaPredictor()
+    return _predictor
+
+def get_scheduler():
+    """Shared micro-batching scheduler, or None when batching is disabled"""
+    global _scheduler
+    predictor = get_predictor()
+    with _init_lock:
+        if _scheduler is None and MAX_BATCH_SIZE > 1:
+            _scheduler = BatchScheduler(predictor, MAX_BATCH_SIZE, MAX_BATCH_WAIT_MS)
+    return _scheduler
+
+def load_and_warm_up():
+    """Load the model at server start and mark the server ready once a warm-up generate succeeds"""
+    start = time.perf_counter()
+    predictor = get_predictor()
+    predictor.warm_up()
+    get_scheduler()
+    predictor.load_times['total'] = time.perf_counter() - start
+    logger.info("Model ready: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in predictor.load_times.items()))
+    _ready.set()
+
+def is_ready():
+    return _ready.is_set()
+
+def handle(data, content_type):
+    """Run one invocation and return (response_body, response_content_type).
+
+    With ``"stream": true`` in the request the body is an iterator of JSON
+    lines, one ``{"token": ...}`` object per generated piece of text, which the
+    server sends with chunked transfer encoding. Other requests are batched
+    with concurrent ones when MAX_BATCH_SIZE is above 1.
+
+    An optional ``"schema"`` (JSON schema of the expected object) makes the
+    model decode under that schema, so the output is valid JSON as generated.
+    """
+    if content_type != 'application/json':
+        raise UnsupportedContentTypeError(f"Unsupported content type: {content_type}")
+
+    try:
+        input_data = json.loads(data.decode('utf-8'))
+    except ValueError as e:
+        raise InvalidRequestError(f"Request body is not valid JSON: {e}") from e
+    if not isinstance(input_data, dict) or not isinstance(input_data.get('prompt'), str):
+        raise InvalidRequestError("Request body must be a JSON object with a string 'prompt'")
+    predictor = get_predictor()
+    prompt = input_data['prompt']
+    schema = input_data.get('schema')
+    if schema:
+        template_from_schema(schema)
+
+    if input_data.get('stream'):
+        def stream_tokens():
+            for text in predictor.predict_stream(prompt, schema=schema):
+                yield (json.dumps({'token': text}) + '\n').encode('utf-8')
+        return stream_tokens(), 'application/jsonlines'
+
+    scheduler = get_scheduler()
+    generated_text = scheduler.submit(prompt, schema=schema) if scheduler else predictor.predict(prompt, schema=schema)
+    response = {'generated_text': generated_text}
+    return json.dumps(response).encode('utf-8'), 'application/json'
@@ -0,0 +1,106 @@
+import copy
+import logging
+import time
+from collections import OrderedDict, deque
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+class PrefixCache:
+    """Bounded LRU of prefill KV caches keyed by token prefix.
+
+    Prompts built from the same template share a long token prefix. The
+    cache discovers such prefixes by comparing each prompt with recently
+    seen ones, prefills the shared part once, and hands out copies of its
+    KV cache so later generate calls only prefill the tokens after it.
+    Memory is bounded by the total number of cached prefix tokens.
+
+    Only single-prompt generate calls can use a cached prefix, so prompts
+    generated in a batch of two or more are counted as bypasses. Every
+    ``stats_interval`` seconds the counts are logged, so the share of
+    prompts the cache actually serves is visible in production.
+    """
+
+    def __init__(self, max_tokens, min_tokens, history_size=32, stats_interval=0):
+        self.max_tokens = max_tokens
+        self.min_tokens = min_tokens
+        self._entries = OrderedDict()
+        self._cached_tokens = 0
+        self._recent = deque(maxlen=history_size)
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.stats_interval = stats_interval
+        self._logged_at = time.monotonic()
+
+    def lookup(self, token_ids):
+        """Return (prefix_length, kv_cache copy) for the longest cached prefix, or (0, None)"""
+        token_ids = tuple(token_ids)
+        with self._lock:
+            best = None
+            for prefix in self._entries:
+                if len(prefix) < len(token_ids) and token_ids[:len(prefix)] == prefix:
+                    if best is None or len(prefix) > len(best):
+                        best = prefix
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(best)
+                past_key_values = self._entries[best]
+        self._maybe_log_stats()
+        if best is None:
+            return 0, None
+        # generate extends the cache in place, so every caller gets its own copy
+        return len(best), copy.deepcopy(past_key_values)
+
+    def bypass(self, prompts):
+        """Count prompts generated together in a batch, which never use the cache"""
+        with self._lock:
+            self.bypasses += prompts
+        self._maybe_log_stats()
+
+    def _maybe_log_stats(self):
+        if self.stats_interval and time.monotonic() - self._logged_at >= self.stats_interval:
+            self.log_stats()
+
+    def log_stats(self):
+        """Log the cumulative hits, misses and batched bypasses"""
+        self._logged_at = time.monotonic()
+        prompts = self.hits + self.misses + self.bypasses
+        logger.info(
+            f"Prefix cache: {self.hits} hits, {self.misses} misses, {self.bypasses} batched prompts bypassed; "
+            f"{self.hits / prompts if prompts else 0:.0%} of {prompts} prompts used a cached prefix"
+        )
+
+    def shared_prefix(self, token_ids):
+        """Record a prompt and return its longest common prefix with a recent one worth caching"""
+        token_ids = tuple(token_ids)
+        best = ()
+        with self._lock:
+            for previous in self._recent:
+                length = 0
+                for a, b in zip(previous, token_ids):
+                    if a != b:
+                        break
+                    length += 1
+                # Leave at least one token of the prompt for generate to prefill
+                length = min(length, len(token_ids) - 1)
+                if length > len(best):
+                    best = token_ids[:length]
+            self._recent.append(token_ids)
+        return best if len(best) >= self.min_tokens else None
+
+    def store(self, prefix, past_key_values):
+        prefix = tuple(prefix)
+        if len(prefix) > self.max_tokens:
+            return
+        with self._lock:
+            if prefix in self._entries:
+                return
+            self._entries[prefix] = past_key_values
+            self._cached_tokens += len(prefix)
+            while self._cached_tokens > self.max_tokens:
+                evicted, _ = self._entries.popitem(last=False)
+                self._cached_tokens -= len(evicted)
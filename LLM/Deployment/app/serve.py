@@ -1,6 +1,65 @@
 #!/usr/bin/env python
 
-from sagemaker_inference import model_server
+import os
+import logging
+from threading import Thread
+from flask import Flask, Response, request
+from gunicorn.app.base import BaseApplication
+from json_constraint import UnsupportedSchemaError
+from predictor import InvalidRequestError, UnsupportedContentTypeError, handle, is_ready, load_and_warm_up
+
+# SageMaker container contract: GET /ping for health, POST /invocations for
+# inference on port 8080. Flask is used instead of the multi-model server so
+# that streamed invocations can be sent back with chunked transfer encoding.
+app = Flask(__name__)
+
+# One gunicorn worker process holds the model; its threads serve concurrent
+# requests, which the batch scheduler then groups into generate calls
+SERVER_THREADS = int(os.getenv('SERVER_THREADS', 32))
+SERVER_TIMEOUT = int(os.getenv('SERVER_TIMEOUT', 120))
+
+@app.route('/ping', methods=['GET'])
+def ping():
+    # Healthy only after the model is loaded and a warm-up generate has run,
+    # so SageMaker does not route traffic to a cold container
+    return Response(status=200 if is_ready() else 503)
+
+@app.route('/invocations', methods=['POST'])
+def invocations():
+    try:
+        body, content_type = handle(request.get_data(), request.mimetype)
+    except UnsupportedContentTypeError as e:
+        return Response(str(e), status=415)
+    except (InvalidRequestError, UnsupportedSchemaError) as e:
+        return Response(str(e), status=400)
+    return Response(body, mimetype=content_type)
+
+def start_model_loader(worker):
+    # Load in the background so /ping can answer 503 while the weights load
+    Thread(target=load_and_warm_up, name='model-loader', daemon=True).start()
+
+class ModelServer(BaseApplication):
+    """gunicorn with threaded workers, configured here so the container's 'serve' argument is ignored"""
+
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return app
 
 if __name__ == "__main__":
-    model_server.start_model_server(handler_service="/opt/program/predictor:handle")
+    logging.basicConfig(level=logging.INFO)
+    ModelServer({
+        'bind': f"0.0.0.0:{os.getenv('SAGEMAKER_BIND_TO_PORT', 8080)}",
+        # A second worker would load a second copy of the model
+        'workers': 1,
+        'worker_class': 'gthread',
+        'threads': SERVER_THREADS,
+        'timeout': SERVER_TIMEOUT,
+        'post_worker_init': start_model_loader,
+    }).run()
@@ -0,0 +1,72 @@
+"""
+Throughput benchmark for micro-batching in the model server.
+
+Runs concurrent client threads against ``LlamaPredictor`` on CPU, once with
+one generate call per request and once through ``BatchScheduler``, and
+reports requests per second and mean latency for each configuration.
+
+Usage (from LLM/Deployment):
+    python benchmarks/bench_batching.py --clients 16 --requests 64 --batch-sizes 1 4 8 16
+    python benchmarks/bench_batching.py --model-dir /path/to/model
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+from tiny_model import build_tiny_model
+
+PROMPTS = [
+    "Create a story suitable for children aged 3-5 about a kite.",
+    "Create a story suitable for children aged 6-8 about the sea.",
+    "Once upon a time a small red kite",
+    "Return ONLY a JSON object with a title",
+]
+
+def run(predictor, batch_size, wait_ms, clients, requests, max_new_tokens):
+    from batching import BatchScheduler
+
+    scheduler = BatchScheduler(predictor, batch_size, wait_ms) if batch_size > 1 else None
+
+    def one_request(i):
+        start = time.perf_counter()
+        prompt = PROMPTS[i % len(PROMPTS)]
+        if scheduler:
+            scheduler.submit(prompt, max_new_tokens=max_new_tokens)
+        else:
+            predictor.predict(prompt, max_new_tokens=max_new_tokens)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        latencies = list(pool.map(one_request, range(requests)))
+    elapsed = time.perf_counter() - start
+    return requests / elapsed, statistics.mean(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-dir', help="Model to load (defaults to a generated tiny Llama)")
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=64)
+    parser.add_argument('--max-new-tokens', type=int, default=32)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--wait-ms', type=float, default=10)
+    args = parser.parse_args()
+
+    os.environ['MODEL_DIR'] = args.model_dir or build_tiny_model(os.path.join(tempfile.gettempdir(), 'storyscape-tiny-llama'))
+    from predictor import LlamaPredictor
+    predictor = LlamaPredictor()
+
+    print(f"{'batch':>5} {'req/s':>8} {'mean latency(s)':>16}")
+    for batch_size in args.batch_sizes:
+        throughput, latency = run(predictor, batch_size, args.wait_ms, args.clients, args.requests, args.max_new_tokens)
+        print(f"{batch_size:>5} {throughput:>8.2f} {latency:>16.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Cold-start benchmark for the model server.
+
+Each run starts a fresh Python process, loads the model the way
+``serve.py`` does at startup and reports the time per stage. The same
+weights are loaded from safetensors (memory-mapped) and from a pickled
+``pytorch_model.bin`` copy. The first request is then timed against a
+server that was warmed up at start and one that loads lazily on that request,
+which is what the old server did.
+
+Usage (from LLM/Deployment):
+    python benchmarks/bench_cold_start.py
+    python benchmarks/bench_cold_start.py --model-dir /path/to/model
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from tiny_model import build_tiny_model
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {app_dir!r})
+import predictor
+import_time = time.perf_counter() - start
+if {eager}:
+    predictor.load_and_warm_up()
+ready = time.perf_counter() - start
+request_start = time.perf_counter()
+predictor.handle(json.dumps({{'prompt': 'A story about a red kite'}}).encode(), 'application/json')
+first_request = time.perf_counter() - request_start
+print(json.dumps({{'import': import_time, **predictor.get_predictor().load_times,
+                  'ready': ready, 'first_request': first_request}}))
+"""
+
+def make_bin_copy(model_dir, output_dir):
+    """Copy the model with its weights saved as a pickled state dict instead of safetensors"""
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    shutil.copytree(model_dir, output_dir, ignore=shutil.ignore_patterns('*.safetensors*'))
+    import torch
+    from transformers import LlamaForCausalLM
+    state_dict = LlamaForCausalLM.from_pretrained(model_dir).state_dict()
+    torch.save(state_dict, os.path.join(output_dir, 'pytorch_model.bin'))
+    return output_dir
+
+def run(model_dir, eager):
+    env = dict(os.environ, MODEL_DIR=model_dir, MAX_BATCH_SIZE='1', MAX_NEW_TOKENS='16')
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD.format(app_dir=APP_DIR, eager=eager)],
+        env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-dir', help="safetensors model to load (defaults to a generated small Llama)")
+    args = parser.parse_args()
+
+    model_dir = args.model_dir or build_tiny_model(
+        os.path.join(tempfile.gettempdir(), 'storyscape-small-llama'), hidden_size=512, num_layers=8
+    )
+    bin_dir = make_bin_copy(model_dir, os.path.join(tempfile.gettempdir(), 'storyscape-cold-start-bin'))
+
+    runs = [
+        ('safetensors, eager', model_dir, True),
+        ('bin, eager', bin_dir, True),
+        ('safetensors, lazy', model_dir, False),
+    ]
+    stages = ['import', 'tokenizer', 'model', 'vocabulary', 'warm_up', 'ready', 'first_request']
+    print(f"{'run':>20} " + " ".join(f"{stage:>13}" for stage in stages))
+    for name, directory, eager in runs:
+        result = run(directory, eager)
+        print(f"{name:>20} " + " ".join(
+            f"{result[stage]:>12.2f}s" if stage in result else f"{'-':>13}" for stage in stages
+        ))
+
+if __name__ == '__main__':
+    main()
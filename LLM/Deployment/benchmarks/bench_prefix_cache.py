@@ -0,0 +1,83 @@
+"""
+Prefill benchmark for the shared-prompt prefix cache.
+
+Sends story prompts that share the backend's instruction/schema template
+but differ in the user prompt, and measures time to the first generated
+token with the prefix cache disabled and enabled. Greedy outputs are
+compared to check that reusing the cached KV does not change the result.
+
+Usage (from LLM/Deployment):
+    python benchmarks/bench_prefix_cache.py --requests 20
+    python benchmarks/bench_prefix_cache.py --model-dir /path/to/model
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+from tiny_model import build_tiny_model
+
+# Mirrors story_app.utils.prompts.build_story_prompt in the backend
+TEMPLATE = """
+Return ONLY a JSON object with this exact structure:
+{{
+    "title": "Story title here",
+    "introduction": "Introduction paragraph here",
+    "middle": "Middle paragraph here",
+    "conclusion": "Conclusion paragraph here"
+}}
+Use only basic punctuation (periods, commas, apostrophes) and avoid special characters.
+Do not include any text outside the JSON object.
+Create a story suitable for children aged {age_group}, in {response_language}, based on this prompt: "{prompt}".
+Incorporate the following words or genres if possible: {words}.
+"""
+
+TOPICS = ['a red kite', 'a lost puppy', 'the moon festival', 'a brave little ant', 'a singing river']
+
+def time_first_token(predictor, prompts):
+    timings, outputs = [], []
+    for prompt in prompts:
+        start = time.perf_counter()
+        outputs.append(predictor.predict(prompt, max_new_tokens=1))
+        timings.append(time.perf_counter() - start)
+    return timings, outputs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-dir', help="Model to load (defaults to a generated tiny Llama)")
+    parser.add_argument('--requests', type=int, default=20)
+    args = parser.parse_args()
+
+    model_dir = args.model_dir or build_tiny_model(
+        os.path.join(tempfile.gettempdir(), 'storyscape-small-llama'), hidden_size=512, num_layers=8
+    )
+    os.environ['MODEL_DIR'] = model_dir
+    import predictor as predictor_module
+
+    prompts = [
+        TEMPLATE.format(age_group='3-5', response_language='Hindi', prompt=f"A story about {TOPICS[i % len(TOPICS)]} #{i}", words='Adventure')
+        for i in range(args.requests)
+    ]
+
+    predictor = predictor_module.LlamaPredictor()
+    prefix_cache = predictor.prefix_cache
+    predictor.prefix_cache = None
+    baseline, baseline_outputs = time_first_token(predictor, prompts)
+
+    predictor.prefix_cache = prefix_cache
+    cached, cached_outputs = time_first_token(predictor, prompts)
+
+    prompt_tokens = len(predictor.tokenizer(prompts[0])['input_ids'])
+    print(f"prompt tokens: {prompt_tokens}, cached prefix hits: {prefix_cache.hits}/{prefix_cache.hits + prefix_cache.misses}")
+    print(f"   no cache: median time to first token {statistics.median(baseline) * 1000:.1f}ms")
+    print(f"with cache: median time to first token {statistics.median(cached[2:]) * 1000:.1f}ms (after warm-up)")
+    print(f"prefill saved per request: {(statistics.median(baseline) - statistics.median(cached[2:])) * 1000:.1f}ms")
+    print(f"outputs identical: {baseline_outputs == cached_outputs}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Quality/latency comparison of full-precision and int8 CPU serving.
+
+Loads the model twice on CPU: once as is, once with ``QUANTIZATION=int8``.
+Both versions are scored on a held-out set of stories:
+
+- perplexity of each reference story (teacher forced)
+- how often the int8 model's top-1 next token matches the full-precision one
+- latency of a schema-constrained story generation built from the story's
+  title, theme and genre
+
+The held-out stories are a corpus in the storyExtractor format, read with
+story_corpus.iter_records: a JSONL file (optionally .gz), a sharded corpus
+or a legacy JSON array, with Title, Theme, Genre and Story per record.
+Without ``--stories`` a few built-in samples are used.
+
+Usage (from LLM/Deployment):
+    python benchmarks/bench_quantization.py --stories held_out_stories.jsonl --model-dir /path/to/model
+"""
+
+import argparse
+import io
+import itertools
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+# story_corpus lives in LLM/Data_Preparation
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'Data_Preparation'))
+
+import torch
+
+from tiny_model import build_tiny_model
+
+# Mirrors story_app.utils.prompts in the backend
+TEMPLATE = """
+Return ONLY a JSON object with this exact structure:
+{{
+    "title": "Story title here",
+    "introduction": "Introduction paragraph here",
+    "middle": "Middle paragraph here",
+    "conclusion": "Conclusion paragraph here"
+}}
+Use only basic punctuation (periods, commas, apostrophes) and avoid special characters.
+Do not include any text outside the JSON object.
+Create a story suitable for children aged 3-5, in English, based on this prompt: "{title}".
+Incorporate the following words or genres if possible: {theme}, {genre}.
+"""
+
+STORY_SCHEMA = {
+    'type': 'object',
+    'properties': {section: {'type': 'string'} for section in ('title', 'introduction', 'middle', 'conclusion')},
+    'required': ['title', 'introduction', 'middle', 'conclusion'],
+}
+
+SAMPLE_STORIES = [
+    {'Title': 'The Brave Little Kite', 'Theme': 'Courage', 'Genre': 'Adventure',
+     'Story': 'A small red kite lived on a windy hill. One day a storm carried it far over the sea. '
+              'It found its way home by following the stars.'},
+    {'Title': 'The Lost Puppy', 'Theme': 'Kindness', 'Genre': 'Friendship',
+     'Story': 'A puppy got lost in the busy market. A little girl shared her bread with it and '
+              'helped it look for its mother until they found her near the well.'},
+    {'Title': 'The Singing River', 'Theme': 'Nature', 'Genre': 'Fairy Tale',
+     'Story': 'Every morning the river sang to the village. When the villagers stopped throwing '
+              'rubbish into it, the song grew louder and the fish came back.'},
+]
+
+def model_size_mb(model):
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 1e6
+
+def story_logits(predictor, text):
+    inputs = predictor.tokenizer(text, return_tensors='pt')
+    with torch.no_grad():
+        outputs = predictor.model(**inputs, labels=inputs['input_ids'])
+    return outputs.logits[0], outputs.loss.item()
+
+def evaluate(predictor, stories, max_new_tokens):
+    perplexities, latencies, tokens_per_second, logits = [], [], [], []
+    for story in stories:
+        story_logit, loss = story_logits(predictor, story['Story'])
+        logits.append(story_logit)
+        perplexities.append(math.exp(loss))
+
+        prompt = TEMPLATE.format(title=story['Title'], theme=story.get('Theme', ''), genre=story.get('Genre', ''))
+        start = time.perf_counter()
+        output = predictor.predict(prompt, max_new_tokens=max_new_tokens, schema=STORY_SCHEMA)
+        elapsed = time.perf_counter() - start
+        latencies.append(elapsed)
+        tokens_per_second.append(len(predictor.tokenizer(output)['input_ids']) / elapsed)
+    return {
+        'perplexity': statistics.mean(perplexities),
+        'latency': statistics.median(latencies),
+        'tokens_per_second': statistics.median(tokens_per_second),
+        'logits': logits,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-dir', help="Model to load (defaults to a generated small Llama)")
+    parser.add_argument('--stories', help="Held-out story corpus in storyExtractor format (.jsonl, .jsonl.gz, shards or a JSON array)")
+    parser.add_argument('--limit', type=int, default=20, help="Number of held-out stories to score")
+    parser.add_argument('--max-new-tokens', type=int, default=64)
+    args = parser.parse_args()
+
+    model_dir = args.model_dir or build_tiny_model(
+        os.path.join(tempfile.gettempdir(), 'storyscape-small-llama'), hidden_size=512, num_layers=8
+    )
+    os.environ['MODEL_DIR'] = model_dir
+    import predictor as predictor_module
+
+    if args.stories:
+        from story_corpus import iter_records
+        stories = list(itertools.islice(iter_records(args.stories, dedupe_key='url'), args.limit))
+    else:
+        stories = SAMPLE_STORIES
+
+    results = {}
+    for mode in ('none', 'int8'):
+        predictor = predictor_module.LlamaPredictor(quantization=mode)
+        # Compare like for like: both runs on CPU
+        predictor.model.to('cpu')
+        predictor.device = torch.device('cpu')
+        predictor.warm_up()
+        results[mode] = evaluate(predictor, stories, args.max_new_tokens)
+        results[mode]['size'] = model_size_mb(predictor.model)
+        del predictor
+
+    agreement = statistics.mean(
+        (full.argmax(-1) == quantized.argmax(-1)).float().mean().item()
+        for full, quantized in zip(results['none']['logits'], results['int8']['logits'])
+    )
+
+    print(f"held-out stories: {len(stories)}")
+    print(f"{'mode':>6} {'size(MB)':>9} {'perplexity':>11} {'latency(s)':>11} {'tokens/s':>9}")
+    for mode, result in results.items():
+        print(f"{mode:>6} {result['size']:>9.1f} {result['perplexity']:>11.2f} "
+              f"{result['latency']:>11.2f} {result['tokens_per_second']:>9.1f}")
+    print(f"top-1 next-token agreement int8 vs full precision: {agreement:.1%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Build a tiny, randomly initialised Llama model for CPU benchmarks.
+
+The weights are random, so the output is gibberish, but the model has the
+same architecture and file layout as the real one, which makes it a good
+fit for measuring overheads such as batching, prefill and loading time.
+"""
+
+import os
+import torch
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+CORPUS = [
+    "Create a story suitable for children aged 3-5, in Hindi, based on this prompt.",
+    'Return ONLY a JSON object: {"title": "Story title here", "introduction": "Introduction paragraph here"}',
+    "Once upon a time a small red kite flew over the sea and found its way home by the stars.",
+]
+
+def build_tiny_model(output_dir, hidden_size=128, num_layers=4, vocab_size=512, seed=0):
+    """Write a tiny Llama model and fast tokenizer to output_dir and return the path"""
+    if os.path.exists(os.path.join(output_dir, 'config.json')):
+        return output_dir
+
+    tokenizer = Tokenizer(models.BPE(unk_token='<unk>'))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer.train_from_iterator(CORPUS * 20, trainers.BpeTrainer(
+        vocab_size=vocab_size,
+        special_tokens=['<unk>', '<s>', '</s>'],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet()
+    ))
+    PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, bos_token='<s>', eos_token='</s>', unk_token='<unk>'
+    ).save_pretrained(output_dir)
+
+    torch.manual_seed(seed)
+    config = LlamaConfig(
+        vocab_size=tokenizer.get_vocab_size(),
+        hidden_size=hidden_size,
+        intermediate_size=hidden_size * 2,
+        num_hidden_layers=num_layers,
+        num_attention_heads=4,
+        num_key_value_heads=4,
+        max_position_embeddings=4096,
+        bos_token_id=1,
+        eos_token_id=2
+    )
+    LlamaForCausalLM(config).save_pretrained(output_dir)
+    return output_dir
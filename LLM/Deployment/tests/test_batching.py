@@ -0,0 +1,85 @@
+"""
+BatchScheduler against a stub predictor that records its batches.
+
+Run from LLM/Deployment:
+    python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+from batching import BatchScheduler
+
+class RecordingPredictor:
+    """Answers each prompt with its own text so misrouted results show up"""
+
+    def __init__(self, latency=0.01, fail=False):
+        self.latency = latency
+        self.fail = fail
+        self.batches = []
+        self._lock = Lock()
+
+    def predict_batch(self, prompts, schemas=None, **generate_kwargs):
+        with self._lock:
+            self.batches.append((list(prompts), list(schemas), generate_kwargs))
+        time.sleep(self.latency)
+        if self.fail:
+            raise RuntimeError("generate failed")
+        return [f"{prompt} -> {generate_kwargs.get('max_new_tokens')}" for prompt in prompts]
+
+def submit_all(scheduler, requests):
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        return list(pool.map(lambda request: scheduler.submit(request[0], **request[1]), requests))
+
+class BatchSchedulerTests(unittest.TestCase):
+    def test_full_batch_is_flushed_without_waiting(self):
+        predictor = RecordingPredictor()
+        scheduler = BatchScheduler(predictor, max_batch_size=4, max_wait_ms=5000)
+        start = time.monotonic()
+        submit_all(scheduler, [(f"prompt {i}", {}) for i in range(4)])
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual([len(prompts) for prompts, _, _ in predictor.batches], [4])
+
+    def test_partial_batch_is_flushed_after_the_wait(self):
+        predictor = RecordingPredictor()
+        scheduler = BatchScheduler(predictor, max_batch_size=8, max_wait_ms=100)
+        start = time.monotonic()
+        self.assertEqual(scheduler.submit("alone", max_new_tokens=4), "alone -> 4")
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        self.assertEqual(predictor.batches, [(["alone"], [None], {'max_new_tokens': 4})])
+
+    def test_results_return_to_their_callers(self):
+        predictor = RecordingPredictor()
+        scheduler = BatchScheduler(predictor, max_batch_size=4, max_wait_ms=50)
+        requests = [(f"prompt {i}", {'max_new_tokens': 8 if i % 3 else 16}) for i in range(12)]
+        results = submit_all(scheduler, requests)
+        self.assertEqual(results, [f"{prompt} -> {kwargs['max_new_tokens']}" for prompt, kwargs in requests])
+        # Different generation settings never share a generate call
+        for _, _, generate_kwargs in predictor.batches:
+            self.assertIn(generate_kwargs['max_new_tokens'], (8, 16))
+        self.assertEqual(sum(len(prompts) for prompts, _, _ in predictor.batches), 12)
+
+    def test_schemas_stay_with_their_prompts(self):
+        predictor = RecordingPredictor()
+        scheduler = BatchScheduler(predictor, max_batch_size=2, max_wait_ms=5000)
+        schema = {'type': 'object', 'properties': {'title': {'type': 'string'}}, 'required': ['title']}
+        submit_all(scheduler, [("plain", {}), ("json", {'schema': schema})])
+        (prompts, schemas, _), = predictor.batches
+        self.assertEqual(dict(zip(prompts, schemas)), {"plain": None, "json": schema})
+
+    def test_a_failed_batch_fails_each_waiter(self):
+        scheduler = BatchScheduler(RecordingPredictor(fail=True), max_batch_size=2, max_wait_ms=5000)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(scheduler.submit, f"prompt {i}") for i in range(2)]
+            for future in futures:
+                with self.assertRaisesRegex(RuntimeError, "generate failed"):
+                    future.result()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+Schema-constrained decoding over the tiny benchmark tokenizer.
+
+Run from LLM/Deployment:
+    python -m unittest discover -s tests
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+import torch
+
+DEPLOYMENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(DEPLOYMENT_DIR, 'app'))
+sys.path.insert(0, os.path.join(DEPLOYMENT_DIR, 'benchmarks'))
+
+from transformers import AutoTokenizer
+from json_constraint import (SLOT, JsonSchemaLogitsProcessor, JsonTemplateState, TokenVocabulary,
+                             UnsupportedSchemaError, template_from_schema)
+from tiny_model import build_tiny_model
+
+TITLE_SCHEMA = {'type': 'object', 'properties': {'title': {'type': 'string'}}, 'required': ['title']}
+STORY_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'title': {'type': 'string'},
+        'words': {'type': 'array', 'items': {'type': 'string'}, 'minItems': 2, 'maxItems': 2},
+    },
+    'required': ['title', 'words'],
+}
+
+def allowed_texts(vocabulary, mask):
+    return {vocabulary.texts[token_id] for token_id in mask.nonzero().flatten().tolist()}
+
+class TemplateTests(unittest.TestCase):
+    def test_strings_and_fixed_arrays_become_slots(self):
+        self.assertEqual(template_from_schema(STORY_SCHEMA),
+                         ['{"title": "', SLOT, '", "words": ["', SLOT, '", "', SLOT, '"]}'])
+
+    def test_unsupported_schemas_are_rejected(self):
+        with self.assertRaises(UnsupportedSchemaError):
+            template_from_schema({'type': 'object', 'properties': {'n': {'type': 'integer'}}, 'required': ['n']})
+        with self.assertRaises(UnsupportedSchemaError):
+            template_from_schema({'type': 'object', 'properties': {'w': {'type': 'array', 'items': {'type': 'string'}}},
+                                  'required': ['w']})
+
+class ConstrainedDecodingTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model_dir = tempfile.TemporaryDirectory()
+        cls.tokenizer = AutoTokenizer.from_pretrained(build_tiny_model(cls.model_dir.name))
+        cls.vocabulary = TokenVocabulary(cls.tokenizer, len(cls.tokenizer))
+        cls.eos = cls.tokenizer.eos_token_id
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.model_dir.cleanup()
+
+    def generate(self, schema, favoured, max_new_tokens=None, limit=200, seed=0):
+        """Greedy decoding over random scores with `favoured` token ids boosted, under the schema"""
+        generator = torch.Generator().manual_seed(seed)
+        processor = JsonSchemaLogitsProcessor(self.vocabulary, [template_from_schema(schema)], max_new_tokens)
+        input_ids = torch.tensor([[self.tokenizer.bos_token_id]])
+        eos_allowed = []
+        for _ in range(max_new_tokens or limit):
+            scores = torch.rand(1, self.vocabulary.size, generator=generator)
+            scores[0, favoured] += 100
+            scores = processor(input_ids, scores)
+            eos_allowed.append(scores[0, self.eos].item() != float('-inf'))
+            next_token = scores.argmax(dim=-1, keepdim=True)
+            input_ids = torch.cat([input_ids, next_token], dim=-1)
+            if next_token.item() == self.eos:
+                break
+        generated = input_ids[0, 1:].tolist()
+        return generated, eos_allowed
+
+    def test_special_tokens_are_not_string_content(self):
+        for token_id in self.tokenizer.all_special_ids:
+            self.assertFalse(self.vocabulary.content_mask[token_id])
+            self.assertFalse(self.vocabulary.slot_mask('"}')[token_id])
+            self.assertFalse(self.vocabulary.literal_mask('{"title": "')[token_id])
+
+    def test_allowed_tokens_follow_the_template(self):
+        state = JsonTemplateState(template_from_schema(TITLE_SCHEMA))
+        opening = allowed_texts(self.vocabulary, state.allowed_mask(self.vocabulary))
+        self.assertTrue(opening)
+        self.assertTrue(all('{"title": "'.startswith(text) for text in opening))
+
+        state.advance('{"title": "')
+        in_string = allowed_texts(self.vocabulary, state.allowed_mask(self.vocabulary))
+        closing = [text for text in in_string if '"' in text]
+        self.assertTrue(closing)
+        self.assertTrue(all('"}'.startswith(text[text.index('"'):]) for text in closing))
+        self.assertFalse(any('\\' in text for text in in_string))
+
+        state.advance('kite"')
+        self.assertEqual(allowed_texts(self.vocabulary, state.allowed_mask(self.vocabulary)), {'}'})
+        state.advance('}')
+        self.assertTrue(state.done)
+        self.assertEqual(state.allowed_mask(self.vocabulary).nonzero().flatten().tolist(), [self.eos])
+
+    def test_strings_close_early_when_the_budget_runs_out(self):
+        state = JsonTemplateState(template_from_schema(TITLE_SCHEMA))
+        state.advance('{"title": "kite')
+        closing = allowed_texts(self.vocabulary, state.allowed_mask(self.vocabulary, tokens_left=2))
+        self.assertTrue(closing)
+        self.assertTrue(all('"' in text for text in closing))
+
+        content = self.vocabulary.content_mask.nonzero().flatten().tolist()
+        generated, _ = self.generate(STORY_SCHEMA, content, max_new_tokens=40)
+        self.assertLessEqual(len(generated), 40)
+        self.assertEqual(generated[-1], self.eos)
+        self.assertEqual(list(json.loads(self.tokenizer.decode(generated, skip_special_tokens=True))),
+                         ['title', 'words'])
+
+    def test_eos_only_opens_after_the_closing_brace(self):
+        for schema in (TITLE_SCHEMA, STORY_SCHEMA):
+            # The budget closes the strings; until then EOS is the top-scoring token at every step
+            generated, eos_allowed = self.generate(schema, [self.eos], max_new_tokens=60)
+            self.assertEqual(generated[-1], self.eos)
+            self.assertEqual(eos_allowed, [False] * (len(eos_allowed) - 1) + [True])
+            text = self.tokenizer.decode(generated, skip_special_tokens=True)
+            self.assertEqual(list(json.loads(text)), schema['required'])
+            self.assertNotIn(self.eos, generated[:-1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+PrefixCache bookkeeping, and greedy output with and without the cache on a tiny Llama.
+
+Run from LLM/Deployment:
+    python -m unittest discover -s tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+DEPLOYMENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(DEPLOYMENT_DIR, 'app'))
+sys.path.insert(0, os.path.join(DEPLOYMENT_DIR, 'benchmarks'))
+
+from prefix_cache import PrefixCache
+from tiny_model import build_tiny_model
+
+TEMPLATE = """
+Return ONLY a JSON object with this exact structure:
+{{"title": "Story title here", "introduction": "Introduction paragraph here"}}
+Create a story suitable for children aged 3-5, in Hindi, based on this prompt: "{prompt}".
+"""
+
+class PrefixCacheTests(unittest.TestCase):
+    def test_least_recently_used_prefix_is_evicted_past_the_token_budget(self):
+        cache = PrefixCache(max_tokens=10, min_tokens=2)
+        cache.store((1, 2, 3, 4), 'a')
+        cache.store((5, 6, 7, 8), 'b')
+        self.assertEqual(cache.lookup((1, 2, 3, 4, 9)), (4, 'a'))
+        # 12 cached tokens is over budget, so 'b', the least recently used, goes
+        cache.store((9, 9, 9, 9), 'c')
+        self.assertEqual(cache.lookup((5, 6, 7, 8, 9)), (0, None))
+        self.assertEqual(cache.lookup((1, 2, 3, 4, 9)), (4, 'a'))
+        self.assertEqual(cache.lookup((9, 9, 9, 9, 9)), (4, 'c'))
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_prefixes_over_the_budget_are_not_stored(self):
+        cache = PrefixCache(max_tokens=3, min_tokens=2)
+        cache.store((1, 2, 3, 4), 'a')
+        self.assertEqual(cache.lookup((1, 2, 3, 4, 5)), (0, None))
+
+    def test_longest_cached_prefix_wins_and_is_copied(self):
+        cache = PrefixCache(max_tokens=100, min_tokens=2)
+        cache.store((1, 2), ['short'])
+        cache.store((1, 2, 3), ['long'])
+        length, past_key_values = cache.lookup((1, 2, 3, 4))
+        self.assertEqual((length, past_key_values), (3, ['long']))
+        past_key_values.append('extended')
+        self.assertEqual(cache.lookup((1, 2, 3, 4)), (3, ['long']))
+
+    def test_a_prompt_is_never_its_own_cached_prefix(self):
+        cache = PrefixCache(max_tokens=100, min_tokens=2)
+        cache.store((1, 2, 3), 'a')
+        self.assertEqual(cache.lookup((1, 2, 3)), (0, None))
+
+    def test_shared_prefixes_are_found_among_recent_prompts(self):
+        cache = PrefixCache(max_tokens=100, min_tokens=3)
+        self.assertIsNone(cache.shared_prefix((1, 2, 3, 4, 5)))
+        self.assertEqual(cache.shared_prefix((1, 2, 3, 4, 9)), (1, 2, 3, 4))
+        # Too short a match is not worth a prefill
+        self.assertIsNone(cache.shared_prefix((1, 2, 7)))
+        # At least one token is left for generate to prefill
+        self.assertEqual(cache.shared_prefix((1, 2, 3, 4, 9)), (1, 2, 3, 4))
+        self.assertEqual(cache.shared_prefix((1, 2, 3, 4)), (1, 2, 3))
+
+    def test_batched_prompts_are_counted_and_logged_as_bypasses(self):
+        cache = PrefixCache(max_tokens=100, min_tokens=2, stats_interval=60)
+        cache.store((1, 2), 'a')
+        cache.lookup((1, 2, 3))
+        cache.lookup((4, 5, 6))
+        with mock.patch('prefix_cache.time.monotonic', return_value=cache._logged_at + 60), \
+                self.assertLogs('prefix_cache', 'INFO') as logs:
+            cache.bypass(6)
+        self.assertEqual((cache.hits, cache.misses, cache.bypasses), (1, 1, 6))
+        self.assertIn("1 hits, 1 misses, 6 batched prompts bypassed; 12% of 8 prompts", logs.output[0])
+
+class PrefixCacheOutputTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.model_dir = tempfile.TemporaryDirectory()
+        os.environ['MODEL_DIR'] = build_tiny_model(cls.model_dir.name)
+        import predictor
+        cls.predictor = predictor.LlamaPredictor()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.model_dir.cleanup()
+
+    def test_cached_prefill_does_not_change_greedy_output(self):
+        prompts = [TEMPLATE.format(prompt=f"A kite over the sea #{i}") for i in range(4)]
+        prefix_cache = self.predictor.prefix_cache
+        self.predictor.prefix_cache = None
+        try:
+            expected = [self.predictor.predict(prompt, max_new_tokens=8) for prompt in prompts]
+        finally:
+            self.predictor.prefix_cache = prefix_cache
+        hits = prefix_cache.hits
+        self.assertEqual([self.predictor.predict(prompt, max_new_tokens=8) for prompt in prompts], expected)
+        self.assertGreater(prefix_cache.hits, hits)
+
+    def test_batches_bypass_the_cache(self):
+        prefix_cache = self.predictor.prefix_cache
+        counts = (prefix_cache.hits, prefix_cache.misses, prefix_cache.bypasses)
+        prompts = [TEMPLATE.format(prompt=f"A boat on the river #{i}") for i in range(2)]
+        self.predictor.predict_batch(prompts, max_new_tokens=4)
+        self.assertEqual((prefix_cache.hits, prefix_cache.misses, prefix_cache.bypasses),
+                         (counts[0], counts[1], counts[2] + 2))
+
+if __name__ == '__main__':
+    unittest.main()